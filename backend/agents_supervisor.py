@@ -92,5 +92,8 @@ supervisor_orchestrator = Agent(
         AgentTool(agent=inventory_manager_agent),
         AgentTool(agent=approval_agent),
         AgentTool(agent=action_item_strategist)
-    ]
-)
\ No newline at end of file
+    ],
+    # Routed to directly by relief_manager; never hand the conversation to the other persona
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True
+)
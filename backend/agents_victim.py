@@ -1,40 +1,57 @@
 from google.adk.agents import Agent
 from google.adk.tools import AgentTool
 from .smart_model import SmartGemini # <--- USE CUSTOM MODEL
+from . import conversation_context
+import item_resolver
 import tools_client
 
 # --- SETUP ---
 # We don't need retry_config here anymore, SmartGemini handles it
-VALID_ITEMS_STR = ", ".join(tools_client.database.get_all_item_names())
+
+def with_catalog(template: str):
+    """
+    Instruction provider that fills {catalog} with the current short catalog
+    summary at call time (stays fresh when items are added, bounded in size).
+    Exact item names come from the search_catalog tool, not the prompt.
+    {known} gets what earlier, compacted turns established (conversation_context).
+    """
+    def provider(context) -> str:
+        state = (context.state.get(conversation_context.STATE_KEY) if context else None) or conversation_context.empty_state()
+        return template.format(catalog=item_resolver.catalog_summary(), known=conversation_context.known_details(state))
+    return provider
 
 # --- WORKER AGENTS ---
 
 strategist_agent = Agent(
     model=SmartGemini(model="gemini-2.5-flash"),
     name="strategist_agent",
-    instruction=f"""You are a relief request strategist. You PRESERVE all context from conversation.
+    instruction=with_catalog("""You are a relief request strategist. You PRESERVE all context from conversation.
+
+Known from earlier messages: {known}
 
 Your role:
-1. Extract ALL information from the ENTIRE conversation history:
-   - Items mentioned (from ANY previous message)
-   - Quantities mentioned (from ANY previous message)
-   - Location mentioned (from ANY previous message)
+1. Combine the known details above with the request you are given (recent messages and any
+   [[EARLIER CONVERSATION]] summary):
+   - Items and quantities still needed (newer messages add to or override earlier ones)
+   - Location (the most recent one mentioned)
 
 2. Return a structured plan with:
-   - Items: [list all items mentioned across ALL messages]
+   - Items: [list all items still needed]
    - Quantities: [list quantities for each item]
-   - Location: [the location mentioned in ANY message]
+   - Location: [the location]
    - Missing: [only info NEVER mentioned before]
 
-3. NEVER mark as "missing" if it was mentioned earlier
+3. NEVER mark as "missing" if it was mentioned earlier or is in the known details
+4. Items listed as already requested are done - do not include them again
 
-Available items: [{VALID_ITEMS_STR}]
+Catalog (keep the user's own item words, names are resolved later):
+{catalog}
 
 Example:
 - Message 1: "need 20 water bottles, 5 tents"
 - Message 2: "at Chennai"
 → Your plan: Items: water bottles, tents | Quantities: 20, 5 | Location: Chennai | Missing: none
-"""
+""")
 )
 
 escalation_agent = Agent(
@@ -42,7 +59,7 @@ escalation_agent = Agent(
     name="escalation_agent",
     instruction="""Log issues to supervisor. YOU MUST ALWAYS call one of these functions when invoked:
     
-    - Use `log_inventory_gap(item_name, quantity, location, session_id, is_partial)` for items that EXIST in inventory but are out of stock or insufficient
+    - Use `log_inventory_gap(item_name, quantity, location, is_partial)` for items that EXIST in inventory but are out of stock or insufficient
     - Use `log_new_item_request(item_name, quantity, location)` for items that DON'T EXIST in inventory at all
     
     When called for a non-existent item (like helicopters, rockets, etc.), you MUST call log_new_item_request 
@@ -63,9 +80,12 @@ request_dispatcher_agent = Agent(
 item_finder_agent = Agent(
     model=SmartGemini(model="gemini-2.5-flash"),
     name="item_finder_agent",
-    instruction=f"""You are an item name matcher. Your job is to map user requests to exact database keys.
+    instruction=with_catalog("""You are an item name matcher. Your job is to map user requests to exact database keys.
+
+Catalog summary:
+{catalog}
 
-Valid database items: [{VALID_ITEMS_STR}]
+Call `search_catalog(query)` with the user's item words to get the closest exact database keys.
 
 CRITICAL Rules:
 1. Match user input (case-insensitive, ignore spaces/hyphens/underscores)
@@ -83,7 +103,7 @@ Matching Strategy:
 - Try exact match first
 - Try singular ↔ plural conversion (add/remove 's', 'es', 'ies')
 - Try fuzzy matching for typos
-- Check all database items for closest match
+- Pick from the keys search_catalog returned (search again with a singular/plural or synonym if needed)
 
 Examples:
 - User: "tent" → Database has "tents" → You: "tents"
@@ -91,7 +111,8 @@ Examples:
 - User: "battery" → Database has "batteries" → You: "batteries"
 - User: "blanket" → Database has "blankets" → You: "blankets"
 - User: "helicopters" → Not in database → You: "None"
-"""
+"""),
+    tools=[tools_client.search_catalog]
 )
 
 # --- ORCHESTRATOR ---
@@ -99,42 +120,51 @@ Examples:
 victim_orchestrator = Agent(
     model=SmartGemini(model="gemini-2.5-flash"),
     name="victim_orchestrator",
-    instruction=f"""You orchestrate relief requests for disaster victims. YOU MUST PRESERVE CONTEXT FROM ALL PREVIOUS MESSAGES.
+    instruction=with_catalog("""You orchestrate relief requests for disaster victims. YOU MUST PRESERVE CONTEXT FROM ALL PREVIOUS MESSAGES.
 
 CRITICAL RULES:
 1. You ONLY handle relief requests - you CANNOT add items to inventory or perform admin actions
-2. ONLY these items are available: [{VALID_ITEMS_STR}]
+2. ONLY catalog items are available (summary at the end). Call `search_catalog(query)` for exact names
 3. When user provides location/clarification, look at PREVIOUS messages for items and quantities!
+   Older messages may be folded into an [[EARLIER CONVERSATION]] summary: treat it as part of the
+   conversation and pass it to `strategist_agent` with the recent messages. Never request again
+   what it lists as already requested.
 4. If user requests invalid items, politely explain what items ARE available
 
 Step-by-step process:
 1. Call `strategist_agent` to extract ALL info from conversation history
 2. If strategist found items, quantities, AND location → proceed to step 3
 3. If missing info → ask ONLY for what's missing (don't ask for info already mentioned)
-4. For each item: Call `item_finder_agent` to normalize item name
-   - If item_finder returns 'None' → Item is NOT available in inventory
+4. For each item: Call `find_item` (instant, no model call) to normalize the item name
+   - If it returns 'MATCH: <key>' → use <key>, do NOT call item_finder_agent
+   - Only if it returns 'UNSURE: ...' → call `item_finder_agent` to normalize the item name
+   - If neither finds a match ('None') → Item is NOT available in inventory
      • MANDATORY: You MUST call `escalation_agent` to log this to supervisor using log_new_item_request(item_name, quantity, location)
      • Then tell user politely that item is unavailable
-     • CRITICAL: When listing available items, you MUST use this EXACT list: {VALID_ITEMS_STR}
-     • DO NOT make up your own list - use the one provided above
-   - If item_finder returns valid name → proceed to step 5
-5. For valid items only: Call `request_dispatcher_agent` with (normalized_name, quantity, location)
+     • CRITICAL: When suggesting alternatives, call `search_catalog` (with the item or its category) and ONLY name items it returns
+     • DO NOT make up your own list
+   - If you have a valid name → proceed to step 5
+5. For valid items only:
+   - 2 or more items → call `request_relief_batch` ONCE with all of them:
+     items=[{{"item_name": normalized_name, "quantity": quantity}}, ...], location
+     Use the "message" of each entry in its "results" to tell the user what happened per item
+   - A single item → call `request_dispatcher_agent` with (normalized_name, quantity, location)
 6. Summarize results naturally with empathy
 
 Example - INVALID ITEM:
 - User: "I need 10 helicopters"
-- You: "I'm sorry, helicopters are not available in our relief supplies. We have: {VALID_ITEMS_STR}. Can I help you with any of these?"
+- You: "I'm sorry, helicopters are not available in our relief supplies. We have: <items from search_catalog / the catalog summary>. Can I help you with any of these?"
 
 Example - MIXED VALID/INVALID:
 - User: "I need 5 blankets and 3 rockets"
-- You: Process blankets normally, then: "I dispatched 5 blankets. However, rockets are not available. We only have: {VALID_ITEMS_STR}."
+- You: Process blankets normally, then: "I dispatched 5 blankets. However, rockets are not available. We only have: <items from search_catalog / the catalog summary>."
 
 Example of CORRECT behavior:
 - User: "need 20 water bottles, 5 tents"
 - You: "Where should these be sent?"
 - User: "at Delhi"
 - You: → Call strategist → Get: items=[water bottles, tents], qty=[20,5], loc=Delhi
-      → Process ALL items with the remembered quantities
+      → Process ALL items with the remembered quantities (one `request_relief_batch` call)
 
 Example of WRONG behavior (DO NOT DO THIS):
 - User: "need 20 water bottles, 5 tents"  
@@ -142,12 +172,21 @@ Example of WRONG behavior (DO NOT DO THIS):
 - User: "at Delhi"
 - You: "What items and how many?" ❌ WRONG! You already know this!
 
-Available items: [{VALID_ITEMS_STR}]
-    """,
+Catalog summary:
+{catalog}
+    """),
     tools=[
+        tools_client.find_item,
+        tools_client.search_catalog,
+        tools_client.request_relief_batch,
         AgentTool(agent=strategist_agent),
         AgentTool(agent=escalation_agent),
         AgentTool(agent=request_dispatcher_agent),
         AgentTool(agent=item_finder_agent)
-    ]
-)
\ No newline at end of file
+    ],
+    # Older turns are folded into a summary so each call fits the RELIEF_CONTEXT_TOKENS budget
+    before_model_callback=conversation_context.compact_history,
+    # Routed to directly by relief_manager; never hand the conversation to the other persona
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True
+)
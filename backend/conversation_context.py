@@ -0,0 +1,171 @@
+import json
+import os
+import re
+from google.genai import types
+from fast_path import RECORD_TAG
+from rate_limiter import estimate_tokens
+import item_resolver
+
+# Token-budgeted history for the victim orchestrator. Every model call would
+# otherwise re-send the whole session, so long chats get slower and costlier
+# each turn. Instead, finished turns are folded into a small structured state
+# (items still needed, location, requests already made) kept in the ADK
+# session state, and each call sends that summary, the most recent turns that
+# fit in CONTEXT_TOKENS verbatim, and the current turn in full.
+CONTEXT_TOKENS = int(os.environ.get("RELIEF_CONTEXT_TOKENS", 1500))
+CONTEXT_COMPACTION = os.environ.get("RELIEF_CONTEXT_COMPACTION", "1") != "0"
+STATE_KEY = "relief_context"
+SUMMARY_TAG = "[[EARLIER CONVERSATION]]"
+MAX_REQUESTS = 10  # most recent requests listed in the summary
+
+PLAN = re.compile(r"Items:\s*(?P<items>.*?)\s*\|\s*Quantities:\s*(?P<quantities>.*?)\s*\|\s*Location:\s*(?P<location>.*?)\s*\|\s*Missing:")
+REQUEST_ID = re.compile(r"#(\d+)")
+# One entry of fast_path.record_text: "tents x3 DISPATCHED (request #12)"
+FAST_PATH_REQUEST = re.compile(r"(?P<item>[a-z0-9_]+) x(?P<quantity>\d+) (?P<status>[A-Z_]+)(?: \(request #(?P<request_id>\d+)\))?")
+
+def empty_state() -> dict:
+    return {"items": [], "location": "", "requests": [], "turns": 0, "folded_until": 0.0}
+
+# --- FOLDING FINISHED TURNS ---
+def _is_user_message(content) -> bool:
+    return bool(content) and content.role == "user" and any(
+        part.text and not part.text.startswith("For context:") for part in content.parts or [])
+
+def _result_text(response) -> str:
+    if isinstance(response, dict) and "result" in response:
+        response = response["result"]
+    return response if isinstance(response, str) else json.dumps(response, default=str)
+
+def _request_args(args: dict) -> dict:
+    """AgentTool calls carry their input as a JSON string in 'request'."""
+    try:
+        parsed = json.loads(args.get("request", "{}"))
+    except (TypeError, ValueError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+def _add_request(state: dict, item: str, quantity, status: str, request_id=None):
+    state["requests"] = (state["requests"] + [{"item": item, "quantity": quantity, "status": status, "request_id": request_id}])[-MAX_REQUESTS:]
+
+def _fold_result(state: dict, name: str, args: dict, response):
+    """Updates the state from one tool result of the orchestrator."""
+    if name == "strategist_agent":
+        plan = PLAN.search(_result_text(response))
+        if plan:
+            names = [n.strip() for n in plan.group("items").split(",") if n.strip()]
+            quantities = [q.strip() for q in plan.group("quantities").split(",")]
+            if names:
+                state["items"] = [[n, int(q) if q.isdigit() else None] for n, q in zip(names, quantities + [""] * len(names))]
+            if plan.group("location").strip():
+                state["location"] = plan.group("location").strip()
+    elif name == "request_relief_batch" and isinstance(response, dict):
+        for result in response.get("results", []):
+            _add_request(state, result.get("item_name"), result.get("requested"), result.get("status"), result.get("request_id"))
+        state["items"] = []
+    elif name in ("request_dispatcher_agent", "escalation_agent"):
+        request = _request_args(args)
+        request_id = REQUEST_ID.search(_result_text(response))
+        _add_request(state, request.get("item_name"), request.get("quantity"),
+                     "REQUESTED" if name == "request_dispatcher_agent" else "ESCALATED",
+                     int(request_id.group(1)) if request_id else None)
+        state["items"] = []
+
+def _fold_fast_path(state: dict, text: str):
+    """Requests the frontend fast path made between agent turns (forwarded with the user message)."""
+    handled = set()
+    for match in FAST_PATH_REQUEST.finditer(text.split(RECORD_TAG, 1)[1]):
+        _add_request(state, match.group("item"), int(match.group("quantity")), match.group("status"),
+                     int(match.group("request_id")) if match.group("request_id") else None)
+        handled.add(match.group("item"))
+    state["items"] = [[n, q] for n, q in state["items"] if item_resolver.match_item(n)["key"] not in handled]
+
+def fold_turns(state: dict, events: list, current_invocation: str) -> bool:
+    """
+    Folds events of finished turns not folded yet into the state, plus the
+    current user message (it may carry fast-path requests). True if anything changed.
+    """
+    calls, changed = {}, False
+    for event in events:
+        if event.invocation_id == current_invocation and event.author != "user":
+            break
+        if event.timestamp <= state["folded_until"]:
+            continue
+        if event.author == "user" and _is_user_message(event.content):
+            state["turns"] += 1
+        for part in (event.content.parts if event.content else None) or []:
+            if event.author == "user" and part.text and RECORD_TAG in part.text:
+                _fold_fast_path(state, part.text)
+            if part.function_call:
+                calls[part.function_call.id] = dict(part.function_call.args or {})
+            if part.function_response:
+                _fold_result(state, part.function_response.name, calls.pop(part.function_response.id, {}),
+                             part.function_response.response)
+        state["folded_until"] = event.timestamp
+        changed = True
+    return changed
+
+# --- RENDERING ---
+def known_details(state: dict) -> str:
+    """One line for the strategist prompt: what earlier messages already established."""
+    items = ", ".join(f"{q} {n}" if q else n for n, q in state.get("items", [])) or "none"
+    return f"Still needed: {items} | Location: {state.get('location') or 'unknown'}"
+
+def summary_text(state: dict, folded: int) -> str:
+    lines = [f"{SUMMARY_TAG} {folded} earlier message(s) of this conversation, summarized:"]
+    if state["items"]:
+        lines.append("Still needed: " + ", ".join(f"{q} {n}" if q else n for n, q in state["items"]))
+    if state["location"]:
+        lines.append(f"Location: {state['location']}")
+    if state["requests"]:
+        lines.append("Already requested (do not request again): " + "; ".join(
+            f"{r['item']} x{r['quantity']} {r['status']}" + (f" (request #{r['request_id']})" if r["request_id"] else "")
+            for r in state["requests"]))
+    return "\n".join(lines)
+
+# --- BUDGETING ---
+def content_tokens(content) -> int:
+    total = 0
+    for part in content.parts or []:
+        if part.text:
+            total += estimate_tokens(part.text)
+        if part.function_call:
+            total += estimate_tokens(part.function_call.name + json.dumps(part.function_call.args or {}, default=str))
+        if part.function_response:
+            total += estimate_tokens(part.function_response.name + json.dumps(part.function_response.response or {}, default=str))
+    return total
+
+def split_turns(contents: list) -> list[list]:
+    """Groups contents into turns, each starting at a user message."""
+    turns = []
+    for content in contents:
+        if not turns or _is_user_message(content):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+def compact_history(callback_context, llm_request):
+    """
+    before_model_callback: folds finished turns into the session state, then
+    replaces the turns that don't fit in CONTEXT_TOKENS with its summary.
+    The current turn is always sent in full.
+    """
+    if not CONTEXT_COMPACTION:
+        return None
+    state = dict(callback_context.state.get(STATE_KEY) or empty_state())
+    if fold_turns(state, callback_context.session.events, callback_context.invocation_id):
+        callback_context.state[STATE_KEY] = state
+
+    turns = split_turns(llm_request.contents or [])
+    earlier, kept, used = turns[:-1], [], 0
+    for turn in reversed(earlier):
+        cost = sum(content_tokens(c) for c in turn)
+        if used + cost > CONTEXT_TOKENS:
+            break
+        kept.insert(0, turn)
+        used += cost
+    folded = len(earlier) - len(kept)
+    if folded:
+        summary = types.Content(role="user", parts=[types.Part(text=summary_text(state, folded))])
+        llm_request.contents = [summary] + [c for turn in kept + turns[-1:] for c in turn]
+        print(f"🗜️ {callback_context.agent_name}: {folded} earlier turn(s) folded, {len(kept)} kept verbatim (~{used} tokens)")
+    return None
@@ -1,23 +1,56 @@
-from google.adk.agents import Agent
-from google.adk.tools import AgentTool
-from .smart_model import SmartGemini # <--- USE CUSTOM MODEL
+import re
+from typing import AsyncGenerator
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.genai import types
 
+import circuit_breaker
+import fast_path
+from tools_client import A2A_METADATA_KEY
 from .agents_victim import victim_orchestrator
 from .agents_supervisor import supervisor_orchestrator
 
+SOURCE_TAG = re.compile(r"\[\[SOURCE:\s*(VICTIM|SUPERVISOR)\s*\]\]", re.IGNORECASE)
+
+class SourceRouter(BaseAgent):
+    """
+    Top-level router without a model call. Picks the orchestrator from the
+    A2A request metadata ("persona") or the [[SOURCE: ...]] tag in the message;
+    anything unmarked goes to the victim orchestrator (no admin tools).
+    When the model is unavailable it answers with fast_path.degraded_reply.
+    """
+    def metadata(self, ctx: InvocationContext) -> dict:
+        custom_metadata = (ctx.run_config.custom_metadata or {}) if ctx.run_config else {}
+        return custom_metadata.get(A2A_METADATA_KEY) or {}
+
+    def message_text(self, ctx: InvocationContext) -> str:
+        return "".join(part.text or "" for part in ctx.user_content.parts or []) if ctx.user_content else ""
+
+    def route(self, ctx: InvocationContext) -> BaseAgent:
+        persona = str(self.metadata(ctx).get("persona", "")).lower()
+        if not persona:
+            match = SOURCE_TAG.search(self.message_text(ctx))
+            persona = match.group(1).lower() if match else ""
+        return supervisor_orchestrator if persona == "supervisor" else victim_orchestrator
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        target = self.route(ctx)
+        print(f"[BACKEND] 🔀 Router: -> {target.name}")
+        try:
+            async for event in target.run_async(ctx):
+                yield event
+        except circuit_breaker.ModelUnavailable as e:
+            # Degraded mode: a deterministic answer instead of an error or a long stall
+            print(f"[BACKEND] 🔌 {target.name}: model unavailable ({e}), answering with the fallback")
+            persona = "supervisor" if target is supervisor_orchestrator else "victim"
+            reply = fast_path.degraded_reply(persona, self.message_text(ctx), self.metadata(ctx).get("session_id"))
+            yield Event(author=self.name, invocation_id=ctx.invocation_id,
+                        content=types.Content(role="model", parts=[types.Part(text=reply)]))
+
 # --- TOP-LEVEL MANAGER ---
-manager_orchestrator = Agent(
-    model=SmartGemini(model="gemini-2.5-flash"),
+manager_orchestrator = SourceRouter(
     name="relief_manager",
     description="Top-level router.",
-    instruction="""
-    Router:
-    - [[SOURCE: VICTIM]] -> `victim_orchestrator`
-    - [[SOURCE: SUPERVISOR]] -> `supervisor_orchestrator`
-    Remove the tag before delegating.
-    """,
-    tools=[
-        AgentTool(agent=victim_orchestrator),
-        AgentTool(agent=supervisor_orchestrator),
-    ]
-)
\ No newline at end of file
+    sub_agents=[victim_orchestrator, supervisor_orchestrator],
+)
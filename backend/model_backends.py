@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import random
+import threading
+from collections import defaultdict
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from rate_limiter import estimate_tokens
+
+# Pluggable model backend behind SmartGemini, selected with RELIEF_MODEL_BACKEND:
+#   gemini   - live Gemini API (default)
+#   record   - live Gemini, every call appended to the cassette file
+#   replay   - answers from the cassette file, no network or API key
+#   scripted - rule-based stand-in (RELIEF_MODEL_SCRIPT), no network or API key
+# Offline backends add RELIEF_FAKE_LATENCY seconds per call ("0.5" or "0.2-0.8").
+MODEL_BACKEND = os.environ.get("RELIEF_MODEL_BACKEND", "gemini").lower()
+CASSETTE_PATH = os.environ.get("RELIEF_CASSETTE", os.path.join(os.path.dirname(__file__), "cassettes", "default.jsonl"))
+MODEL_SCRIPT = os.environ.get("RELIEF_MODEL_SCRIPT", "backend.scripted_agents")
+FAKE_LATENCY = os.environ.get("RELIEF_FAKE_LATENCY", "0")
+
+BACKENDS = ("gemini", "record", "replay", "scripted")
+if MODEL_BACKEND not in BACKENDS:
+    raise ValueError(f"RELIEF_MODEL_BACKEND must be one of {', '.join(BACKENDS)}, got '{MODEL_BACKEND}'")
+
+def is_offline() -> bool:
+    """True when no call reaches the Gemini API (no key, no quota needed)."""
+    return MODEL_BACKEND in ("replay", "scripted")
+
+def needs_api_key() -> bool:
+    return not is_offline()
+
+def fake_latency() -> float:
+    low, _, high = FAKE_LATENCY.partition("-")
+    return random.uniform(float(low), float(high)) if high else float(low)
+
+def _strip_ids(value):
+    """Function-call ids are random per run; leave them out of keys and recordings."""
+    if isinstance(value, dict):
+        return {k: _strip_ids(v) for k, v in value.items() if k != "id"}
+    if isinstance(value, list):
+        return [_strip_ids(v) for v in value]
+    return value
+
+def request_key(agent: str, llm_request) -> str:
+    contents = [_strip_ids(c.model_dump(mode="json", exclude_none=True)) for c in llm_request.contents or []]
+    digest = hashlib.sha1(json.dumps(contents, sort_keys=True).encode()).hexdigest()
+    return f"{agent}:{digest}"
+
+def with_usage(response: LlmResponse, llm_request) -> LlmResponse:
+    """Offline responses carry estimated token counts so metrics and budgets still work."""
+    if response.usage_metadata is None:
+        prompt = estimate_tokens(str(llm_request.config.system_instruction or "") + str(llm_request.contents or ""))
+        output = estimate_tokens(str(response.content or ""))
+        response.usage_metadata = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt, candidates_token_count=output, total_token_count=prompt + output)
+    return response
+
+# --- CASSETTES ---
+class Cassette:
+    """
+    JSONL file, one model call per line: {"agent", "key", "responses": [LlmResponse, ...]}.
+    Replay looks up the exact request first, then falls back to that agent's
+    recordings in order (tool results such as request ids drift between runs).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.by_key = defaultdict(list)
+        self.by_agent = defaultdict(list)
+        self.next_for_agent = defaultdict(int)
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.by_key[entry["key"]].append(entry)
+                        self.by_agent[entry["agent"]].append(entry)
+
+    def record(self, agent: str, key: str, responses: list[LlmResponse]):
+        entry = {"agent": agent, "key": key,
+                 "responses": [_strip_ids(r.model_dump(mode="json", exclude_none=True)) for r in responses]}
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def lookup(self, agent: str, key: str) -> list[LlmResponse]:
+        with self.lock:
+            if self.by_key.get(key):
+                entry = self.by_key[key].pop(0)
+            else:
+                recordings = self.by_agent.get(agent) or []
+                if not recordings:
+                    raise LookupError(f"No recording for agent '{agent}' in {self.path}")
+                entry = recordings[self.next_for_agent[agent] % len(recordings)]
+                self.next_for_agent[agent] += 1
+        return [LlmResponse.model_validate(r) for r in entry["responses"]]
+
+_cassette = None
+_script = None
+
+def get_cassette() -> Cassette:
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette(CASSETTE_PATH)
+    return _cassette
+
+def get_script():
+    global _script
+    if _script is None:
+        _script = importlib.import_module(MODEL_SCRIPT)
+    return _script
+
+# --- ENTRY POINT (used by SmartGemini) ---
+async def generate(agent: str, llm_request, live_call):
+    """
+    Yields the LlmResponses for one model call. `live_call()` returns the real
+    Gemini async generator and is only used by the gemini/record backends.
+    """
+    if MODEL_BACKEND == "gemini":
+        async for response in live_call():
+            yield response
+        return
+
+    if MODEL_BACKEND == "record":
+        responses = []
+        async for response in live_call():
+            responses.append(response)
+            yield response
+        get_cassette().record(agent, request_key(agent, llm_request), responses)
+        return
+
+    latency = fake_latency()
+    if latency:
+        await asyncio.sleep(latency)
+    if MODEL_BACKEND == "replay":
+        responses = get_cassette().lookup(agent, request_key(agent, llm_request))
+    else:
+        responses = [get_script().respond(agent, llm_request)]
+    for response in responses:
+        yield with_usage(response, llm_request)
@@ -0,0 +1,263 @@
+import json
+import re
+from collections import defaultdict, deque
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from fast_path import RECORD_TAG
+
+# Rule-based stand-in for the Gemini agents (RELIEF_MODEL_BACKEND=scripted).
+# Each agent gets a function that looks at the conversation the model would
+# see and returns the next step the real model is instructed to take: the
+# same tool calls in the same order, so the real tools, database and A2A
+# plumbing run end to end. Unknown agents just acknowledge.
+
+SOURCE_TAG = re.compile(r"\[\[SOURCE:[^\]]*\]\]\s*")
+ORDER_ITEM = re.compile(r"(\d+)\s+(?:x\s+)?([a-z][a-z _-]*?)(?=\s*(?:,|&|\band\b|\bplus\b|\bat\b|\bin\b|\bto\b|[.!?]|$))")
+ORDER_LOCATION = re.compile(r"\b(?:at|in|to|location:)\s+([a-z][a-z .'-]*?)\s*[.!?]*$")
+HANDLED_TOOLS = ("request_relief_batch", "request_dispatcher_agent", "escalation_agent")
+PLAN = re.compile(r"Items:\s*(?P<items>.*?)\s*\|\s*Quantities:\s*(?P<quantities>.*?)\s*\|\s*Location:\s*(?P<location>.*?)\s*\|\s*Missing:\s*(?P<missing>.*)$")
+
+# --- RESPONSE BUILDERS ---
+def text(message: str) -> LlmResponse:
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=message)]))
+
+def calls(*function_calls: tuple[str, dict]) -> LlmResponse:
+    parts = [types.Part(function_call=types.FunctionCall(name=name, args=args)) for name, args in function_calls]
+    return LlmResponse(content=types.Content(role="model", parts=parts))
+
+# --- READING THE REQUEST ---
+def user_texts(llm_request) -> list[str]:
+    """Every user message in the conversation (not tool results or other agents' context)."""
+    texts = []
+    for content in llm_request.contents or []:
+        if content.role != "user":
+            continue
+        for part in content.parts or []:
+            if part.text and not part.text.startswith("For context:"):
+                texts.append(SOURCE_TAG.sub("", part.text).strip())
+    return texts
+
+def open_user_texts(llm_request) -> list[str]:
+    """User messages since the last order was dispatched, escalated or handled by the fast path (a history summary is kept)."""
+    texts = []
+    for content in llm_request.contents or []:
+        for part in content.parts or []:
+            if content.role == "user" and part.text and not part.text.startswith("For context:"):
+                texts.append(SOURCE_TAG.sub("", part.text).strip())
+            fast_path_record = content.role == "user" and RECORD_TAG in (part.text or "")
+            if fast_path_record or (part.function_response and part.function_response.name in HANDLED_TOOLS):
+                texts = [t for t in texts if t.startswith("[[EARLIER CONVERSATION]]")]
+    return texts
+
+def current_turn(llm_request) -> list[tuple[str, dict, str]]:
+    """(tool name, call args, result text) for every tool call since the last user message."""
+    contents = llm_request.contents or []
+    start = 0
+    for i, content in enumerate(contents):
+        if content.role == "user" and any(p.text and not p.text.startswith("For context:") for p in content.parts or []):
+            start = i + 1
+    # ADK strips the client-side call ids before the model sees the request,
+    # so responses are paired with calls of the same tool in order.
+    pending, results = defaultdict(deque), []
+    for content in contents[start:]:
+        for part in content.parts or []:
+            if part.function_call:
+                pending[part.function_call.name].append(dict(part.function_call.args or {}))
+            if part.function_response:
+                name = part.function_response.name
+                response = part.function_response.response or {}
+                result = response.get("result", response) if isinstance(response, dict) else response
+                result = result if isinstance(result, str) else json.dumps(result)
+                results.append((name, pending[name].popleft() if pending[name] else {}, result))
+    return results
+
+def parse_order(message: str) -> tuple[list[tuple[str, int]], str]:
+    """Loose 'quantity item ... at location' parse: ([(item, quantity)], location or '')."""
+    items, location = [], ""
+    for line in message.lower().splitlines():
+        line = SOURCE_TAG.sub("", line).strip()
+        # Compacted history (conversation_context): the summary header and finished requests carry no order
+        if line.startswith(("[[earlier conversation]]", "already requested")):
+            continue
+        items += [(item.strip(), int(qty)) for qty, item in ORDER_ITEM.findall(line)]
+        match = ORDER_LOCATION.search(line)
+        if match and not any(ch.isdigit() for ch in match.group(1)):
+            location = match.group(1).strip().title()
+    return items, location
+
+# --- VICTIM AGENTS ---
+def strategist_agent(llm_request) -> LlmResponse:
+    """Newer messages override older ones: the latest message naming items, the latest location."""
+    items, location = [], ""
+    for line in reversed("\n".join(user_texts(llm_request)).splitlines()):
+        line_items, line_location = parse_order(line)
+        items = items or line_items
+        location = location or line_location
+    missing = [name for name, value in (("items", items), ("location", location)) if not value]
+    return text(f"Items: {', '.join(i for i, _ in items)} | Quantities: {', '.join(str(q) for _, q in items)} | "
+                f"Location: {location} | Missing: {', '.join(missing) or 'none'}")
+
+def item_finder_agent(llm_request) -> LlmResponse:
+    turn = current_turn(llm_request)
+    query = user_texts(llm_request)[-1]
+    if not turn:
+        return calls(("search_catalog", {"query": query}))
+    match = re.search(r"': ([a-z0-9_]+) \(", turn[-1][2])
+    return text(match.group(1) if match else "None")
+
+def request_dispatcher_agent(llm_request) -> LlmResponse:
+    turn = current_turn(llm_request)
+    if not turn:
+        return calls(("request_relief", json.loads(user_texts(llm_request)[-1])))
+    return text(turn[-1][2])
+
+def escalation_agent(llm_request) -> LlmResponse:
+    turn = current_turn(llm_request)
+    if not turn:
+        return calls(("log_new_item_request", json.loads(user_texts(llm_request)[-1])))
+    return text(turn[-1][2])
+
+def victim_orchestrator(llm_request) -> LlmResponse:
+    """strategist -> find_item -> item_finder for UNSURE -> escalation for unknown -> dispatch -> summary."""
+    turn = current_turn(llm_request)
+    results = lambda name: [(args, result) for tool, args, result in turn if tool == name]
+
+    plans = results("strategist_agent")
+    if not plans:
+        return calls(("strategist_agent", {"request": "\n".join(open_user_texts(llm_request))}))
+    plan = PLAN.search(plans[-1][1])
+    if not plan or plan.group("missing").strip() != "none":
+        wanted = plan.group("missing") if plan else "items, location"
+        return text("Where should these be sent?" if wanted.strip() == "location"
+                    else "Which items and how many do you need, and where should they be sent?")
+    names = [n.strip() for n in plan.group("items").split(",") if n.strip()]
+    quantities = [int(q) for q in plan.group("quantities").split(",") if q.strip()]
+    location = plan.group("location").strip()
+
+    found = {args.get("item_name"): result for args, result in results("find_item")}
+    if not found:
+        return calls(*[("find_item", {"item_name": name}) for name in names])
+    finder = {args.get("request"): result.strip() for args, result in results("item_finder_agent")}
+    unsure = [n for n in names if found.get(n, "").startswith("UNSURE") and n not in finder]
+    if unsure:
+        return calls(*[("item_finder_agent", {"request": name}) for name in unsure])
+
+    keys = {}
+    for name in names:
+        answer = found.get(name, "")
+        keys[name] = answer[len("MATCH: "):] if answer.startswith("MATCH: ") else finder.get(name, "None")
+    valid = [(keys[n], q) for n, q in zip(names, quantities) if keys[n] != "None"]
+    unknown = [(n, q) for n, q in zip(names, quantities) if keys[n] == "None"]
+
+    escalated = {json.loads(args["request"])["item_name"] for args, _ in results("escalation_agent")}
+    pending = [(n, q) for n, q in unknown if n not in escalated]
+    if pending:
+        return calls(*[("escalation_agent", {"request": json.dumps({"item_name": n, "quantity": q, "location": location})})
+                       for n, q in pending])
+
+    dispatched = results("request_relief_batch") + results("request_dispatcher_agent")
+    if valid and not dispatched:
+        if len(valid) > 1:
+            return calls(("request_relief_batch", {"items": [{"item_name": k, "quantity": q} for k, q in valid], "location": location}))
+        key, quantity = valid[0]
+        return calls(("request_dispatcher_agent", {"request": json.dumps({"item_name": key, "quantity": quantity, "location": location})}))
+
+    summary = []
+    for args, result in dispatched:
+        try:
+            summary.append(json.loads(result)["summary"])
+        except (ValueError, KeyError, TypeError):
+            summary.append(result)
+    if unknown:
+        summary.append(f"I'm sorry, {', '.join(n for n, _ in unknown)} not available in our relief supplies. "
+                       "I've let our supervisor know about the request.")
+    return text("\n\n".join(summary))
+
+# --- SUPERVISOR AGENTS ---
+def supervisor_orchestrator(llm_request) -> LlmResponse:
+    turn = current_turn(llm_request)
+    if turn:
+        return text(turn[-1][2])
+    command = user_texts(llm_request)[-1]
+    lowered = command.lower()
+    if re.search(r"\b(resolve|fix)\b", lowered):
+        target = "action_item_strategist"
+    elif re.search(r"\b(approve|reject|pending|audit)\b", lowered):
+        target = "approval_agent"
+    else:
+        target = "inventory_manager_agent"
+    return calls((target, {"request": command}))
+
+def approval_agent(llm_request) -> LlmResponse:
+    turn = current_turn(llm_request)
+    if turn:
+        return text(turn[-1][2])
+    command = user_texts(llm_request)[-1].lower()
+    match = re.search(r"(approve|reject)\w*\s+(?:requests?\s+)?(?:ids?\s+)?(#?\d+(?:\s*(?:,|and)\s*#?\d+)*)", command)
+    if match:
+        decision = "APPROVE" if match.group(1) == "approve" else "REJECT"
+        ids = [int(i) for i in re.findall(r"\d+", match.group(2))]
+        if len(ids) > 1:
+            return calls(("supervisor_batch_decide_requests", {"request_ids_json": json.dumps(ids), "decision": decision}))
+        return calls(("supervisor_decide_request", {"request_id": ids[0], "decision": decision}))
+    if "audit" in command:
+        return calls(("supervisor_view_audit_log", {"limit": 10}))
+    return calls(("supervisor_view_pending_requests", {}))
+
+def action_item_strategist(llm_request) -> LlmResponse:
+    turn = current_turn(llm_request)
+    if turn:
+        return text(turn[-1][2])
+    match = re.search(r"#?(\d+)", user_texts(llm_request)[-1])
+    if match:
+        return calls(("supervisor_resolve_action_required", {"task_id": int(match.group(1))}))
+    return calls(("supervisor_view_pending_requests", {}))
+
+def inventory_manager_agent(llm_request) -> LlmResponse:
+    turn = current_turn(llm_request)
+    command = user_texts(llm_request)[-1].lower()
+    bulk = re.search(r"restock all(?: items)? below (\d+) by (\d+)", command)
+    if bulk:
+        threshold, amount = int(bulk.group(1)), int(bulk.group(2))
+        inventory = [result for tool, _, result in turn if tool == "admin_view_full_inventory"]
+        if not inventory:
+            return calls(("admin_view_full_inventory", {}))
+        restocked = [result for tool, _, result in turn if tool == "admin_restock_item"]
+        if restocked:
+            return text("\n".join(restocked))
+        low = [(name, int(qty)) for name, qty in re.findall(r"- ([a-z0-9_]+): (-?\d+)", inventory[-1]) if int(qty) < threshold]
+        if not low:
+            return text(f"No items below {threshold}.")
+        return calls(*[("admin_restock_item", {"item_name": name, "quantity_to_add": amount}) for name, _ in low])
+    if turn:
+        return text(turn[-1][2])
+
+    restock = re.search(r"restock\s+(.+?)\s+by\s+(\d+)", command)
+    if restock:
+        return calls(("admin_restock_item", {"item_name": restock.group(1), "quantity_to_add": int(restock.group(2))}))
+    add = re.search(r"add\s+(?:new\s+item\s+)?(.+?)\s+(?:with\s+)?(\d+)(?:\s+units)?$", command)
+    if add:
+        return calls(("admin_add_new_item", {"item_name": add.group(1), "initial_quantity": int(add.group(2))}))
+    delete = re.search(r"(?:delete|remove)\s+(.+)$", command)
+    if delete:
+        return calls(("admin_delete_item", {"item_name": delete.group(1).strip()}))
+    low_stock = re.search(r"low stock(?: below (\d+))?", command)
+    if low_stock:
+        return calls(("admin_get_low_stock_report", {"threshold": int(low_stock.group(1) or 20)}))
+    return calls(("admin_view_full_inventory", {}))
+
+RULES = {
+    "victim_orchestrator": victim_orchestrator,
+    "strategist_agent": strategist_agent,
+    "item_finder_agent": item_finder_agent,
+    "request_dispatcher_agent": request_dispatcher_agent,
+    "escalation_agent": escalation_agent,
+    "supervisor_orchestrator": supervisor_orchestrator,
+    "approval_agent": approval_agent,
+    "action_item_strategist": action_item_strategist,
+    "inventory_manager_agent": inventory_manager_agent,
+}
+
+def respond(agent: str, llm_request) -> LlmResponse:
+    rule = RULES.get(agent)
+    return rule(llm_request) if rule else text("OK")
@@ -3,14 +3,59 @@ import asyncio
 import re
 import random
 from google.adk.models.google_llm import Gemini
-from google.genai.errors import ClientError
-from google.api_core.exceptions import ResourceExhausted
+from google.genai.errors import ServerError
+import circuit_breaker
+import metrics
+import rate_limiter
+from rate_limiter import estimate_tokens
+from . import model_backends
+
+# --- PROMPT SIZE INSTRUMENTATION ---
+# Per agent: a local estimate of the system instruction size (~4 chars/token)
+# and the prompt_token_count the API reports for the whole request. Both are
+# /metrics counters (below); prompt_stats() reads them back per agent.
+def _instruction_text(llm_request) -> str:
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if instruction is None:
+        return ""
+    if isinstance(instruction, str):
+        return instruction
+    parts = getattr(instruction, "parts", None) or []
+    return "".join(getattr(part, "text", "") or "" for part in parts)
+
+def record_prompt(agent: str, instruction: str, usage) -> None:
+    LLM_INSTRUCTION_TOKENS.inc(estimate_tokens(instruction), agent=agent)
+    LLM_PROMPT_TOKENS.inc((getattr(usage, "prompt_token_count", None) or 0) if usage else 0, agent=agent)
+
+def prompt_stats() -> dict:
+    """Per-agent totals of successful calls plus the average prompt size per call (since process start)."""
+    calls = LLM_CALLS.totals("agent", outcome="ok")
+    instruction = LLM_INSTRUCTION_TOKENS.totals("agent")
+    prompt = LLM_PROMPT_TOKENS.totals("agent")
+    return {
+        agent: {"calls": n, "instruction_tokens_est": instruction.get(agent, 0), "prompt_tokens": prompt.get(agent, 0),
+                "avg_prompt_tokens": round(prompt.get(agent, 0) / n, 1)}
+        for agent, n in calls.items() if n
+    }
+
+# --- PER-AGENT CALL METRICS (served at /metrics) ---
+LLM_CALLS = metrics.counter("relief_llm_calls_total", "Model calls per agent and outcome (ok, rate_limited, unavailable, circuit_open, wait_budget, error).")
+LLM_LATENCY = metrics.histogram("relief_llm_call_seconds", "Model call latency per agent, excluding rate limiter waits.")
+LLM_PROMPT_TOKENS = metrics.counter("relief_llm_prompt_tokens_total", "Prompt tokens reported by the API per agent.")
+LLM_INSTRUCTION_TOKENS = metrics.counter("relief_llm_instruction_tokens_total", "Estimated system instruction tokens per agent (~4 chars/token).")
+LLM_RESPONSE_TOKENS = metrics.counter("relief_llm_response_tokens_total", "Response tokens reported by the API per agent.")
+LLM_RETRIES = metrics.counter("relief_llm_rate_limit_retries_total", "429 responses retried per agent.")
+LLM_SLEEP = metrics.counter("relief_llm_sleep_seconds_total", "Seconds spent waiting for the shared rate limiter per agent.")
 
 class SmartGemini(Gemini):
     """
     A wrapper around the ADK Gemini model that implements 
-    logic-based retries. It blocks execution until the API succeeds 
-    or max retries are hit.
+    logic-based retries. It blocks execution until the API succeeds,
+    max retries or the MAX_MODEL_WAIT budget are hit, or the breaker opens.
+    Every attempt first takes from the shared rate_limiter budget for the model
+    and checks the shared circuit_breaker.
+    The async path goes through model_backends (RELIEF_MODEL_BACKEND), so the
+    same agents can run against recorded or scripted responses offline.
     """
     def __init__(self, model: str, **kwargs):
         super().__init__(model=model, **kwargs)
@@ -27,79 +72,91 @@ class SmartGemini(Gemini):
         delay = min(60, 2 * (2 ** attempt))
         return delay * (0.5 + random.random() / 2)
 
-    def generate_content(self, *args, **kwargs):
-        """
-        Overrides the base generation method to inject the custom retry loop.
-        """
-        max_retries = 10
-        current_attempt = 0
-
-        while True:
-            try:
-                # Attempt the actual API call
-                return super().generate_content(*args, **kwargs)
-
-            except Exception as e:
-                error_str = str(e)
-                
-                # Check for Rate Limits (429)
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "Quota" in error_str:
-                    current_attempt += 1
-                    if current_attempt > max_retries:
-                        raise e # Give up after 10 tries
-
-                    # 1. Try to get exact time from Google
-                    wait_time = self._extract_wait_time(error_str)
-                    
-                    if wait_time:
-                        wait_time += 1.0 # Add 1s buffer
-                        print(f"⏳ Backend Rate Limit: Sleeping {wait_time:.2f}s...")
-                    else:
-                        wait_time = self._calculate_backoff(current_attempt)
-                        print(f"⏳ Backend Rate Limit: Backing off {wait_time:.2f}s...")
-                    
-                    time.sleep(wait_time)
-                    continue # Retry the loop
-                
-                # Re-raise other errors immediately
-                raise e
+    def _retry_wait(self, error_str, attempt):
+        """Seconds to back off after a 429: Google's 'retry in' hint + 1s, else exponential."""
+        wait_time = self._extract_wait_time(error_str)
+        return wait_time + 1.0 if wait_time else self._calculate_backoff(attempt)
 
     async def generate_content_async(self, *args, **kwargs):
         """
-        Async version with retry logic for A2A backend calls.
+        Retry loop for A2A backend calls. Gives up with ModelUnavailable when the
+        circuit breaker is open or the next wait would go past MAX_MODEL_WAIT: the
+        caller answers with the degraded-mode fallback instead of holding its
+        worker for minutes. Breaker and rate bucket writes run in threads.
         """
         max_retries = 10
         current_attempt = 0
 
+        # Read before the call: the base class strips labels for the Gemini API backend
+        llm_request = args[0] if args else kwargs.get("llm_request")
+        labels = (llm_request.config.labels or {}) if llm_request and llm_request.config else {}
+        agent = labels.get("adk_agent_name", self.model)
+        instruction = _instruction_text(llm_request) if llm_request else ""
+        estimated = rate_limiter.estimate_request_tokens(llm_request)
+        deadline = time.monotonic() + circuit_breaker.MAX_MODEL_WAIT
+
         while True:
+            # Checked every attempt: another call may have opened the breaker while we slept
+            allowed = await circuit_breaker.allow_async(self.model)
+            if allowed == "open":
+                LLM_CALLS.inc(agent=agent, model=self.model, outcome="circuit_open")
+                raise circuit_breaker.ModelUnavailable(f"{self.model} circuit breaker is open")
+
+            # Wait for the shared quota (offline backends have none), but not past the wait budget
+            try:
+                waited = 0 if model_backends.is_offline() else await rate_limiter.acquire_async(
+                    self.model, estimated, max_wait=max(0.0, deadline - time.monotonic()))
+            except TimeoutError as e:
+                LLM_CALLS.inc(agent=agent, model=self.model, outcome="wait_budget")
+                raise circuit_breaker.ModelUnavailable(str(e)) from e
+            if waited:
+                LLM_SLEEP.inc(waited, agent=agent)
+
             try:
-                # Attempt the actual async API call
-                async for response in super().generate_content_async(*args, **kwargs):
-                    yield response
-                return  # Success, exit the retry loop
+                started = time.perf_counter()
+                live_call = lambda: super(SmartGemini, self).generate_content_async(*args, **kwargs)
+                # Collected before yielding: ADK runs the requested tools (and sub-agents) while
+                # this generator is suspended, so bookkeeping after a yield would include their time
+                responses = [response async for response in model_backends.generate(agent, llm_request, live_call)]
+                usage = next((r.usage_metadata for r in reversed(responses) if r.usage_metadata), None)
+                LLM_LATENCY.observe(time.perf_counter() - started, agent=agent)
+                LLM_CALLS.inc(agent=agent, model=self.model, outcome="ok")
+                LLM_RESPONSE_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, agent=agent)
+                record_prompt(agent, instruction, usage)
+                if not model_backends.is_offline():
+                    # Bucket writes run in a thread: they can wait on the SQLite write lock
+                    await asyncio.to_thread(rate_limiter.settle, self.model, estimated, getattr(usage, "total_token_count", 0) or 0)
+                await circuit_breaker.record_success_async(self.model, allowed)
 
             except Exception as e:
                 error_str = str(e)
                 
                 # Check for Rate Limits (429)
                 if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "Quota" in error_str:
+                    LLM_CALLS.inc(agent=agent, model=self.model, outcome="rate_limited")
                     current_attempt += 1
-                    if current_attempt > max_retries:
-                        print(f"❌ Backend: Rate limit exceeded after {max_retries} retries")
-                        raise e # Give up after 10 tries
-
-                    # 1. Try to get exact time from Google
-                    wait_time = self._extract_wait_time(error_str)
+                    state = await circuit_breaker.record_failure_async(self.model)
+                    wait_time = self._retry_wait(error_str, current_attempt)
+                    if state == "open" or current_attempt > max_retries or time.monotonic() + wait_time > deadline:
+                        print(f"❌ Backend: {agent} gave up after {current_attempt} rate limited attempt(s) (breaker {state})")
+                        raise circuit_breaker.ModelUnavailable(f"{self.model} rate limited: {error_str}") from e
+                    print(f"⏳ Backend Rate Limit: Backing off {wait_time:.2f}s... (attempt {current_attempt}/{max_retries})")
                     
-                    if wait_time:
-                        wait_time += 1.0 # Add 1s buffer
-                        print(f"⏳ Backend Rate Limit: Sleeping {wait_time:.2f}s... (attempt {current_attempt}/{max_retries})")
-                    else:
-                        wait_time = self._calculate_backoff(current_attempt)
-                        print(f"⏳ Backend Rate Limit: Backing off {wait_time:.2f}s... (attempt {current_attempt}/{max_retries})")
-                    
-                    await asyncio.sleep(wait_time)
+                    # Blocks both processes; acquire_async() does the waiting
+                    await asyncio.to_thread(rate_limiter.penalize, self.model, wait_time)
+                    LLM_RETRIES.inc(agent=agent)
                     continue # Retry the loop
+
+                # 5xx: the service is down, not just busy - count it and fail fast
+                if isinstance(e, ServerError):
+                    LLM_CALLS.inc(agent=agent, model=self.model, outcome="unavailable")
+                    await circuit_breaker.record_failure_async(self.model)
+                    raise circuit_breaker.ModelUnavailable(f"{self.model} unavailable: {error_str}") from e
                 
                 # Re-raise other errors immediately
-                raise e
\ No newline at end of file
+                LLM_CALLS.inc(agent=agent, model=self.model, outcome="error")
+                raise e
+
+            for response in responses:
+                yield response
+            return  # Success, exit the retry loop
@@ -0,0 +1,52 @@
+"""
+Benchmark: live-queue queries as request history grows, with and without archival.
+
+For each history size, seeds that many terminal-state requests plus a fixed
+set of 200 live ones, times the supervisor queue query and the /debug full
+listing, then archives the terminal rows and times them again.
+
+    python benchmarks/bench_archive.py [size ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+
+QUEUE_SQL = database.requests_by_status_sql(len(database.OPEN_STATUSES))  # /api/supervisor_data
+DEBUG_SQL = "SELECT * FROM requests ORDER BY id DESC"
+
+def timed(sql: str, params: tuple = (), repeat: int = 20) -> float:
+    conn = database.get_db_connection()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 500_000]
+    print(f"{'history':>8} | {'queue ms':>9} {'archived':>9} | {'debug ms':>9} {'archived':>9}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DB_FILE = os.path.join(tmp, "archive.db")
+            database.init_db()
+            with database.transaction() as conn:
+                conn.executemany(
+                    "INSERT INTO requests (item_name, quantity, location, status, urgency, notes, session_id, updated_at) "
+                    "VALUES ('water_bottles', 5, 'Delhi', ?, 'NORMAL', 'history', NULL, 0)",
+                    [(random.choice(database.TERMINAL_STATUSES),) for _ in range(size)])
+                conn.executemany(
+                    "INSERT INTO requests (item_name, quantity, location, status, urgency, notes) "
+                    "VALUES ('tents', 5, 'Pune', ?, 'NORMAL', 'live')",
+                    [(random.choice(("PENDING", "ACTION_REQUIRED", "PENDING_DISPATCH")),) for _ in range(200)])
+            queue_before, debug_before = timed(QUEUE_SQL, database.OPEN_STATUSES), timed(DEBUG_SQL, repeat=3)
+            database.archive_completed_requests(retention_seconds=0)
+            queue_after, debug_after = timed(QUEUE_SQL, database.OPEN_STATUSES), timed(DEBUG_SQL, repeat=3)
+            print(f"{size:>8} | {queue_before:>9.2f} {queue_after:>9.2f} | {debug_before:>9.1f} {debug_after:>9.1f}")
+            database.close_db_connection()
+
+if __name__ == "__main__":
+    main()
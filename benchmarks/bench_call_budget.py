@@ -0,0 +1,160 @@
+"""
+Benchmark: model-call budget per conversation scenario.
+
+Runs canonical victim and supervisor conversations through the real agent
+tree (router, orchestrators, sub-agents, tools, database) with an offline
+model backend (scripted by default, or replay via RELIEF_MODEL_BACKEND), and
+counts per scenario: model calls, estimated prompt tokens, tool calls
+(including AgentTool delegations), SQL statements and wall time. Each
+scenario starts from a freshly seeded database.
+
+Fails (exit 1) when a scenario goes over its budget in call_budgets.json
+(prompt tokens get 10% slack), e.g. after a prompt edit adds a delegation
+hop. After an intended change, rewrite the budgets with --update.
+
+    python benchmarks/bench_call_budget.py [--update] [scenario ...]
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("RELIEF_MODEL_BACKEND", "scripted")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import circuit_breaker
+import database
+from backend import model_backends, smart_model
+from backend.manager_orchestrator import manager_orchestrator
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+BUDGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "call_budgets.json")
+BUDGETED = ("model_calls", "prompt_tokens", "tool_calls", "db_statements")
+TOKEN_SLACK = 0.10  # prompt wording tweaks pass; a new hop adds a whole prompt and doesn't
+
+def pending_requests(*items):
+    """Setup: PENDING requests waiting for supervisor approval; returns their ids."""
+    return [database.create_request(name, qty, "Riverside School", "PENDING", "NORMAL", "Awaiting approval")
+            for name, qty in items]
+
+# name -> (persona, messages in one session, optional setup returning format args)
+SCENARIOS = {
+    "single_item": ("victim", ["I need 10 water bottles at Riverside School"], None),
+    "multi_item": ("victim", ["I need 5 water bottles, 2 blankets and 3 medical kits at Riverside School"], None),
+    "missing_location": ("victim", ["please send 3 water bottles", "to Hill Camp"], None),
+    "unknown_item": ("victim", ["need 2 unicorn saddles at Camp X"], None),
+    "restock_below": ("supervisor", ["restock all items below 20 by 5"], None),
+    "batch_approve": ("supervisor", ["approve requests {0}, {1} and {2}"],
+                      lambda: pending_requests(("tents", 2), ("blankets", 4), ("food_packs", 6))),
+}
+
+# --- COUNTERS ---
+COUNTS = {"model_calls": 0, "tool_calls": 0, "db_statements": 0}
+_count_lock = threading.Lock()
+
+def _bump(name: str, amount: int = 1):
+    with _count_lock:
+        COUNTS[name] += amount
+
+def _count_statements(statement):
+    _bump("db_statements")
+
+_open_connection = database._open_connection
+def traced_connection(*args, **kwargs):
+    conn = _open_connection(*args, **kwargs)
+    conn.set_trace_callback(_count_statements)
+    return conn
+database._open_connection = traced_connection
+
+_generate = model_backends.generate
+async def counted_generate(agent, llm_request, live_call):
+    _bump("model_calls")
+    async for response in _generate(agent, llm_request, live_call):
+        parts = (response.content.parts or []) if response.content else []
+        _bump("tool_calls", sum(1 for part in parts if part.function_call))
+        yield response
+model_backends.generate = counted_generate
+
+# --- RUNNER ---
+async def converse(persona: str, messages: list[str]) -> list[str]:
+    runner = InMemoryRunner(agent=manager_orchestrator, app_name="budget")
+    session = await runner.session_service.create_session(app_name="budget", user_id=persona)
+    replies = []
+    for text in messages:
+        message = types.Content(role="user", parts=[types.Part(text=f"[[SOURCE: {persona.upper()}]] {text}")])
+        reply = ""
+        async for event in runner.run_async(user_id=persona, session_id=session.id, new_message=message):
+            if event.is_final_response() and event.content and event.content.parts:
+                reply = event.content.parts[0].text or reply
+        replies.append(reply)
+    return replies
+
+def run_scenario(tmp: str, name: str) -> dict:
+    persona, messages, setup = SCENARIOS[name]
+    database.DB_FILE = os.path.join(tmp, f"{name}.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()
+        if setup:
+            args = setup()
+            messages = [m.format(*args) for m in messages]
+        before = smart_model.prompt_stats()  # process-wide counters: count this scenario's share
+        circuit_breaker._clean_until.clear()  # each scenario pays its own breaker read
+        for key in COUNTS:
+            COUNTS[key] = 0
+        start = time.perf_counter()
+        replies = asyncio.run(converse(persona, messages))
+        elapsed = time.perf_counter() - start
+        database.close_db_connection()
+    scenario = {agent: {key: stats[key] - before.get(agent, {}).get(key, 0) for key in ("calls", "prompt_tokens")}
+                for agent, stats in smart_model.prompt_stats().items()}
+    result = dict(COUNTS, wall_seconds=round(elapsed, 3),
+                  prompt_tokens=int(sum(s["prompt_tokens"] for s in scenario.values())),
+                  per_agent={agent: s["calls"] for agent, s in scenario.items() if s["calls"]},
+                  reply=replies[-1])
+    return result
+
+def main():
+    args = sys.argv[1:]
+    update = "--update" in args
+    names = [a for a in args if a != "--update"] or list(SCENARIOS)
+    budgets = json.load(open(BUDGETS_FILE)) if os.path.exists(BUDGETS_FILE) else {}
+
+    print(f"model backend: {model_backends.MODEL_BACKEND}")
+    print(f"{'scenario':<18} {'model':>6} {'tokens':>8} {'tools':>6} {'sql':>6} {'wall':>8}  budget")
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            result = run_scenario(tmp, name)
+            budget = budgets.get(name, {})
+            limits = {key: budget[key] * (1 + TOKEN_SLACK) if key == "prompt_tokens" else budget[key]
+                      for key in BUDGETED if key in budget}
+            over = [f"{key} {result[key]} > {budget[key]}" for key, limit in limits.items() if result[key] > limit]
+            status = "OVER: " + ", ".join(over) if over else ("ok" if budget else "none")
+            print(f"{name:<18} {result['model_calls']:>6} {result['prompt_tokens']:>8} {result['tool_calls']:>6} "
+                  f"{result['db_statements']:>6} {result['wall_seconds']:>7.2f}s  {status}")
+            if over:
+                failures.append(name)
+                print(f"    model calls per agent: {result['per_agent']}")
+                print(f"    last reply: {result['reply'][:200]}")
+            if update:
+                budgets[name] = {key: result[key] for key in BUDGETED}
+
+    if update:
+        with open(BUDGETS_FILE, "w") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+        print(f"Budgets written to {BUDGETS_FILE}")
+        return
+    if failures:
+        print(f"❌ Over budget: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ All scenarios within budget")
+
+if __name__ == "__main__":
+    main()
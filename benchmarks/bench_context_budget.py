@@ -0,0 +1,126 @@
+"""
+Benchmark: victim_orchestrator prompt size over a long chat.
+
+Runs one long victim conversation (orders with a location, orders whose
+location comes in the next message) through the real agent tree with the
+scripted model backend, once with history compaction off and once on
+(backend/conversation_context.py), and reports the victim_orchestrator
+prompt per turn: estimated tokens of the largest call and of the history
+sent ahead of the current turn.
+
+Checks with compaction on:
+  - the history ahead of the current turn never exceeds RELIEF_CONTEXT_TOKENS
+    plus the summary
+  - the largest prompt in the second half of the chat is no bigger than in
+    the first (within 5%): doubling the chat doesn't grow the prompt
+  - every order is dispatched exactly once, including the opening order whose
+    location only comes in the next message (run with RELIEF_CONTEXT_TOKENS=0
+    to fold every finished turn, so it can only be completed from the summary)
+
+    python benchmarks/bench_context_budget.py [turns]
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+TMP = tempfile.mkdtemp()
+os.environ["RELIEF_MODEL_BACKEND"] = "scripted"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database
+import rate_limiter
+from backend import conversation_context, model_backends
+from backend.manager_orchestrator import manager_orchestrator
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+ITEMS = ["batteries", "water bottles", "tents", "flashlights"]
+PLACES = ["Hill Camp", "Riverside School", "North Shelter", "Old Mill"]
+
+def conversation(turns: int) -> tuple[list[str], dict]:
+    """
+    An order whose location comes next, then cycles of: order with a location,
+    order without one, a location (whole cycles). Also returns units per item.
+    """
+    messages, expected = ["please send 3 tents", "to Hill Camp"], {"tents": 3}
+    for cycle in range(max(1, (turns - 1) // 3)):
+        item, place = ITEMS[cycle % len(ITEMS)], PLACES[cycle % len(PLACES)]
+        messages += [f"I need 2 {item} at {place}", f"please send 1 {item}", f"to {place}"]
+        key = item.replace(" ", "_")
+        expected[key] = expected.get(key, 0) + 3
+    return messages, expected
+
+# --- MEASURING ---
+CALLS = []  # victim_orchestrator calls of the current turn: (prompt tokens, history tokens, summary tokens)
+
+_generate = model_backends.generate
+async def measured_generate(agent, llm_request, live_call):
+    if agent == "victim_orchestrator":
+        turns = conversation_context.split_turns(llm_request.contents or [])
+        history = [c for turn in turns[:-1] for c in turn]
+        summary = sum(conversation_context.content_tokens(c) for c in history
+                      if any((p.text or "").startswith(conversation_context.SUMMARY_TAG) for p in c.parts or []))
+        instruction = str(llm_request.config.system_instruction or "")
+        prompt = rate_limiter.estimate_tokens(instruction) + sum(conversation_context.content_tokens(c) for c in llm_request.contents or [])
+        CALLS.append((prompt, sum(conversation_context.content_tokens(c) for c in history), summary))
+    async for response in _generate(agent, llm_request, live_call):
+        yield response
+model_backends.generate = measured_generate
+
+async def converse(messages: list[str]) -> list[dict]:
+    runner = InMemoryRunner(agent=manager_orchestrator, app_name="context")
+    session = await runner.session_service.create_session(app_name="context", user_id="victim")
+    per_turn = []
+    for text in messages:
+        CALLS.clear()
+        message = types.Content(role="user", parts=[types.Part(text=f"[[SOURCE: VICTIM]] {text}")])
+        async for _ in runner.run_async(user_id="victim", session_id=session.id, new_message=message):
+            pass
+        per_turn.append({"prompt": max(c[0] for c in CALLS), "history": max(c[1] for c in CALLS),
+                         "over": max(c[1] - c[2] for c in CALLS) - conversation_context.CONTEXT_TOKENS})
+    return per_turn
+
+def run(label: str, messages: list[str], compaction: bool) -> tuple[list[dict], dict]:
+    conversation_context.CONTEXT_COMPACTION = compaction
+    database.DB_FILE = os.path.join(TMP, f"{label}.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()
+        before = {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+        per_turn = asyncio.run(converse(messages))
+        after = {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+        database.close_db_connection()
+    return per_turn, {item: before[item] - after[item] for item in before if before[item] != after[item]}
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    messages, expected = conversation(turns)
+    turns = len(messages)
+    print(f"{turns} victim turns, RELIEF_CONTEXT_TOKENS={conversation_context.CONTEXT_TOKENS}")
+
+    results = {"off": run("off", messages, False), "on": run("on", messages, True)}
+    marks = sorted({1, 5, 10, 20, 30, 40, turns // 2, turns} & set(range(1, turns + 1)))
+    print(f"{'turn':>5} " + " ".join(f"{'prompt ' + label:>11} {'history ' + label:>11}" for label in results))
+    for turn in marks:
+        print(f"{turn:>5} " + " ".join(f"{per_turn[turn - 1]['prompt']:>11} {per_turn[turn - 1]['history']:>11}"
+                                       for per_turn, _ in results.values()))
+
+    on, dispatched = results["on"]
+    half = turns // 2
+    largest = lambda per_turn, part: max(t["prompt"] for t in (per_turn[:half] if part == 0 else per_turn[half:]))
+    print(f"largest prompt, first vs second half: {largest(on, 0)} vs {largest(on, 1)} with compaction, "
+          f"{largest(results['off'][0], 0)} vs {largest(results['off'][0], 1)} without")
+    checks = {
+        "history within RELIEF_CONTEXT_TOKENS + summary": all(t["over"] <= 0 for t in on),
+        "second half's largest prompt within 5% of the first half's": largest(on, 1) <= largest(on, 0) * 1.05,
+        f"every order dispatched once {expected}": dispatched == expected,
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: victim messages answered by the rule-based fast path.
+
+Runs a mix of typical chat messages through fast_path.handle_victim_message
+against a throwaway database. It reports how many were answered without the
+agent chain and the latency of those answers. Each message that falls through
+still costs at least six LLM calls, each paced by MIN_GAP in agent_worker.
+
+    python benchmarks/bench_fast_path.py
+"""
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+import fast_path
+import tools_client
+
+MESSAGES = [
+    "need 20 water bottles at Delhi",
+    "[[SOURCE: VICTIM]] I need 5 tents and 10 blankets in Chennai",
+    "please send 3 medkits to Pune",
+    "we need 2 food packs, 4 batteries and 1 flashlight at Guwahati",
+    "urgent: 6 medical kits at Kochi",
+    "Can you send 12 water bottles to Shimla?",
+    "need 20 water bottles",                 # no location -> agents
+    "at Delhi",                              # follow-up -> agents
+    "need 10 helicopters at Delhi",          # unknown item -> agents (escalation)
+    "my house is flooded, what should I do", # free text -> agents
+]
+ROUNDS = 20
+
+def main():
+    tools_client.log_to_supervisor_activity = lambda *args, **kwargs: None  # no frontend running
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "fast_path.db")
+        database.init_db()
+        database.increment_stock("water_bottles", 1_000_000)
+
+        handled, latencies = 0, []
+        for _ in range(ROUNDS):
+            for message in MESSAGES:
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    reply = fast_path.handle_victim_message(message)
+                if reply is not None:
+                    handled += 1
+                    latencies.append((time.perf_counter() - start) * 1000)
+        database.flush_activity_logs()
+        database.close_db_connection()
+
+    total = ROUNDS * len(MESSAGES)
+    latencies.sort()
+    print(f"{total} messages, {handled} answered by the fast path ({handled / total:.0%})")
+    print(f"fast path latency: median {statistics.median(latencies):.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms")
+    print(f"agent chain for the same messages: >= 6 LLM calls x MIN_GAP 6s = 36s+ each")
+
+if __name__ == "__main__":
+    main()
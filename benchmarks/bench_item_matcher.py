@@ -0,0 +1,64 @@
+"""
+Benchmark: item-name lookups/sec for the trigram ItemMatcher vs. the old
+difflib.get_close_matches scan, at several catalog sizes. Also reports how
+often the two disagree on the matched key.
+
+    python benchmarks/bench_item_matcher.py [size ...]
+"""
+import os
+import random
+import string
+import sys
+import time
+from difflib import get_close_matches
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from item_resolver import ItemMatcher, FUZZY_CUTOFF
+
+WORDS = ["water", "bottles", "food", "packs", "medical", "kits", "blankets", "batteries", "tents",
+         "flashlights", "rope", "tarp", "soap", "diapers", "insulin", "masks", "gloves", "radio",
+         "stove", "fuel", "rice", "flour", "sugar", "salt", "milk", "formula", "buckets", "shovels"]
+
+def catalog(size: int) -> list[str]:
+    random.seed(size)
+    names = set()
+    while len(names) < size:
+        words = random.sample(WORDS, random.randint(1, 3))
+        suffix = f"_{random.randint(1, size)}" if size > 100 else ""
+        names.add("_".join(words) + suffix)
+    return sorted(names)
+
+def typo(name: str) -> str:
+    chars = list(name)
+    i = random.randrange(len(chars))
+    chars[i] = random.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+def old_lookup(name: str, items: list[str]):
+    matches = get_close_matches(name, items, n=1, cutoff=FUZZY_CUTOFF)
+    return matches[0] if matches else None
+
+def rate(fn, queries) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return len(queries) / (time.perf_counter() - start)
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [10, 1_000, 50_000]
+    print(f"{'items':>7} | {'difflib/s':>10} | {'trigram/s':>10} | {'build ms':>8} | agree")
+    for size in sizes:
+        items = catalog(size)
+        queries = [typo(random.choice(items)) for _ in range(200)]
+        start = time.perf_counter()
+        matcher = ItemMatcher(items)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        old_queries = queries[: max(5, 2000 // max(size // 100, 1))]
+        old_rate = rate(lambda q: old_lookup(q, items), old_queries)
+        new_rate = rate(lambda q: matcher.match(q), queries)
+        agree = sum(old_lookup(q, items) == matcher.match(q)[0] for q in old_queries) / len(old_queries)
+        print(f"{size:>7} | {old_rate:>10,.0f} | {new_rate:>10,.0f} | {build_ms:>8.1f} | {agree:.0%}")
+
+if __name__ == "__main__":
+    main()
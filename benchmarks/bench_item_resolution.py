@@ -0,0 +1,62 @@
+"""
+Benchmark: item_finder_agent model calls per multi-item victim request.
+
+Before, victim_orchestrator called item_finder_agent (one Gemini call) for
+every item. Now it calls the local find_item tool and only falls back to the
+agent when find_item answers UNSURE. A stand-in for the model counts those
+fallbacks over a set of realistic multi-item orders.
+
+    python benchmarks/bench_item_resolution.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+import tools_client
+
+ORDERS = [
+    ["water bottles", "tents", "blankets"],
+    ["tent", "battery", "torch"],
+    ["water bootle", "medkit"],
+    ["food pack", "first aid kit", "flash light", "blanket"],
+    ["Medical Kits", "Water-Bottle", "batteries", "shelter"],
+    ["helicopters", "blankets"],
+    ["rations", "drinking water", "tarpaulin"],
+    ["flashlight", "food", "cells", "quilts"],
+]
+
+class FakeItemFinder:
+    """Counts the calls that would have gone to the item_finder_agent model."""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, item_name: str) -> str:
+        self.calls += 1
+        return "None"
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "resolution.db")
+        database.init_db()
+        finder = FakeItemFinder()
+        items = before = 0
+        start = time.perf_counter()
+        for order in ORDERS:
+            for item in order:
+                items += 1
+                before += 1  # old flow: one item_finder_agent call per item
+                if tools_client.find_item(item).startswith("UNSURE"):
+                    finder(item)
+        elapsed = (time.perf_counter() - start) * 1000
+        database.close_db_connection()
+
+    print(f"{len(ORDERS)} orders, {items} items")
+    print(f"item_finder model calls before: {before} ({before / len(ORDERS):.2f}/order)")
+    print(f"item_finder model calls after:  {finder.calls} ({finder.calls / len(ORDERS):.2f}/order)")
+    print(f"local resolution time for all items: {elapsed:.1f} ms")
+
+if __name__ == "__main__":
+    main()
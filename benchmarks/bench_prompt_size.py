@@ -0,0 +1,50 @@
+"""
+Benchmark: system-instruction size per LLM call for the victim agents,
+old layout (full item list embedded) vs. catalog summary + search_catalog.
+
+The old prompts pasted the full list once into strategist_agent and
+item_finder_agent and five times into victim_orchestrator. "before" is the
+current instruction with the summary swapped for that many copies of the
+full list. Tokens are estimated at ~4 chars/token (rate_limiter.estimate_tokens);
+at runtime SmartGemini logs the API's real prompt_token_count per agent.
+
+    python benchmarks/bench_prompt_size.py [catalog_size ...]
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+import item_resolver
+from bench_item_matcher import catalog
+from rate_limiter import estimate_tokens
+
+OLD_EMBEDS = {"strategist_agent": 1, "item_finder_agent": 1, "victim_orchestrator": 5}
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [0, 200, 2000]
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "prompt_size.db")
+        database.init_db()
+        from backend import agents_victim
+        agents = [agents_victim.strategist_agent, agents_victim.item_finder_agent, agents_victim.victim_orchestrator]
+
+        print(f"{'items':>6} {'agent':<20} {'before':>8} {'after':>7}")
+        for extra in sizes:
+            with database.transaction():
+                for name in catalog(extra) if extra else []:
+                    database.get_db_connection().execute(
+                        "INSERT OR IGNORE INTO inventory (item_name, quantity) VALUES (?, 7777)", (name,))
+            names = database.get_all_item_names()
+            full_list = ", ".join(names)
+            summary = item_resolver.catalog_summary()
+            for agent in agents:
+                after = agent.instruction(None)
+                before = after.replace(summary, full_list) + full_list * (OLD_EMBEDS[agent.name] - 1)
+                print(f"{len(names):>6} {agent.name:<20} {estimate_tokens(before):>8} {estimate_tokens(after):>7}")
+            database.get_db_connection().execute("DELETE FROM inventory WHERE quantity = 7777")
+        database.close_db_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark: database round trips on the request_relief path.
+
+Runs the same sequence of helper calls a single request_relief makes, once with
+the per-thread pooled connection and once with a fresh connect per call (the old
+behaviour), and prints ops/sec for both.
+
+    python benchmarks/bench_request_path.py [iterations]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+
+def request_path_once(i: int):
+    # Mirrors request_relief: normalize -> stock -> session lookup -> dispatch
+    database.get_all_item_names()
+    stock = database.get_item_stock("water_bottles")
+    database.get_db_connection().execute(
+        'SELECT session_id FROM active_sessions WHERE location = "ACTIVE" ORDER BY timestamp DESC LIMIT 1'
+    ).fetchone()
+    database.register_active_session(f"bench_{i % 50}", "Delhi")
+    database.update_stock("water_bottles", stock)
+
+def connect_per_call() -> sqlite3.Connection:
+    conn = sqlite3.connect(database.DB_FILE, timeout=30.0, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def run(label: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        request_path_once(i)
+    elapsed = time.perf_counter() - start
+    ops = iterations * 5 / elapsed
+    print(f"{label:<22} {iterations} requests in {elapsed:.3f}s -> {ops:,.0f} db ops/sec")
+    return ops
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+
+        pooled = database.get_db_connection
+        database.get_db_connection = connect_per_call
+        before = run("connect-per-call", iterations)
+        database.get_db_connection = pooled
+        after = run("pooled connection", iterations)
+        print(f"speedup: {after / before:.1f}x")
+        database.close_db_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark: restock latency against a large PENDING_DISPATCH backlog.
+
+Seeds N pending requests for one item, restocks enough to cover ~all of them
+and times tools_client.process_pending_dispatches. HTTP notifications are
+stubbed out so only the allocation + DB work is measured.
+
+    python benchmarks/bench_restock_dispatch.py [pending_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+import tools_client
+
+ITEM = "water_bottles"
+
+def main():
+    pending_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    tools_client.log_to_supervisor_activity = lambda *a, **k: None
+    tools_client.send_victim_chat_message = lambda *a, **k: None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "restock.db")
+        database.init_db()
+        conn = database.get_db_connection()
+        with database.transaction():
+            conn.executemany(
+                "INSERT INTO requests (item_name, quantity, location, status, urgency, notes, session_id) "
+                "VALUES (?, ?, ?, 'PENDING_DISPATCH', 'NORMAL', 'bench', ?)",
+                [(ITEM, 5, f"loc_{i % 100}", f"sess_{i}") for i in range(pending_rows)]
+            )
+        # Cover all but the last few rows so the partial/remainder path runs too
+        database.update_stock(ITEM, pending_rows * 5 - 12)
+
+        start = time.perf_counter()
+        messages = tools_client.process_pending_dispatches(ITEM)
+        elapsed = time.perf_counter() - start
+
+        left = conn.execute("SELECT count(*) FROM requests WHERE status = 'PENDING_DISPATCH'").fetchone()[0]
+        print(f"{pending_rows} pending rows -> {len(messages)} dispatched in {elapsed * 1000:.1f} ms "
+              f"(stock left {database.get_item_stock(ITEM)}, still pending {left})")
+        database.close_db_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: ADK session storage under many victim sessions.
+
+Fills InMemorySessionService and session_store.SqliteSessionService with the
+same conversations (a victim turn's worth of events per turn: user message,
+tool calls and results, reply) and reports per service: Python heap held
+after loading (tracemalloc), append_event and get_session latency, and for
+SQLite the database size per event. Then checks the event cap and the idle
+TTL sweep.
+
+    python benchmarks/bench_session_store.py [sessions] [turns per session]
+
+Defaults to 500 sessions x 4 turns (well under a minute). tracemalloc slows
+every allocation, so thousands of sessions take many minutes.
+"""
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+TMP = tempfile.mkdtemp()
+os.environ["RELIEF_DB_PATH"] = os.path.join(TMP, "sessions.db")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database
+import session_store
+from google.adk.events.event import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+APP = "relief_manager"
+
+def turn_events(session: int, turn: int) -> list[Event]:
+    """The events one victim message leaves in the backend session."""
+    invocation = f"e-{session}-{turn}"
+    request = {"item_name": "water_bottles", "quantity": 5 + turn, "location": f"Camp {session}"}
+    result = json.dumps({"status": "APPROVED", "request_id": session * 10 + turn,
+                         "summary": f"5 water_bottles approved and dispatched to Camp {session}."})
+    content = lambda role, **part: types.Content(role=role, parts=[types.Part(**part)])
+    return [
+        Event(invocation_id=invocation, author="user",
+              content=content("user", text=f"[[SOURCE: VICTIM]] I need {5 + turn} water bottles at Camp {session}")),
+        Event(invocation_id=invocation, author="victim_orchestrator",
+              content=content("model", function_call=types.FunctionCall(name="strategist_agent", args={"request": "water"}))),
+        Event(invocation_id=invocation, author="victim_orchestrator",
+              content=content("user", function_response=types.FunctionResponse(
+                  name="strategist_agent", response={"result": "Items: water bottles | Quantities: 5 | Location: Camp | Missing: none"}))),
+        Event(invocation_id=invocation, author="victim_orchestrator",
+              content=content("model", function_call=types.FunctionCall(name="request_dispatcher_agent", args={"request": json.dumps(request)}))),
+        Event(invocation_id=invocation, author="victim_orchestrator",
+              content=content("user", function_response=types.FunctionResponse(name="request_dispatcher_agent", response={"result": result}))),
+        Event(invocation_id=invocation, author="victim_orchestrator",
+              content=content("model", text=f"Great news! Your water bottles are on their way to Camp {session}. Stay safe!")),
+    ]
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] * 1000
+
+async def load(service, sessions: int, turns: int) -> dict:
+    """Creates every session and appends its turns; returns heap held afterwards and latencies."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    appends, gets = [], []
+    for turn in range(turns):
+        for s in range(sessions):
+            if turn == 0:
+                session = await service.create_session(app_name=APP, user_id="victim", session_id=f"v{s}")
+            else:
+                start = time.perf_counter()
+                session = await service.get_session(app_name=APP, user_id="victim", session_id=f"v{s}")
+                gets.append(time.perf_counter() - start)
+            for event in turn_events(s, turn):
+                start = time.perf_counter()
+                await service.append_event(session, event)
+                appends.append(time.perf_counter() - start)
+            del session
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return {"held_mb": held / 1e6, "append": appends, "get": gets}
+
+def report(name: str, result: dict):
+    get = f"{percentile(result['get'], 0.5):.2f} / {percentile(result['get'], 0.99):.2f}" if result["get"] else "-"
+    print(f"{name:<10} {result['held_mb']:>10.1f} {percentile(result['append'], 0.5):>8.3f} / {percentile(result['append'], 0.99):<8.3f}"
+          f" {get:>15}")
+
+async def main():
+    args = [int(a) for a in sys.argv[1:]]
+    sessions = args[0] if args else 500
+    turns = args[1] if len(args) > 1 else 4
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()
+
+    print(f"{sessions} sessions x {turns} turns ({sessions * turns * 6} events)")
+    print(f"{'service':<10} {'heap MB':>10} {'append p50 / p99 ms':>21} {'get p50 / p99 ms':>15}")
+    report("memory", await load(InMemorySessionService(), sessions, turns))
+    report("sqlite", await load(session_store.SqliteSessionService(), sessions, turns))
+
+    conn = database.get_db_connection()
+    events, blob_bytes = conn.execute("SELECT COUNT(*), SUM(LENGTH(data)) FROM adk_events").fetchone()
+    raw = sum(len(e.model_dump_json(exclude_none=True)) for e in turn_events(0, 0)) / 6
+    print(f"sqlite: {os.path.getsize(database.DB_FILE) / 1e6:.1f} MB on disk, {blob_bytes / events:.0f} bytes per event "
+          f"stored ({raw:.0f} as JSON)")
+
+    # Cap: a long conversation keeps only the most recent whole invocations
+    capped = session_store.SqliteSessionService(max_events=20)
+    session = await capped.create_session(app_name=APP, user_id="victim", session_id="long")
+    for turn in range(50):
+        for event in turn_events(0, turn):
+            await capped.append_event(session, event)
+    kept = (await capped.get_session(app_name=APP, user_id="victim", session_id="long")).events
+    first_turn = [e for e in kept if e.invocation_id == kept[0].invocation_id]
+
+    # Cap without whole invocations to drop: events with no invocation id, and one invocation longer than the cap
+    for name, invocation in (("no-id", ""), ("one-invocation", "e-long")):
+        session = await capped.create_session(app_name=APP, user_id="victim", session_id=name)
+        for turn in range(10):
+            for event in turn_events(0, turn):
+                event.invocation_id = invocation
+                await capped.append_event(session, event)
+    no_id, one_invocation = [(await capped.get_session(app_name=APP, user_id="victim", session_id=name)).events
+                             for name in ("no-id", "one-invocation")]
+
+    # TTL: idle sessions disappear from get/list and the sweep deletes them
+    conn.execute("UPDATE adk_sessions SET update_time = update_time - ? WHERE session_id NOT IN ('long', 'no-id', 'one-invocation')",
+                 (session_store.SESSION_TTL + 1,))
+    expired = await capped.get_session(app_name=APP, user_id="victim", session_id="v0")
+    listed = len((await capped.list_sessions(app_name=APP)).sessions)
+    with contextlib.redirect_stdout(io.StringIO()):
+        capped._last_sweep = 0
+        await capped.create_session(app_name=APP, user_id="victim", session_id="fresh")
+    left = conn.execute("SELECT COUNT(*) FROM adk_events WHERE session_id NOT IN ('long', 'no-id', 'one-invocation', 'fresh')").fetchone()[0]
+
+    checks = {
+        f"event cap holds ({len(kept)} <= 20)": len(kept) <= 20,
+        "cap drops whole invocations": len(first_turn) == 6 and kept[-1].invocation_id == "e-0-49",
+        f"cap holds for events without invocation id ({len(no_id)} <= 20)": 0 < len(no_id) <= 20,
+        f"cap holds for one invocation past the cap ({len(one_invocation)} <= 20)": 0 < len(one_invocation) <= 20,
+        "idle session expired": expired is None,
+        "idle sessions not listed": listed == 3,
+        "sweep deleted idle sessions' events": left == 0,
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    database.close_db_connection()
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Benchmark: frontend agent worker pool throughput and per-session ordering.
+
+Replaces the ADK runners with fakes that take SERVICE_TIME seconds per job
+(a stand-in for the model round-trips), queues JOBS jobs spread over SESSIONS
+victim sessions plus one slow supervisor command, and runs the pool at
+concurrency 1 (the old single-job worker) and at higher concurrency. It
+reports wall time, queue-wait percentiles and whether every session got its
+replies in the order it sent the messages.
+
+    python benchmarks/bench_worker_pool.py [concurrency ...]
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+import frontend_app
+
+JOBS = 60
+SESSIONS = 12
+SERVICE_TIME = 0.1
+SUPERVISOR_TIME = 2.0
+
+class FakeRunner:
+    app_name = "bench"
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.session_service = SimpleNamespace(create_session=self._create_session)
+
+    async def _create_session(self, **kwargs):
+        pass
+
+    async def run_async(self, user_id, session_id, new_message):
+        await asyncio.sleep(self.delay)
+        text = f"reply to {new_message.parts[0].text}"
+        yield SimpleNamespace(is_final_response=lambda: True,
+                              content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))
+
+def run(concurrency):
+    frontend_app.VICTIM_RUNNER = FakeRunner(SERVICE_TIME)
+    frontend_app.SUPERVISOR_RUNNER = FakeRunner(SUPERVISOR_TIME)
+    frontend_app.CHAT_STORE.clear()
+    frontend_app.JOB_RESULTS.clear()
+    for key in ("queue_wait", "service_time"):
+        frontend_app.WORKER_METRICS[key].clear()
+
+    frontend_app.submit_job({"persona": "supervisor", "client_id": "sup", "task_name": "restock all",
+                             "text": "restock everything to 100", "session_id": "supervisor"})
+    for i in range(JOBS):
+        session = f"s{i % SESSIONS}"
+        frontend_app.submit_job({"persona": "victim", "client_id": session, "task_name": f"msg {i}",
+                                 "text": f"message {i // SESSIONS} from {session}", "session_id": session})
+    frontend_app.TASK_QUEUE.put(None)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        frontend_app.agent_worker(concurrency)
+    elapsed = time.perf_counter() - start
+
+    ordered = all(
+        [m["text"] for m in history if m["sender"] == "ai"] ==
+        [f"reply to message {n} from {session}" for n in range(JOBS // SESSIONS)]
+        for session, history in frontend_app.CHAT_STORE.items()
+    )
+    metrics = frontend_app.worker_metrics()
+    print(f"{concurrency:>11} {elapsed:>7.2f}s {metrics['queue_wait']['p50']:>9.2f}s "
+          f"{metrics['queue_wait']['p95']:>9.2f}s {'yes' if ordered else 'NO':>8}")
+
+def main():
+    levels = [int(c) for c in sys.argv[1:]] or [1, 4, 8]
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "worker.db")
+        database.init_db()
+        print(f"{JOBS} victim jobs over {SESSIONS} sessions ({SERVICE_TIME}s each) + 1 supervisor job ({SUPERVISOR_TIME}s)")
+        print(f"{'concurrency':>11} {'wall':>8} {'wait p50':>10} {'wait p95':>10} {'in order':>8}")
+        for level in levels:
+            run(level)
+        database.flush_activity_logs()
+        database.close_db_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Check: supervisor inventory tools resolve item names without victim synonyms.
+
+item_resolver's synonym table maps everyday words to catalog items for
+victims ("medicine" -> medical_kits). The destructive admin tools must not
+follow it, nor loose fuzzy matches ("water" scores 0.75 against batteries):
+deleting "medicine" would delete medical_kits, and adding "water" would be
+refused as an existing item. They still accept exact names, plurals and typos
+scoring at least LOCAL_MATCH_THRESHOLD. Runs the tools on a fresh seeded
+database.
+
+    python benchmarks/check_admin_item_tools.py
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+TMP = tempfile.mkdtemp()
+os.environ["RELIEF_DB_PATH"] = os.path.join(TMP, "admin.db")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database
+import item_resolver
+import tools_supervisor
+
+def stock() -> dict:
+    return {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()
+    before = stock()
+
+    results = {
+        "delete medicine": tools_supervisor.admin_delete_item("medicine"),
+        "restock medicine": tools_supervisor.admin_restock_item("medicine", 5),
+        "add water": tools_supervisor.admin_add_new_item("water", 12),
+        "restock medcal kits (typo)": tools_supervisor.admin_restock_item("medcal kits", 5),
+        "add tent (plural exists)": tools_supervisor.admin_add_new_item("tent", 3),
+        "delete flashlight (plural)": tools_supervisor.admin_delete_item("flashlight"),
+    }
+    for name, reply in results.items():
+        print(f"{name:<28} {reply[:90]}")
+    after = stock()
+
+    checks = {
+        "delete 'medicine' refused, medical_kits kept": results["delete medicine"].startswith("ERROR") and "medical_kits" in after,
+        "restock 'medicine' refused": results["restock medicine"].startswith("ERROR"),
+        "add 'water' creates a new item": after.get("water") == 12 and after["water_bottles"] == before["water_bottles"],
+        "typo still restocks medical_kits": after["medical_kits"] == before["medical_kits"] + 5,
+        "add 'tent' refused (tents exists)": results["add tent (plural exists)"].startswith("ERROR") and "tent" not in after,
+        "delete 'flashlight' deletes flashlights": "flashlights" not in after,
+        "victim resolution keeps synonyms": item_resolver.resolve_item("medicine") == ("medical_kits", True),
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    database.close_db_connection()
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == "__main__":
+    main()
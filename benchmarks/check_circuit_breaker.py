@@ -0,0 +1,123 @@
+"""
+Check: circuit breaker and degraded mode during a model quota outage.
+
+Runs the real A2A backend and frontend worker pool in this process on the
+live model code path (rate limiter, 429 handling, breaker), with the Gemini
+API replaced by a fake: during the outage every call gets a 429 asking for
+a 2s retry; afterwards calls are answered by the scripted agents.
+
+  1. outage: victim messages through the agents; the breaker opens after
+     RELIEF_BREAKER_FAILURES 429s and every job gets the queued fallback reply
+     instead of waiting out 10 retries per model call
+  2. recovery: after the cooldown one message's first model call is the
+     half-open probe; it closes the breaker and messages go through the
+     agents again
+
+    python benchmarks/check_circuit_breaker.py
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+TMP = tempfile.mkdtemp()
+os.environ["RELIEF_DB_PATH"] = os.path.join(TMP, "breaker.db")
+os.environ["RELIEF_FAST_PATH"] = "0"
+os.environ["RELIEF_MODEL_BACKEND"] = "gemini"
+os.environ.setdefault("GOOGLE_API_KEY", "not-used")  # the API is faked below
+os.environ.setdefault("RELIEF_BREAKER_COOLDOWN", "5")
+os.environ.setdefault("RELIEF_RATE_LIMITS", '{"gemini-2.5-flash": [6000, 100000000]}')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import uvicorn
+from google.adk.models.google_llm import Gemini
+import circuit_breaker
+import database
+import manager_server
+import frontend_app
+from backend import model_backends, scripted_agents
+
+OUTAGE = {"on": True, "calls": 0, "rejected": 0}
+MODEL = "gemini-2.5-flash"
+
+async def fake_gemini(self, llm_request, stream=False):
+    OUTAGE["calls"] += 1
+    if OUTAGE["on"]:
+        OUTAGE["rejected"] += 1
+        raise Exception("429 RESOURCE_EXHAUSTED. Quota exceeded for metric generate_content_free_tier_requests. Please retry in 2s.")
+    agent = llm_request.config.labels.get("adk_agent_name")
+    yield model_backends.with_usage(scripted_agents.respond(agent, llm_request), llm_request)
+
+Gemini.generate_content_async = fake_gemini
+
+def start_backend():
+    server = uvicorn.Server(uvicorn.Config(manager_server.app, host="127.0.0.1", port=8001, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def run_jobs(label: str, messages: list[str]) -> dict:
+    frontend_app.initialize_adk_agents()  # the A2A clients belong to the previous run's event loop
+    frontend_app.CHAT_STORE.clear()
+    frontend_app.WORKER_METRICS["service_time"].clear()
+    for i, text in enumerate(messages):
+        frontend_app.submit_job({"persona": "victim", "client_id": f"{label}{i}", "task_name": text,
+                                 "text": text, "session_id": f"{label}{i}"})
+    frontend_app.TASK_QUEUE.put(None)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        frontend_app.agent_worker(4)
+    elapsed = time.perf_counter() - start
+    replies = [h[-1]["text"] for h in frontend_app.CHAT_STORE.values() if h and h[-1]["sender"] == "ai"]
+    service = sorted(frontend_app.WORKER_METRICS["service_time"])
+    return {"elapsed": elapsed, "replies": replies, "max_job": service[-1] if service else 0.0,
+            "degraded": sum("logged it as request #" in r for r in replies)}
+
+def breaker_state() -> str:
+    row = database.get_breaker(MODEL)
+    return f"{row['state']} ({row['failures']} failures)" if row else "closed (no failures)"
+
+def main():
+    server = start_backend()
+    messages = [f"I need {n} water bottles at Camp {n}" for n in range(1, 9)]
+
+    outage = run_jobs("outage", messages)
+    queued = [r for r in database.get_pending_requests() if r["item_name"] == "UNPROCESSED_MESSAGE"]
+    print(f"Outage:   {len(messages)} jobs in {outage['elapsed']:.1f}s, slowest job {outage['max_job']:.1f}s, "
+          f"{outage['degraded']} fallback replies, {len(queued)} queued records, "
+          f"{OUTAGE['rejected']} calls sent to the fake API, breaker {breaker_state()}")
+
+    OUTAGE["on"] = False
+    time.sleep(circuit_breaker.BREAKER_COOLDOWN + 0.5)
+    # One message first: it carries the half-open probe (concurrent jobs would get the fallback meanwhile)
+    probe = run_jobs("probe", messages[:1])
+    print(f"Probe:    1 job in {probe['elapsed']:.1f}s, {probe['degraded']} fallback replies, breaker {breaker_state()}")
+    recovery = run_jobs("recovery", messages[1:4])
+    print(f"Recovery: {len(recovery['replies'])} jobs in {recovery['elapsed']:.1f}s, {recovery['degraded']} fallback replies, "
+          f"breaker {breaker_state()}")
+    server.should_exit = True
+
+    checks = {
+        "every outage job answered": len(outage["replies"]) == len(messages),
+        "outage jobs got the fallback": outage["degraded"] == len(messages),
+        "fallback messages queued for the supervisor": len(queued) == len(messages),
+        "breaker opened after the failure threshold": OUTAGE["rejected"] <= circuit_breaker.BREAKER_FAILURES + 4,
+        f"no job waited past MAX_MODEL_WAIT ({circuit_breaker.MAX_MODEL_WAIT:.0f}s)": outage["max_job"] < circuit_breaker.MAX_MODEL_WAIT,
+        "probe closed the breaker": probe["degraded"] == 0 and len(probe["replies"]) == 1,
+        "recovered through the agents": len(recovery["replies"]) == 3 and recovery["degraded"] == 0,
+        "breaker closed again": breaker_state().startswith("closed"),
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    database.flush_activity_logs()
+    database.close_db_connection()
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Check: the dashboard can resolve a degraded-mode record.
+
+Degraded mode (circuit breaker open) queues victim messages as UNPROCESSED
+requests with no inventory item. Resolving one from the dashboard
+(/api/admin/resolve) must only mark it handled: no phantom inventory item, no
+error, no dispatch. Approving it must be refused, and a restock dispatch must
+not pick it up. Zero-quantity item requests must get an error string from
+resolve and approve, with no restock. Runs on a fresh seeded database with the
+Flask test client.
+
+    python benchmarks/check_degraded_resolve.py
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+TMP = tempfile.mkdtemp()
+os.environ["RELIEF_DB_PATH"] = os.path.join(TMP, "degraded.db")
+os.environ.setdefault("RELIEF_MODEL_BACKEND", "scripted")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database
+import fast_path
+import frontend_app
+import tools_client
+import tools_supervisor
+
+def main():
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_db()
+    items_before = set(database.get_all_item_names())
+    client = frontend_app.app.test_client()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reply = fast_path.degraded_reply("victim", "[[SOURCE: VICTIM]] we are trapped, send help to Hill Camp", "chat-1")
+    queued = [r for r in database.get_pending_requests() if r["item_name"] == "UNPROCESSED_MESSAGE"]
+    request_id = queued[0]["id"] if queued else None
+    board = client.get("/api/supervisor_data").get_json()["requests"]
+
+    approve = tools_supervisor.supervisor_decide_request(request_id, "approve")
+    dispatched = tools_client.process_pending_dispatches("UNPROCESSED_MESSAGE")
+    response = client.post(f"/api/admin/resolve/{request_id}")
+    resolved = database.get_request_by_id(request_id)
+    stock_before = {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+    broken_action = database.create_request("tents", 0, "Hill Camp", "ACTION_REQUIRED", "NORMAL", "corrupted row")
+    broken_pending = database.create_request("tents", 0, "Hill Camp", "PENDING", "NORMAL", "corrupted row")
+    resolve_zero = tools_supervisor.supervisor_resolve_action_required(broken_action)
+    approve_zero = tools_supervisor.supervisor_decide_request(broken_pending, "approve")
+    stock_after = {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+    print(f"fallback reply: {reply[:80]}")
+    print(f"approve: {approve}")
+    print(f"resolve: {response.status_code} {response.get_json()}")
+
+    checks = {
+        "message queued as UNPROCESSED": len(queued) == 1 and queued[0]["status"] == "UNPROCESSED",
+        "shown on the supervisor dashboard": any(r["id"] == request_id for r in board),
+        "approve refused": approve.startswith("Error"),
+        "restock dispatch skips it": dispatched == [],
+        "resolve succeeds": response.status_code == 200 and response.get_json()["success"],
+        "resolved record closed": resolved["status"] == "ACTION_TAKEN",
+        "no inventory item created": set(database.get_all_item_names()) == items_before,
+        "off the attention queue": all(r["id"] != request_id for r in database.get_pending_requests()),
+        "zero-quantity resolve refused, no restock": resolve_zero.startswith("Error") and stock_after == stock_before,
+        "zero-quantity approve refused": approve_zero.startswith("Error"),
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    database.close_db_connection()
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == "__main__":
+    main()
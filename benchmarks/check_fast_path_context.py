@@ -0,0 +1,84 @@
+"""
+Check: fast-path turns reach the agents' conversation context.
+
+Same setup as check_offline_stack (real A2A backend in this process, scripted
+model backend), with the fast path on. One chat: a well-formed order the fast
+path answers, then an order without a location and the location, which go
+through the agents. The fast-path exchange must be in the chat's frontend ADK
+session, the backend's relief_context must list its request, and the agents
+must not dispatch it a second time.
+
+    python benchmarks/check_fast_path_context.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+TMP = tempfile.mkdtemp()
+os.environ["RELIEF_DB_PATH"] = os.path.join(TMP, "fast_path_context.db")
+os.environ.setdefault("RELIEF_MODEL_BACKEND", "scripted")
+os.environ["RELIEF_FAST_PATH"] = "1"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import uvicorn
+import database
+import fast_path
+import manager_server
+import frontend_app
+from backend import conversation_context
+
+CHAT = "chat-1"
+MESSAGES = ["I need 3 tents at Hill Camp", "please send 2 blankets", "to Hill Camp"]
+
+def start_backend():
+    server = uvicorn.Server(uvicorn.Config(manager_server.app, host="127.0.0.1", port=8001, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def main():
+    stock_before = {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+    server = start_backend()
+    frontend_app.initialize_adk_agents()
+
+    # Jobs of one chat run one at a time, in order (the worker pool's per-session lock)
+    for text in MESSAGES:
+        frontend_app.submit_job({"persona": "victim", "client_id": CHAT, "task_name": text, "text": text, "session_id": CHAT})
+    frontend_app.TASK_QUEUE.put(None)
+    frontend_app.agent_worker()
+    server.should_exit = True
+    paths = frontend_app.JOBS.totals("path")
+
+    for message in frontend_app.CHAT_STORE[CHAT]:
+        print(f"{message['sender']}: {message['text']}")
+    frontend_session = asyncio.run(frontend_app.VICTIM_RUNNER.session_service.get_session(
+        app_name=frontend_app.VICTIM_RUNNER.app_name, user_id="victim", session_id=CHAT))
+    recorded = [e for e in frontend_session.events if e.author == "fast_path"]
+    backend_states = [s["state"] for s in database.list_adk_sessions(manager_server.runner.app_name)]
+    requests = [r for state in backend_states for r in state.get(conversation_context.STATE_KEY, {}).get("requests", [])]
+    print(f"\npaths: {paths}")
+    print(f"relief_context requests: {requests}")
+
+    stock = {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+    checks = {
+        "one message took the fast path, two the agents": paths == {"fast_path": 1, "agents": 2},
+        "fast-path exchange in the frontend ADK session": len(recorded) == 1
+                                                          and fast_path.RECORD_TAG in recorded[0].content.parts[-1].text,
+        "relief_context lists the fast-path request": {"item": "tents", "quantity": 3, "status": "DISPATCHED",
+                                                       "request_id": None} in requests,
+        "tents dispatched once (3)": stock_before["tents"] - stock["tents"] == 3,
+        "blankets dispatched (2)": stock_before["blankets"] - stock["blankets"] == 2,
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    database.flush_activity_logs()
+    database.close_db_connection()
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == "__main__":
+    main()
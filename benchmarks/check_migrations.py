@@ -0,0 +1,82 @@
+"""
+Check: database.run_migrations upgrades a pre-versioning database in place.
+
+Builds the schema as the original init_db left it (no schema_version table,
+requests without session_id), seeds a few rows, then runs the migrations:
+the schema must end at the latest version with every row kept (a queued
+degraded-mode message moves to the UNPROCESSED status), and
+create_request with a session_id must work. A second run must apply nothing.
+
+    python benchmarks/check_migrations.py
+"""
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+TMP = tempfile.mkdtemp()
+os.environ["RELIEF_DB_PATH"] = os.path.join(TMP, "legacy.db")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import database
+
+def build_legacy(path: str):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE inventory (item_name TEXT PRIMARY KEY, quantity INTEGER)")
+    conn.execute('''CREATE TABLE requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, item_name TEXT, quantity INTEGER,
+                    location TEXT, status TEXT, urgency TEXT, notes TEXT
+                )''')
+    conn.execute("CREATE TABLE active_sessions (session_id TEXT PRIMARY KEY, location TEXT, timestamp INTEGER)")
+    conn.execute("CREATE TABLE activity_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, action TEXT, type TEXT)")
+    conn.executemany("INSERT INTO inventory VALUES (?, ?)", [("water_bottles", 40), ("tents", 3)])
+    conn.executemany("INSERT INTO requests (item_name, quantity, location, status, urgency, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                     [("tents", 5, "Hill Camp", "PENDING", "HIGH", "Stock out"),
+                      ("water_bottles", 10, "Old Mill", "APPROVED", "NORMAL", "Auto-dispatched"),
+                      ("UNPROCESSED_MESSAGE", 0, "Hill Camp", "ACTION_REQUIRED", "NORMAL", "DEGRADED MODE: handle manually")])
+    conn.execute("INSERT INTO activity_logs (timestamp, action, type) VALUES ('2024-01-01 10:00:00', 'seeded', 'system')")
+    conn.commit()
+    conn.close()
+
+def migrate() -> tuple[int, str]:
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        version = database.run_migrations()
+    return version, out.getvalue()
+
+def main():
+    build_legacy(database.DB_FILE)
+    latest = database.MIGRATIONS[-1][0]
+
+    version, log = migrate()
+    print(log.rstrip())
+    conn = database.get_db_connection()
+    requests = [dict(r) for r in conn.execute("SELECT * FROM requests ORDER BY id")]
+    stock = {r["item_name"]: r["quantity"] for r in conn.execute("SELECT * FROM inventory")}
+    logs = conn.execute("SELECT COUNT(*) FROM activity_logs").fetchone()[0]
+    new_id = database.create_request("blankets", 2, "Hill Camp", "PENDING", "NORMAL", "check", "chat-1")
+    created = database.get_request_by_id(new_id)
+    recorded = conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+
+    again, second_log = migrate()
+    recorded_again = conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+
+    checks = {
+        f"schema at version {latest}": version == latest,
+        "requests rows kept": [(r["item_name"], r["quantity"], r["status"]) for r in requests]
+                              == [("tents", 5, "PENDING"), ("water_bottles", 10, "APPROVED"), ("UNPROCESSED_MESSAGE", 0, "UNPROCESSED")],
+        "old rows got session_id and updated_at": all("session_id" in r and r["updated_at"] for r in requests),
+        "inventory and activity log kept": stock == {"water_bottles": 40, "tents": 3} and logs == 1,
+        "create_request with session_id": created is not None and created["session_id"] == "chat-1",
+        "second run applies nothing": again == latest and second_log == "" and recorded_again == recorded == latest,
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    database.close_db_connection()
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == "__main__":
+    main()
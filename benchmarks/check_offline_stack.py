@@ -0,0 +1,85 @@
+"""
+Check: the whole stack end to end without the Gemini API.
+
+Starts the real A2A backend (manager_server) on port 8001 in this process
+with RELIEF_MODEL_BACKEND=scripted (or replay, if set), points the frontend
+runners at it, and sends victim and supervisor messages through the frontend
+worker pool. Every message takes the agent path (fast path off), so the
+router, orchestrators, sub-agents, tools and database all run. It prints each
+reply and checks the resulting inventory and request rows.
+
+    python benchmarks/check_offline_stack.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+TMP = tempfile.mkdtemp()
+os.environ["RELIEF_DB_PATH"] = os.path.join(TMP, "offline.db")
+os.environ.setdefault("RELIEF_MODEL_BACKEND", "scripted")
+os.environ["RELIEF_FAST_PATH"] = "0"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import uvicorn
+import database
+import manager_server
+import frontend_app
+
+MESSAGES = [
+    ("victim", "v1", "I need 5 water bottles and 2 blankets at Riverside School"),
+    ("victim", "v2", "please send 3 water bottels"),
+    ("victim", "v2", "to Hill Camp"),
+    ("victim", "v3", "need 2 unicorn saddles at Camp X"),
+    ("supervisor", "supervisor", "restock tents by 10"),
+    ("supervisor", "supervisor", "show pending requests"),
+]
+
+def start_backend():
+    server = uvicorn.Server(uvicorn.Config(manager_server.app, host="127.0.0.1", port=8001, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def main():
+    stock_before = {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+    server = start_backend()
+    frontend_app.initialize_adk_agents()
+
+    for persona, session, text in MESSAGES:
+        frontend_app.submit_job({"persona": persona, "client_id": session, "task_name": text,
+                                 "text": text, "session_id": session})
+    frontend_app.TASK_QUEUE.put(None)
+    start = time.perf_counter()
+    frontend_app.agent_worker()
+    elapsed = time.perf_counter() - start
+    server.should_exit = True
+
+    print(f"\n--- {len(MESSAGES)} messages through the {manager_server.model_backends.MODEL_BACKEND} backend in {elapsed:.2f}s ---")
+    for session, history in frontend_app.CHAT_STORE.items():
+        for message in history:
+            print(f"[{session}] {message['sender']}: {message['text']}")
+
+    stock = {r["item_name"]: r["quantity"] for r in database.get_all_items()}
+    checks = {
+        "water_bottles dispatched (5 + 3)": stock_before["water_bottles"] - stock["water_bottles"] == 8,
+        "blankets dispatched (2)": stock_before["blankets"] - stock["blankets"] == 2,
+        "tents restocked (+10)": stock["tents"] - stock_before["tents"] == 10,
+        "unicorn saddles escalated": any("unicorn saddles" in str(r) for r in database.get_pending_requests()),
+        # Chats run concurrently; tools take the session from the A2A metadata, not "latest ACTIVE"
+        "escalation tagged with its own chat (v3)": [r["session_id"] for r in database.get_pending_requests()
+                                                     if r["item_name"] == "unicorn saddles"] == ["v3"],
+        "every message answered": all(len(h) % 2 == 0 for h in frontend_app.CHAT_STORE.values()),
+    }
+    print()
+    for name, ok in checks.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+    database.flush_activity_logs()
+    database.close_db_connection()
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == "__main__":
+    main()
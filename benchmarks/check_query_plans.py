@@ -0,0 +1,44 @@
+"""
+Asserts that the hot queries in database.py are served by their secondary
+indexes (database.INDEXES, database.QUEUE_INDEXES): no full table scan and no
+temp B-tree for ORDER BY. The SQL is database.py's own, so a regression in the
+real queries fails here. Exits non-zero on a regression.
+
+    python benchmarks/check_query_plans.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+
+# (description, sql, params, index expected in the plan)
+HOT_QUERIES = [
+    ("dispatch_pending_requests", database.DISPATCH_QUEUE_SQL, ("water_bottles",), "idx_requests_dispatch_queue"),
+    ("/api/supervisor_data", database.requests_by_status_sql(len(database.OPEN_STATUSES)),
+     database.OPEN_STATUSES, "idx_requests_open_queue"),
+    ("get_pending_requests", database.requests_by_status_sql(3),
+     ("PENDING", "ACTION_REQUIRED", "UNPROCESSED"), "idx_requests_open_queue"),
+    ("get_session_for_location", database.SESSION_FOR_LOCATION_SQL, ("Delhi", 0), "idx_active_sessions_location_ts"),
+    ("clear_old_activity_logs", database.CLEAR_OLD_LOGS_SQL, ("2000-01-01 00:00:00",), "idx_activity_logs_timestamp"),
+]
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "plans.db")
+        database.init_db()
+        for label, sql, params, index in HOT_QUERIES:
+            plan = database.explain_query_plan(sql, params)
+            # Scanning a partial index is fine: it only holds the queue's rows
+            ok = (any(index in line for line in plan)
+                  and not any(line.startswith("SCAN") and index not in line for line in plan)
+                  and not any("TEMP B-TREE" in line for line in plan))
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {label}: {' | '.join(plan)}")
+        database.close_db_connection()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Check: two processes sharing one rate_limiter budget stay within the limit
+and use the quota instead of idling.
+
+Each worker process calls rate_limiter.acquire() in a loop for DURATION
+seconds against the same database, as the frontend worker and the A2A
+backend do. The limit is deliberately high (RPM) so the test runs quickly.
+The script prints the total and the busiest 1-second window, and compares
+them with the limit plus the allowed burst.
+
+    python benchmarks/check_rate_limiter.py
+"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+RPM = 1200          # 20 calls/s shared
+DURATION = 5.0
+PROCESSES = 2
+MODEL = "bench-model"
+
+def worker(db_file, start_at, results):
+    import database
+    import rate_limiter
+    database.DB_FILE = db_file
+    rate_limiter.MODEL_LIMITS[MODEL] = (RPM, 10_000_000)
+    stamps = []
+    while time.sleep(max(0, start_at - time.time())) or time.time() < start_at + DURATION:
+        rate_limiter.acquire(MODEL, tokens=100)
+        stamps.append(time.time())
+    results.put(json.dumps(stamps))
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "rate.db")
+        import database
+        import rate_limiter
+        database.DB_FILE = db_file
+        database.init_db()
+
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        procs = [multiprocessing.Process(target=worker, args=(db_file, start_at, results)) for _ in range(PROCESSES)]
+        for p in procs:
+            p.start()
+        stamps = sorted(s for _ in procs for s in json.loads(results.get()) if s <= start_at + DURATION)
+        for p in procs:
+            p.join()
+
+    burst = max(1.0, RPM * rate_limiter.RATE_LIMIT_BURST)
+    allowed_total = RPM / 60 * DURATION + burst
+    busiest, j = 0, 0
+    for i, s in enumerate(stamps):
+        while stamps[j] < s - 1.0:
+            j += 1
+        busiest = max(busiest, i - j + 1)
+    print(f"{PROCESSES} processes, limit {RPM}/min ({RPM / 60:.0f}/s), burst {burst:.0f}, {DURATION:.0f}s")
+    print(f"calls: {len(stamps)} (max allowed {allowed_total:.0f}), busiest 1s window: {busiest} (max {RPM / 60 + burst:.0f})")
+    within = len(stamps) <= allowed_total + PROCESSES and busiest <= RPM / 60 + burst + PROCESSES
+    print("OK" if within and len(stamps) >= allowed_total * 0.9 else "FAIL")
+
+if __name__ == "__main__":
+    main()
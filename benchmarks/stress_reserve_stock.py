@@ -0,0 +1,77 @@
+"""
+Concurrency stress check for database.reserve_stock.
+
+Many threads in several processes race to reserve random amounts of the same
+item. Afterwards stock must be >= 0 and granted + remaining must equal the
+starting stock (no double-dispatch, nothing lost), and a zero or negative
+quantity must be refused without touching the stock. Exits non-zero on violation.
+
+    python benchmarks/stress_reserve_stock.py [processes] [threads] [attempts]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database
+
+ITEM = "water_bottles"
+START_STOCK = 5000
+
+def worker_process(db_file: str, threads: int, attempts: int, results):
+    database.DB_FILE = db_file
+    granted = []
+
+    def worker():
+        total = 0
+        for _ in range(attempts):
+            got, _ = database.reserve_stock(ITEM, random.randint(1, 25), allow_partial=random.random() < 0.7)
+            total += max(got, 0)
+        granted.append(total)
+        database.close_db_connection()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    results.put(sum(granted))
+
+def rejects(quantity: int) -> bool:
+    try:
+        database.reserve_stock(ITEM, quantity)
+    except ValueError:
+        return True
+    return False
+
+def main() -> int:
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    attempts = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "stress.db")
+        database.DB_FILE = db_file
+        database.init_db()
+        database.update_stock(ITEM, START_STOCK)
+        database.close_db_connection()
+
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=worker_process, args=(db_file, threads, attempts, results))
+                 for _ in range(processes)]
+        for p in procs: p.start()
+        granted = sum(results.get() for _ in procs)
+        for p in procs: p.join()
+
+        remaining = database.get_item_stock(ITEM)
+        rejected = rejects(0) and rejects(-5) and database.get_item_stock(ITEM) == remaining
+        database.close_db_connection()
+
+    ok = remaining >= 0 and granted + remaining == START_STOCK and rejected
+    print(f"{'OK' if ok else 'FAIL'}: start={START_STOCK} granted={granted} remaining={remaining} non-positive rejected={rejected} "
+          f"({processes} processes x {threads} threads x {attempts} attempts)")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
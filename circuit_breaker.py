@@ -0,0 +1,82 @@
+import asyncio
+import os
+import time
+import database
+
+# Shared circuit breaker for model calls. After BREAKER_FAILURES consecutive
+# failures (429s, 5xx) the breaker opens: every process fails fast with
+# ModelUnavailable instead of sleeping through retries, and callers answer
+# with the deterministic fallback (fast_path.degraded_reply). After
+# BREAKER_COOLDOWN seconds one caller gets through as a half-open probe;
+# its success closes the breaker, its failure opens it again.
+BREAKER_FAILURES = int(os.environ.get("RELIEF_BREAKER_FAILURES", 3))
+BREAKER_COOLDOWN = float(os.environ.get("RELIEF_BREAKER_COOLDOWN", 30))
+# Most a single model call may spend waiting (rate limiter + 429 backoff)
+# before giving up into the fallback.
+MAX_MODEL_WAIT = float(os.environ.get("RELIEF_MAX_MODEL_WAIT", 45))
+# A probe that never reports back (crashed process) frees the slot after this
+PROBE_TIMEOUT = MAX_MODEL_WAIT + 60
+BREAKER_ENABLED = os.environ.get("RELIEF_CIRCUIT_BREAKER", "1") != "0"
+# A 'clean' read (closed, no failures) is reused by this process for this
+# long, so healthy traffic costs no SQL per call. A breaker opened by the
+# other process is noticed at most this late; our own failures drop the cache.
+CLEAN_CACHE_SECONDS = 1.0
+_clean_until = {}  # name -> time.monotonic() deadline
+
+class ModelUnavailable(Exception):
+    """The model can't answer in time: breaker open, or the wait budget is spent."""
+
+def allow(name: str) -> str:
+    """'clean', 'closed' or 'probe': go ahead (report the outcome); 'open': fail fast."""
+    if not BREAKER_ENABLED:
+        return "clean"
+    now = time.monotonic()
+    if _clean_until.get(name, 0) > now:
+        return "clean"
+    allowed = database.breaker_allow(name, BREAKER_COOLDOWN, PROBE_TIMEOUT)
+    if allowed == "clean":
+        _clean_until[name] = now + CLEAN_CACHE_SECONDS
+    return allowed
+
+async def allow_async(name: str) -> str:
+    """allow() for coroutines: a cached 'clean' is answered inline, anything else reads the database in a thread."""
+    if not BREAKER_ENABLED or _clean_until.get(name, 0) > time.monotonic():
+        return "clean"
+    return await asyncio.to_thread(allow, name)
+
+def record_success(name: str, allowed: str):
+    """`allowed` is what allow() returned for this call; a clean breaker has nothing to reset."""
+    if BREAKER_ENABLED and allowed != "clean":
+        database.breaker_success(name)
+
+def record_failure(name: str) -> str:
+    """Counts one failed call. Returns the breaker state afterwards."""
+    if not BREAKER_ENABLED:
+        return "closed"
+    _clean_until.pop(name, None)
+    state = database.breaker_failure(name, BREAKER_FAILURES)
+    if state == "open":
+        print(f"🔌 Circuit breaker OPEN for {name}: failing fast for {BREAKER_COOLDOWN:.0f}s")
+    return state
+
+async def record_success_async(name: str, allowed: str):
+    if BREAKER_ENABLED and allowed != "clean":
+        await asyncio.to_thread(database.breaker_success, name)
+
+async def record_failure_async(name: str) -> str:
+    return await asyncio.to_thread(record_failure, name)
+
+def is_open(name: str) -> bool:
+    """Read-only check for callers that can skip the model entirely (no probe taken)."""
+    if not BREAKER_ENABLED:
+        return False
+    row = database.get_breaker(name)
+    if row is None:
+        return False
+    now = time.time()
+    if row["state"] == "open":
+        return now < row["opened_at"] + BREAKER_COOLDOWN
+    return row["state"] == "half_open" and now < row["probe_until"]
+
+async def is_open_async(name: str) -> bool:
+    return await asyncio.to_thread(is_open, name)
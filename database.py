@@ -1,136 +1,452 @@
+import atexit
+import datetime
+import json
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 
-DB_FILE = "relief_logistics.db"
+# --- STORAGE LOCATION ---
+# Every module reaches the database through this file, so these settings apply everywhere.
+#   RELIEF_DB_PATH  - database file (in memory mode: the snapshot file)
+#   RELIEF_DB_MODE  - "file" (default) or "memory"
+# Memory mode keeps the database in this process's RAM, shared by all its threads,
+# restores it from RELIEF_DB_PATH on first use and snapshots it back every
+# RELIEF_DB_SNAPSHOT_INTERVAL seconds and at exit via the SQLite backup API.
+# The RAM copy is per process, so use it for single-process runs (benchmarks,
+# ephemeral deployments); the two-process honcho stack should use a file (a
+# tmpfs path like /dev/shm/relief.db also avoids disk fsyncs).
+DB_FILE = os.environ.get("RELIEF_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "relief_logistics.db"))
+DB_MODE = os.environ.get("RELIEF_DB_MODE", "file")
+DB_SNAPSHOT_INTERVAL = float(os.environ.get("RELIEF_DB_SNAPSHOT_INTERVAL", 60))
+# memdb VFS rather than cache=shared: it uses normal file locking, so busy_timeout
+# applies instead of immediate "database table is locked" errors between threads.
+MEMORY_DB_URI = "file:/relief_logistics?vfs=memdb"
 
-def init_db():
-    """Initializes the database with all necessary tables and seed data."""
-    conn = sqlite3.connect(DB_FILE, timeout=30.0)
+# --- CONNECTION MANAGER ---
+# Each thread keeps one open connection to the database instead of paying a
+# connect/close (and pragma setup) on every helper call.
+_local = threading.local()
+
+class _PooledConnection(sqlite3.Connection):
+    """Thread-cached connection. close() only rolls back, so legacy callers that
+    still call conn.close() don't tear down the shared connection."""
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def close_for_real(self):
+        super().close()
+
+_memory_lock = threading.Lock()
+_memory_anchor = None  # keeps the in-memory database alive between connections
+
+def _db_target() -> str:
+    return MEMORY_DB_URI if DB_MODE == "memory" else DB_FILE
+
+def _ensure_memory_db():
+    global _memory_anchor
+    with _memory_lock:
+        if _memory_anchor is not None:
+            return
+        _memory_anchor = sqlite3.connect(MEMORY_DB_URI, uri=True, isolation_level=None, check_same_thread=False)
+        if os.path.exists(DB_FILE):
+            source = sqlite3.connect(DB_FILE)
+            source.backup(_memory_anchor)
+            source.close()
+            print(f"💾 Restored in-memory database from {DB_FILE}")
+    threading.Thread(target=_snapshot_loop, name="db-snapshot", daemon=True).start()
+    atexit.register(snapshot_db)
+
+def _snapshot_loop():
+    while True:
+        time.sleep(DB_SNAPSHOT_INTERVAL)
+        try:
+            snapshot_db()
+        except Exception as e:
+            print(f"⚠️ Database snapshot failed: {e}")
+
+def snapshot_db() -> bool:
+    """In memory mode, writes a consistent copy of the database to DB_FILE. No-op in file mode."""
+    if DB_MODE != "memory" or _memory_anchor is None:
+        return False
+    tmp_path = f"{DB_FILE}.snapshot"
+    with _memory_lock:
+        dest = sqlite3.connect(tmp_path)
+        _memory_anchor.backup(dest)
+        dest.close()
+        for stale in (f"{DB_FILE}-wal", f"{DB_FILE}-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        os.replace(tmp_path, DB_FILE)
+    return True
+
+def _open_connection(target: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    if target == MEMORY_DB_URI:
+        _ensure_memory_db()
+    # isolation_level=None -> autocommit; explicit transactions go through transaction()
+    conn = sqlite3.connect(target, timeout=30.0, isolation_level=None, factory=_PooledConnection,
+                           uri=target.startswith("file:"), check_same_thread=check_same_thread)
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA busy_timeout=30000;")
-    c = conn.cursor()
-    
-    # Inventory
-    c.execute('''CREATE TABLE IF NOT EXISTS inventory (item_name TEXT PRIMARY KEY, quantity INTEGER)''')
-    
-    # Requests
-    c.execute('''CREATE TABLE IF NOT EXISTS requests (
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def get_db_connection() -> sqlite3.Connection:
+    """Returns this thread's connection to the configured database, opening it on first use."""
+    target = _db_target()
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != target:
+        if conn is not None:
+            conn.close_for_real()
+        conn = _open_connection(target)
+        _local.conn, _local.path = conn, target
+    return conn
+
+def close_db_connection():
+    """Closes this thread's cached connection (e.g. at worker shutdown)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close_for_real()
+        _local.conn = None
+
+@contextmanager
+def transaction():
+    """
+    Runs the block in a single write transaction (BEGIN IMMEDIATE ... COMMIT),
+    rolling back on any exception. Nested use joins the outer transaction.
+    """
+    conn = get_db_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+# --- SCHEMA MIGRATIONS ---
+# Secondary indexes for the hot queries (created by migration 2).
+INDEXES = {
+    # status (+ item) filters of get_requests_page; the queues moved to QUEUE_INDEXES
+    "idx_requests_status_item": "requests(status, item_name, id)",
+    # get_session_for_location: location = ? AND timestamp > ?
+    "idx_active_sessions_location_ts": "active_sessions(location, timestamp)",
+    # clear_old_activity_logs: timestamp < ?
+    "idx_activity_logs_timestamp": "activity_logs(timestamp)",
+}
+
+# Requests still waiting on someone; the supervisor queues read only these.
+OPEN_STATUSES = ('PENDING', 'ACTION_REQUIRED', 'PENDING_DISPATCH', 'UNPROCESSED')
+OPEN_REQUESTS = f"status IN ({', '.join(repr(s) for s in OPEN_STATUSES)})"
+DISPATCH_REQUESTS = "status IN ('PENDING_DISPATCH', 'ACTION_REQUIRED')"
+# Partial indexes for the request queues (created by migration 9): each holds
+# only the rows its queue can return, already in queue order, so neither sorts.
+QUEUE_INDEXES = {
+    # dispatch_pending_requests: item_name = ? AND status IN (...) ORDER BY id
+    "idx_requests_dispatch_queue": f"requests(item_name, id) WHERE {DISPATCH_REQUESTS}",
+    # get_requests_by_status, get_pending_requests: open requests ORDER BY urgency DESC, id
+    "idx_requests_open_queue": f"requests(urgency DESC, id) WHERE {OPEN_REQUESTS}",
+}
+
+def _column_names(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {r['name'] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+def _migration_base_tables(conn: sqlite3.Connection):
+    """Core tables. Also upgrades pre-versioning databases whose requests table lacks session_id."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS inventory (item_name TEXT PRIMARY KEY, quantity INTEGER)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS requests (
                     id INTEGER PRIMARY KEY AUTOINCREMENT, item_name TEXT, quantity INTEGER,
                     location TEXT, status TEXT, urgency TEXT, notes TEXT, session_id TEXT
                 )''')
-    
-    # Migrate old requests table if session_id column doesn't exist
-    try:
-        c.execute("SELECT session_id FROM requests LIMIT 1")
-    except:
-        # Column doesn't exist, add it
-        c.execute("ALTER TABLE requests ADD COLUMN session_id TEXT")
-        conn.commit()
-    
+    if "session_id" not in _column_names(conn, "requests"):
+        conn.execute("ALTER TABLE requests ADD COLUMN session_id TEXT")
     # Active sessions table for cross-process session tracking
-    c.execute('''CREATE TABLE IF NOT EXISTS active_sessions (
+    conn.execute('''CREATE TABLE IF NOT EXISTS active_sessions (
                     session_id TEXT PRIMARY KEY,
                     location TEXT,
                     timestamp INTEGER
                 )''')
-    
     # Activity logs table for supervisor activity history
-    c.execute('''CREATE TABLE IF NOT EXISTS activity_logs (
+    conn.execute('''CREATE TABLE IF NOT EXISTS activity_logs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     timestamp TEXT,
                     action TEXT,
                     type TEXT
                 )''')
-    conn.commit()
+
+def _migration_indexes(conn: sqlite3.Connection):
+    for name, target in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+def _migration_change_counters(conn: sqlite3.Connection):
+    """Change counters bumped by triggers; the inventory read cache compares them."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS change_counters (name TEXT PRIMARY KEY, version INTEGER NOT NULL)''')
+    conn.execute("INSERT OR IGNORE INTO change_counters (name, version) VALUES ('inventory_catalog', 0), ('inventory_stock', 0)")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS inventory_catalog_insert AFTER INSERT ON inventory BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE name IN ('inventory_catalog', 'inventory_stock');
+                 END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS inventory_catalog_delete AFTER DELETE ON inventory BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE name IN ('inventory_catalog', 'inventory_stock');
+                 END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS inventory_catalog_rename AFTER UPDATE OF item_name ON inventory BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE name IN ('inventory_catalog', 'inventory_stock');
+                 END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS inventory_stock_update AFTER UPDATE OF quantity ON inventory BEGIN
+                    UPDATE change_counters SET version = version + 1 WHERE name = 'inventory_stock';
+                 END''')
+
+def _migration_requests_archive(conn: sqlite3.Connection):
+    """Cold table for terminal-state requests, plus updated_at so retention can be measured."""
+    conn.execute("ALTER TABLE requests ADD COLUMN updated_at INTEGER")
+    conn.execute("UPDATE requests SET updated_at = CAST(strftime('%s', 'now') AS INTEGER)")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS requests_touch_insert AFTER INSERT ON requests
+                    WHEN NEW.updated_at IS NULL BEGIN
+                    UPDATE requests SET updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id;
+                 END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS requests_touch_status AFTER UPDATE OF status ON requests BEGIN
+                    UPDATE requests SET updated_at = CAST(strftime('%s', 'now') AS INTEGER) WHERE id = NEW.id;
+                 END''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS requests_archive (
+                    id INTEGER PRIMARY KEY, item_name TEXT, quantity INTEGER,
+                    location TEXT, status TEXT, urgency TEXT, notes TEXT, session_id TEXT,
+                    updated_at INTEGER, archived_at INTEGER
+                )''')
+
+def _migration_rate_limits(conn: sqlite3.Connection):
+    """Token buckets for model calls, shared by every process using this database."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS rate_limits (
+                    model TEXT PRIMARY KEY,
+                    request_tokens REAL NOT NULL,
+                    token_tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    blocked_until REAL NOT NULL DEFAULT 0
+                )''')
+
+def _migration_circuit_breakers(conn: sqlite3.Connection):
+    """Circuit breaker state per model, shared by every process using this database."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS circuit_breakers (
+                    name TEXT PRIMARY KEY,
+                    state TEXT NOT NULL DEFAULT 'closed',
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    opened_at REAL NOT NULL DEFAULT 0,
+                    probe_until REAL NOT NULL DEFAULT 0
+                )''')
+
+def _migration_adk_sessions(conn: sqlite3.Connection):
+    """ADK conversation sessions (session_store): one row per session, events as compressed blobs."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS adk_sessions (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT '{}',
+                    create_time REAL NOT NULL,
+                    update_time REAL NOT NULL,
+                    event_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (app_name, user_id, session_id)
+                )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_adk_sessions_update_time ON adk_sessions(update_time)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS adk_events (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    invocation_id TEXT NOT NULL DEFAULT '',
+                    timestamp REAL NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (app_name, user_id, session_id, seq)
+                ) WITHOUT ROWID''')
+    # app-wide state has user_id ''
+    conn.execute('''CREATE TABLE IF NOT EXISTS adk_scoped_state (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (app_name, user_id)
+                )''')
+
+def _migration_unprocessed_status(conn: sqlite3.Connection):
+    """Degraded-mode messages get their own status, out of the restock/dispatch paths."""
+    conn.execute("UPDATE requests SET status = 'UNPROCESSED' WHERE item_name = 'UNPROCESSED_MESSAGE' AND status = 'ACTION_REQUIRED'")
+
+def _migration_queue_indexes(conn: sqlite3.Connection):
+    for name, target in QUEUE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+# (version, description, function). Append only - never edit a released migration.
+MIGRATIONS = [
+    (1, "base tables", _migration_base_tables),
+    (2, "secondary indexes", _migration_indexes),
+    (3, "inventory change counters", _migration_change_counters),
+    (4, "requests archive", _migration_requests_archive),
+    (5, "model rate limit buckets", _migration_rate_limits),
+    (6, "model circuit breakers", _migration_circuit_breakers),
+    (7, "adk sessions", _migration_adk_sessions),
+    (8, "unprocessed message status", _migration_unprocessed_status),
+    (9, "request queue indexes", _migration_queue_indexes),
+]
+
+def get_schema_version() -> int:
+    conn = get_db_connection()
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def run_migrations() -> int:
+    """
+    Applies every migration newer than the recorded schema_version, each in its own
+    transaction. Safe to call from both processes at startup: the version is
+    re-checked under the write lock. Returns the resulting schema version.
+    """
+    for version, description, migrate in MIGRATIONS:
+        if version <= get_schema_version():
+            continue
+        with transaction() as conn:
+            if version <= get_schema_version():
+                continue
+            migrate(conn)
+            conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+        print(f"🛠️ Applied migration {version}: {description}")
+    return get_schema_version()
+
+def explain_query_plan(sql: str, params: tuple = ()) -> list[str]:
+    """Returns the EXPLAIN QUERY PLAN detail lines for a query."""
+    rows = get_db_connection().execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [r['detail'] for r in rows]
+
+def init_db():
+    """Brings the schema up to date and seeds an empty inventory. Run once at process startup."""
+    run_migrations()
     
-    # Seed Data
-    c.execute("SELECT count(*) FROM inventory")
-    if c.fetchone()[0] == 0:
-        print("🌱 Seeding database...")
-        seed_data = [
-            ("Water bottles", 100), ("Food packs", 50), ("Medical kits", 10), 
-            ("Blankets", 30), ("Batteries", 200), ("Tents", 60), ("Flashlights", 60)
-        ]
-        normalized_seed = [(name.lower().replace(" ", "_").replace("-", "_"), qty) for name, qty in seed_data]
-        c.executemany("INSERT INTO inventory (item_name, quantity) VALUES (?, ?)", normalized_seed)
-        conn.commit()
-    conn.close()
+    # Seed Data (checked under the write lock so two starting processes can't both seed)
+    with transaction() as conn:
+        if conn.execute("SELECT count(*) FROM inventory").fetchone()[0] == 0:
+            print("🌱 Seeding database...")
+            seed_data = [
+                ("Water bottles", 100), ("Food packs", 50), ("Medical kits", 10), 
+                ("Blankets", 30), ("Batteries", 200), ("Tents", 60), ("Flashlights", 60)
+            ]
+            normalized_seed = [(name.lower().replace(" ", "_").replace("-", "_"), qty) for name, qty in seed_data]
+            conn.executemany("INSERT INTO inventory (item_name, quantity) VALUES (?, ?)", normalized_seed)
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_FILE, timeout=30.0)
-    conn.row_factory = sqlite3.Row
-    return conn
+# --- INVENTORY READ CACHE ---
+# Catalog and stock snapshot shared by all threads of this process. A dedicated
+# watcher connection polls PRAGMA data_version, which changes whenever any other
+# connection (another thread or the other honcho process) commits. Only then are
+# the change_counters read, and the inventory is reloaded only if they moved.
+_cache_lock = threading.Lock()
+_cache = {"path": None, "conn": None, "data_version": None, "counters": {}, "stock": {}, "names": []}
+
+def _inventory_snapshot() -> dict:
+    with _cache_lock:
+        target = _db_target()
+        if _cache["path"] != target:
+            if _cache["conn"] is not None:
+                _cache["conn"].close_for_real()
+            # Shared by every thread, always under _cache_lock
+            _cache.update(path=target, conn=_open_connection(target, check_same_thread=False), data_version=None, counters={})
+        conn = _cache["conn"]
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == _cache["data_version"]:
+            return _cache
+        conn.execute("BEGIN")
+        try:
+            counters = dict(conn.execute("SELECT name, version FROM change_counters").fetchall())
+            if counters != _cache["counters"]:
+                rows = conn.execute("SELECT item_name, quantity FROM inventory").fetchall()
+                _cache["stock"] = {r['item_name']: r['quantity'] for r in rows}
+                _cache["names"] = [r['item_name'] for r in rows]
+                _cache["counters"] = counters
+        finally:
+            conn.rollback()
+        _cache["data_version"] = data_version
+        return _cache
+
+def catalog_version() -> int:
+    """Bumped whenever inventory items are added, renamed or deleted (not on stock changes)."""
+    return _inventory_snapshot()["counters"].get("inventory_catalog", 0)
 
 # --- Operations ---
 def get_item_stock(item_name: str) -> int:
-    conn = get_db_connection()
-    row = conn.execute("SELECT quantity FROM inventory WHERE item_name = ?", (item_name,)).fetchone()
-    conn.close()
-    return row['quantity'] if row else -1
+    return _inventory_snapshot()["stock"].get(item_name, -1)
 
 def get_all_item_names() -> list[str]:
-    conn = get_db_connection()
-    rows = conn.execute("SELECT item_name FROM inventory").fetchall()
-    conn.close()
-    return [r['item_name'] for r in rows]
+    return list(_inventory_snapshot()["names"])
 
 def get_all_items() -> list[dict]:
-    conn = get_db_connection()
-    rows = conn.execute("SELECT * FROM inventory").fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    stock = _inventory_snapshot()["stock"]
+    return [{"item_name": name, "quantity": qty} for name, qty in stock.items()]
 
 def add_new_item(item_name: str, quantity: int):
-    conn = get_db_connection()
-    conn.execute("INSERT INTO inventory (item_name, quantity) VALUES (?, ?)", (item_name, quantity))
-    conn.commit()
-    conn.close()
+    get_db_connection().execute("INSERT INTO inventory (item_name, quantity) VALUES (?, ?)", (item_name, quantity))
 
 def delete_item(item_name: str):
-    conn = get_db_connection()
-    conn.execute("DELETE FROM inventory WHERE item_name = ?", (item_name,))
-    conn.commit()
-    conn.close()
+    get_db_connection().execute("DELETE FROM inventory WHERE item_name = ?", (item_name,))
 
 def update_stock(item_name: str, new_quantity: int):
-    conn = get_db_connection()
-    conn.execute("UPDATE inventory SET quantity = ? WHERE item_name = ?", (new_quantity, item_name))
-    conn.commit()
-    conn.close()
+    get_db_connection().execute("UPDATE inventory SET quantity = ? WHERE item_name = ?", (new_quantity, item_name))
     
 def increment_stock(item_name: str, amount_to_add: int) -> int:
-    conn = get_db_connection()
-    conn.execute("UPDATE inventory SET quantity = quantity + ? WHERE item_name = ?", (amount_to_add, item_name))
-    conn.commit()
-    row = conn.execute("SELECT quantity FROM inventory WHERE item_name = ?", (item_name,)).fetchone()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("UPDATE inventory SET quantity = quantity + ? WHERE item_name = ?", (amount_to_add, item_name))
+        row = conn.execute("SELECT quantity FROM inventory WHERE item_name = ?", (item_name,)).fetchone()
     return row['quantity'] if row else 0
 
+def reserve_stock(item_name: str, quantity: int, allow_partial: bool = True) -> tuple[int, int]:
+    """
+    Atomically takes up to `quantity` units of an item (all-or-nothing when
+    allow_partial=False). Returns (units granted, stock left afterwards), or
+    (-1, -1) if the item doesn't exist. Stock never goes below zero, even with
+    concurrent callers in other processes. Raises ValueError if quantity <= 0.
+    """
+    if quantity <= 0:
+        raise ValueError(f"reserve_stock quantity must be positive, got {quantity}")
+    with transaction() as conn:
+        row = conn.execute("SELECT quantity FROM inventory WHERE item_name = ?", (item_name,)).fetchone()
+        if row is None:
+            return -1, -1
+        available = max(row['quantity'], 0)
+        if allow_partial:
+            granted = min(available, quantity)
+        else:
+            granted = quantity if available >= quantity else 0
+        if granted > 0:
+            conn.execute("UPDATE inventory SET quantity = quantity - ? WHERE item_name = ? AND quantity >= ?",
+                         (granted, item_name, granted))
+    return granted, row['quantity'] - granted
+
 def create_request(item_name: str, quantity: int, location: str, status: str, urgency: str, notes: str, session_id: str = None) -> int:
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    # Check if session_id column exists, if not just insert without it
-    try:
-        cursor.execute("INSERT INTO requests (item_name, quantity, location, status, urgency, notes, session_id) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                       (item_name, quantity, location, status, urgency, notes, session_id))
-    except:
-        # Fallback for old schema without session_id
-        cursor.execute("INSERT INTO requests (item_name, quantity, location, status, urgency, notes) VALUES (?, ?, ?, ?, ?, ?)", 
-                       (item_name, quantity, location, status, urgency, notes))
-    req_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return req_id
+    cursor = get_db_connection().execute(
+        "INSERT INTO requests (item_name, quantity, location, status, urgency, notes, session_id) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+        (item_name, quantity, location, status, urgency, notes, session_id))
+    return cursor.lastrowid
 
-def get_pending_requests() -> list[dict]:
-    conn = get_db_connection()
-    rows = conn.execute("SELECT * FROM requests WHERE status = 'PENDING' OR status = 'ACTION_REQUIRED' ORDER BY urgency DESC, id ASC").fetchall()
-    conn.close()
+def requests_by_status_sql(count: int) -> str:
+    """
+    Open requests in `count` statuses, in queue order. Read from the partial index:
+    without ANALYZE statistics the planner would pick idx_requests_status_item and sort.
+    """
+    return (f"SELECT * FROM requests INDEXED BY idx_requests_open_queue WHERE {OPEN_REQUESTS} "
+            f"AND status IN ({', '.join('?' for _ in range(count))}) ORDER BY urgency DESC, id ASC")
+
+def get_requests_by_status(statuses: tuple) -> list[dict]:
+    """Open requests (OPEN_STATUSES) in the given statuses, most urgent first then FIFO."""
+    rows = get_db_connection().execute(requests_by_status_sql(len(statuses)), tuple(statuses)).fetchall()
     return [dict(r) for r in rows]
 
+def get_pending_requests() -> list[dict]:
+    return get_requests_by_status(('PENDING', 'ACTION_REQUIRED', 'UNPROCESSED'))
+
 def get_request_by_id(request_id: int) -> dict:
+    """Looks in the live table first, then in requests_archive."""
     conn = get_db_connection()
     row = conn.execute("SELECT * FROM requests WHERE id = ?", (request_id,)).fetchone()
-    conn.close()
+    if row is None:
+        row = conn.execute(f"SELECT {_REQUEST_COLUMNS} FROM requests_archive WHERE id = ?", (request_id,)).fetchone()
     return dict(row) if row else None
 
 def update_request_status(request_id: int, status: str, notes: str = None):
@@ -139,81 +455,506 @@ def update_request_status(request_id: int, status: str, notes: str = None):
         conn.execute("UPDATE requests SET status = ?, notes = ? WHERE id = ?", (status, notes, request_id))
     else:
         conn.execute("UPDATE requests SET status = ? WHERE id = ?", (status, request_id))
-    conn.commit()
-    conn.close()
+
+DISPATCH_QUEUE_SQL = (f"SELECT id, quantity, location, session_id FROM requests "
+                      f"WHERE item_name = ? AND {DISPATCH_REQUESTS} ORDER BY id ASC")
+
+def dispatch_pending_requests(item_name: str) -> list[dict]:
+    """
+    Fulfils PENDING_DISPATCH / ACTION_REQUIRED requests for an item FIFO from the
+    current stock, in one transaction. The allocation is computed in memory; the
+    stock update, status updates and the remainder row are written in bulk.
+    Returns one dict per dispatched request (id, location, session_id, quantity,
+    sent, remaining) so callers can notify after the commit.
+    """
+    dispatched = []
+    with transaction() as conn:
+        row = conn.execute("SELECT quantity FROM inventory WHERE item_name = ?", (item_name,)).fetchone()
+        stock = row['quantity'] if row else 0
+        if stock <= 0:
+            return []
+
+        cursor = conn.execute(DISPATCH_QUEUE_SQL, (item_name,))
+        # Only pull as many rows as the stock can cover
+        while stock > 0:
+            batch = cursor.fetchmany(500)
+            if not batch:
+                break
+            for req in batch:
+                sent = min(stock, req['quantity'])
+                stock -= sent
+                dispatched.append({
+                    "id": req['id'], "location": req['location'], "session_id": req['session_id'],
+                    "quantity": req['quantity'], "sent": sent, "remaining": req['quantity'] - sent,
+                })
+                if stock <= 0:
+                    break
+        if not dispatched:
+            return []
+
+        full = [("Auto-dispatched after restock", d['id']) for d in dispatched if d['remaining'] == 0]
+        partial = [d for d in dispatched if d['remaining'] > 0]
+        conn.executemany("UPDATE requests SET status = 'ACTION_TAKEN', notes = ? WHERE id = ?", full)
+        conn.executemany("UPDATE requests SET status = 'PARTIAL', notes = ? WHERE id = ?",
+                         [(f"Dispatched {d['sent']}, still need {d['remaining']}", d['id']) for d in partial])
+        # Remainder goes back in the queue as a new request (keeps the same session_id)
+        conn.executemany(
+            "INSERT INTO requests (item_name, quantity, location, status, urgency, notes, session_id) "
+            "VALUES (?, ?, ?, 'PENDING_DISPATCH', 'NORMAL', ?, ?)",
+            [(item_name, d['remaining'], d['location'], f"Remaining from request #{d['id']}", d['session_id']) for d in partial]
+        )
+        conn.execute("UPDATE inventory SET quantity = ? WHERE item_name = ?", (stock, item_name))
+    return dispatched
 
 # --- ACTIVE SESSIONS MANAGEMENT ---
 def register_active_session(session_id: str, location: str):
     """Register an active victim session with location"""
     import time
-    conn = get_db_connection()
-    conn.execute(
+    get_db_connection().execute(
         "INSERT OR REPLACE INTO active_sessions (session_id, location, timestamp) VALUES (?, ?, ?)",
         (session_id, location, int(time.time()))
     )
-    conn.commit()
-    conn.close()
+
+SESSION_FOR_LOCATION_SQL = "SELECT session_id FROM active_sessions WHERE location = ? AND timestamp > ? ORDER BY timestamp DESC LIMIT 1"
 
 def get_session_for_location(location: str):
     """Get the most recent session ID for a location (within last 10 minutes)"""
     import time
-    conn = get_db_connection()
     cutoff = int(time.time()) - 600  # 10 minutes ago
-    cursor = conn.execute(
-        "SELECT session_id FROM active_sessions WHERE location = ? AND timestamp > ? ORDER BY timestamp DESC LIMIT 1",
-        (location, cutoff)
-    )
-    result = cursor.fetchone()
-    conn.close()
+    result = get_db_connection().execute(SESSION_FOR_LOCATION_SQL, (location, cutoff)).fetchone()
     return result[0] if result else None
 
 def cleanup_old_sessions():
     """Remove sessions older than 1 hour"""
     import time
-    conn = get_db_connection()
     cutoff = int(time.time()) - 3600  # 1 hour ago
-    conn.execute("DELETE FROM active_sessions WHERE timestamp < ?", (cutoff,))
-    conn.commit()
-    conn.close()
+    get_db_connection().execute("DELETE FROM active_sessions WHERE timestamp < ?", (cutoff,))
 
 def get_recent_completed_requests(limit: int = 10) -> list[dict]:
     conn = get_db_connection()
-    rows = conn.execute("SELECT * FROM requests WHERE status NOT IN ('PENDING', 'ACTION_REQUIRED') ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
-    conn.close()
+    rows = conn.execute("SELECT * FROM requests WHERE status NOT IN ('PENDING', 'ACTION_REQUIRED', 'UNPROCESSED') ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    if len(rows) < limit:
+        # Everything in the archive is older than the live rows
+        rows += conn.execute(f"SELECT {_REQUEST_COLUMNS} FROM requests_archive ORDER BY id DESC LIMIT ?", (limit - len(rows),)).fetchall()
     return [dict(r) for r in rows]
 
+# --- KEYSET PAGINATION ---
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def clamp_page_size(limit) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def _request_filters(status=None, item_name=None, location=None, session_id=None) -> tuple[list, list]:
+    """Builds WHERE clauses for the optional request filters. status may be a list or comma-separated."""
+    clauses, params = [], []
+    if status:
+        statuses = status.split(",") if isinstance(status, str) else list(status)
+        clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+        params += [s.strip() for s in statuses]
+    for column, value in (("item_name", item_name), ("location", location), ("session_id", session_id)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return clauses, params
+
+def get_requests_page(cursor: int = None, limit: int = DEFAULT_PAGE_SIZE, status=None, item_name: str = None,
+                      location: str = None, session_id: str = None, exclude_status=None,
+                      include_archive: bool = False) -> tuple[list[dict], int]:
+    """
+    Returns (rows, next_cursor) for requests with id < cursor, newest first.
+    next_cursor is None on the last page. With include_archive, live and archived
+    rows are merged so a page can span both tables.
+    """
+    limit = clamp_page_size(limit)
+    clauses, params = _request_filters(status, item_name, location, session_id)
+    if exclude_status:
+        clauses.append(f"status NOT IN ({', '.join('?' for _ in exclude_status)})")
+        params += list(exclude_status)
+    if cursor is not None:
+        clauses.append("id < ?")
+        params.append(int(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = get_db_connection()
+    tables = ("requests", "requests_archive") if include_archive else ("requests",)
+    rows = []
+    for table in tables:
+        rows += [dict(r) for r in conn.execute(
+            f"SELECT {_REQUEST_COLUMNS} FROM {table} {where} ORDER BY id DESC LIMIT ?", (*params, limit + 1)
+        ).fetchall()]
+    rows.sort(key=lambda r: r['id'], reverse=True)
+    next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def get_active_sessions_page(cursor: int = None, limit: int = DEFAULT_PAGE_SIZE, location: str = None,
+                             session_id: str = None) -> tuple[list[dict], int]:
+    """Same as get_requests_page for active_sessions, keyed on rowid (most recently registered first)."""
+    limit = clamp_page_size(limit)
+    clauses, params = _request_filters(location=location, session_id=session_id)
+    if cursor is not None:
+        clauses.append("rowid < ?")
+        params.append(int(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = [dict(r) for r in get_db_connection().execute(
+        f"SELECT rowid AS id, session_id, location, timestamp FROM active_sessions {where} ORDER BY rowid DESC LIMIT ?",
+        (*params, limit + 1)
+    ).fetchall()]
+    next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+# --- REQUEST ARCHIVAL ---
+# Terminal-state requests are moved to requests_archive once they have been
+# untouched for REQUEST_RETENTION_SECONDS, so the live table only holds the
+# working set. get_request_by_id still resolves archived IDs.
+TERMINAL_STATUSES = ("ACTION_TAKEN", "REJECTED", "APPROVED_MANUAL", "PARTIAL", "FLAGGED")
+REQUEST_RETENTION_SECONDS = int(os.environ.get("REQUEST_RETENTION_SECONDS", 24 * 3600))
+REQUEST_ARCHIVE_INTERVAL = float(os.environ.get("REQUEST_ARCHIVE_INTERVAL", 300))
+_REQUEST_COLUMNS = "id, item_name, quantity, location, status, urgency, notes, session_id, updated_at"
+_archiver = None
+
+def archive_completed_requests(retention_seconds: int = None, batch_size: int = 5000) -> int:
+    """Moves terminal requests older than the retention age into requests_archive. Returns rows moved."""
+    if retention_seconds is None:
+        retention_seconds = REQUEST_RETENTION_SECONDS
+    cutoff = int(time.time()) - retention_seconds
+    placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+    moved = 0
+    while True:
+        # Small batches keep the write lock short for the dispatch paths
+        with transaction() as conn:
+            ids = [(r['id'],) for r in conn.execute(
+                f"SELECT id FROM requests WHERE status IN ({placeholders}) AND updated_at < ? LIMIT ?",
+                (*TERMINAL_STATUSES, cutoff, batch_size)
+            ).fetchall()]
+            if ids:
+                archived_at = int(time.time())
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO requests_archive ({_REQUEST_COLUMNS}, archived_at) "
+                    f"SELECT {_REQUEST_COLUMNS}, {archived_at} FROM requests WHERE id = ?", ids)
+                conn.executemany("DELETE FROM requests WHERE id = ?", ids)
+        if not ids:
+            return moved
+        moved += len(ids)
+
+def _request_archiver():
+    while True:
+        time.sleep(REQUEST_ARCHIVE_INTERVAL)
+        try:
+            moved = archive_completed_requests()
+            if moved:
+                print(f"🗄️ Archived {moved} completed request(s)")
+        except Exception as e:
+            print(f"⚠️ Request archival failed: {e}")
+
+def start_request_archiver():
+    """Starts the background archival job once per process."""
+    global _archiver
+    if _archiver is None:
+        _archiver = threading.Thread(target=_request_archiver, name="request-archiver", daemon=True)
+        _archiver.start()
+
 def create_system_log(notes: str):
     """Creates a non-actionable log for supervisor review."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO requests (item_name, quantity, location, status, urgency, notes) VALUES (?, ?, ?, ?, ?, ?)", 
-                   ("SYSTEM_NOTE", 0, "N/A", "FLAGGED", "NORMAL", notes))
-    conn.commit()
-    conn.close()
+    get_db_connection().execute("INSERT INTO requests (item_name, quantity, location, status, urgency, notes) VALUES (?, ?, ?, ?, ?, ?)", 
+                                ("SYSTEM_NOTE", 0, "N/A", "FLAGGED", "NORMAL", notes))
 
 # --- ACTIVITY LOGS ---
+# Durability mode for add_activity_log:
+#   "grouped"   - entries are buffered in memory and written in one transaction every
+#                 ACTIVITY_LOG_FLUSH_SIZE entries or ACTIVITY_LOG_FLUSH_INTERVAL seconds
+#                 (and at interpreter exit). A crash can lose the last interval.
+#   "immediate" - one commit per entry.
+ACTIVITY_LOG_DURABILITY = os.environ.get("ACTIVITY_LOG_DURABILITY", "grouped")
+ACTIVITY_LOG_FLUSH_SIZE = int(os.environ.get("ACTIVITY_LOG_FLUSH_SIZE", 100))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.environ.get("ACTIVITY_LOG_FLUSH_INTERVAL", 1.0))
+
+_log_buffer = []
+_log_buffer_lock = threading.Lock()
+_log_flush_lock = threading.Lock()  # keeps flushes (and so row ids) in arrival order
+_log_wakeup = threading.Event()
+_log_flusher = None
+
+def _activity_log_flusher():
+    while True:
+        _log_wakeup.wait(ACTIVITY_LOG_FLUSH_INTERVAL)
+        _log_wakeup.clear()
+        try:
+            flush_activity_logs()
+        except Exception as e:
+            print(f"⚠️ Activity log flush failed, will retry: {e}")
+
+def _ensure_log_flusher():
+    global _log_flusher
+    with _log_buffer_lock:
+        if _log_flusher is not None:
+            return
+        _log_flusher = threading.Thread(target=_activity_log_flusher, name="activity-log-flusher", daemon=True)
+        _log_flusher.start()
+    atexit.register(flush_activity_logs)
+
+def flush_activity_logs() -> int:
+    """Writes all buffered activity log entries in one transaction. Returns the count written."""
+    with _log_flush_lock:
+        with _log_buffer_lock:
+            entries = _log_buffer[:]
+            _log_buffer.clear()
+        if not entries:
+            return 0
+        try:
+            with transaction() as conn:
+                conn.executemany("INSERT INTO activity_logs (timestamp, action, type) VALUES (?, ?, ?)", entries)
+        except Exception:
+            # Put them back in front of anything logged meanwhile
+            with _log_buffer_lock:
+                _log_buffer[:0] = entries
+            raise
+    return len(entries)
+
 def add_activity_log(action: str, log_type: str = "info"):
     """Add a persistent activity log entry to the database."""
-    import datetime
-    conn = get_db_connection()
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn.execute("INSERT INTO activity_logs (timestamp, action, type) VALUES (?, ?, ?)", 
-                 (timestamp, action, log_type))
-    conn.commit()
-    conn.close()
+    if ACTIVITY_LOG_DURABILITY == "immediate":
+        get_db_connection().execute("INSERT INTO activity_logs (timestamp, action, type) VALUES (?, ?, ?)", 
+                                    (timestamp, action, log_type))
+        return
+    _ensure_log_flusher()
+    with _log_buffer_lock:
+        _log_buffer.append((timestamp, action, log_type))
+        full = len(_log_buffer) >= ACTIVITY_LOG_FLUSH_SIZE
+    if full:
+        _log_wakeup.set()
 
 def get_activity_logs(limit: int = 100):
     """Retrieve recent activity logs from the database."""
-    conn = get_db_connection()
-    rows = conn.execute("SELECT * FROM activity_logs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
-    conn.close()
+    flush_activity_logs()
+    rows = get_db_connection().execute("SELECT * FROM activity_logs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
     return [dict(r) for r in rows]
 
+CLEAR_OLD_LOGS_SQL = "DELETE FROM activity_logs WHERE timestamp < ?"
+
 def clear_old_activity_logs(days: int = 7):
     """Remove activity logs older than specified days."""
-    import datetime
-    conn = get_db_connection()
+    flush_activity_logs()
     cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
-    conn.execute("DELETE FROM activity_logs WHERE timestamp < ?", (cutoff,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    get_db_connection().execute(CLEAR_OLD_LOGS_SQL, (cutoff,))
+
+# --- RATE LIMIT BUCKETS ---
+# One row per model: two token buckets (requests and LLM tokens) refilled
+# continuously, plus a block set after a 429. Updated under the write lock so
+# both honcho processes draw from the same budget.
+def take_rate_budget(model: str, rpm: float, tpm: float, burst: float, tokens: int) -> float:
+    """
+    Takes one request and `tokens` LLM tokens from the model's buckets if both
+    have enough. Returns 0.0 on success, otherwise the seconds to wait before retrying.
+    """
+    request_capacity = max(1.0, rpm * burst)
+    token_capacity = max(float(tokens), tpm * burst)
+    with transaction() as conn:
+        now = time.time()  # read under the lock, or a writer that waited would refill twice
+        row = conn.execute("SELECT * FROM rate_limits WHERE model = ?", (model,)).fetchone()
+        if row is None:
+            request_tokens, token_tokens, blocked_until = request_capacity, token_capacity, 0.0
+        else:
+            elapsed = max(0.0, now - row['updated_at'])
+            request_tokens = min(request_capacity, row['request_tokens'] + elapsed * rpm / 60)
+            token_tokens = min(token_capacity, row['token_tokens'] + elapsed * tpm / 60)
+            blocked_until = row['blocked_until']
+
+        if now < blocked_until:
+            wait = blocked_until - now
+        else:
+            wait = max((1 - request_tokens) * 60 / rpm, (tokens - token_tokens) * 60 / tpm, 0.0)
+        if wait <= 0:
+            request_tokens -= 1
+            token_tokens -= tokens
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_limits (model, request_tokens, token_tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?, ?)",
+            (model, request_tokens, token_tokens, now, blocked_until))
+    return wait
+
+def adjust_rate_tokens(model: str, delta: float):
+    """Corrects the token bucket once the real usage of a call is known (delta = estimated - actual)."""
+    get_db_connection().execute("UPDATE rate_limits SET token_tokens = token_tokens + ? WHERE model = ?", (delta, model))
+
+def block_rate(model: str, seconds: float):
+    """After a 429: no process calls this model again for `seconds`."""
+    until = time.time() + seconds
+    get_db_connection().execute("UPDATE rate_limits SET blocked_until = MAX(blocked_until, ?) WHERE model = ?", (until, model))
+
+def get_rate_budgets() -> list[dict]:
+    rows = get_db_connection().execute("SELECT * FROM rate_limits ORDER BY model").fetchall()
+    return [dict(r) for r in rows]
+
+# --- CIRCUIT BREAKERS ---
+# One row per model: closed (calls go out), open (calls fail fast until the
+# cooldown is over) or half_open (one probe call in flight decides). Shared by
+# both honcho processes like the rate limit buckets.
+def breaker_allow(name: str, cooldown: float, probe_timeout: float) -> str:
+    """
+    Returns 'clean' (closed, no failures counted: nothing to reset on success),
+    'closed' (call normally), 'probe' (this caller is the half-open probe) or
+    'open' (fail fast). The common closed case is a single read.
+    """
+    row = get_db_connection().execute("SELECT state, failures FROM circuit_breakers WHERE name = ?", (name,)).fetchone()
+    if row is None or (row['state'] == 'closed' and row['failures'] == 0):
+        return 'clean'
+    if row['state'] == 'closed':
+        return 'closed'
+    with transaction() as conn:
+        now = time.time()
+        row = conn.execute("SELECT * FROM circuit_breakers WHERE name = ?", (name,)).fetchone()
+        if row['state'] == 'closed':
+            return 'closed'
+        # A probe that never reported back (crashed process) frees the slot after probe_timeout
+        probe_free = row['state'] == 'open' and now >= row['opened_at'] + cooldown
+        probe_free = probe_free or (row['state'] == 'half_open' and now >= row['probe_until'])
+        if not probe_free:
+            return 'open'
+        conn.execute("UPDATE circuit_breakers SET state = 'half_open', probe_until = ? WHERE name = ?",
+                     (now + probe_timeout, name))
+        return 'probe'
+
+def breaker_success(name: str):
+    """Closes the breaker and clears the failure count."""
+    get_db_connection().execute(
+        "UPDATE circuit_breakers SET state = 'closed', failures = 0 WHERE name = ? AND (state != 'closed' OR failures > 0)", (name,))
+
+def breaker_failure(name: str, threshold: int) -> str:
+    """Counts a failure; opens the breaker at `threshold` or when the half-open probe failed. Returns the new state."""
+    with transaction() as conn:
+        now = time.time()
+        row = conn.execute("SELECT * FROM circuit_breakers WHERE name = ?", (name,)).fetchone()
+        failures = (row['failures'] if row else 0) + 1
+        state = row['state'] if row else 'closed'
+        if state == 'half_open' or failures >= threshold:
+            state, opened_at = 'open', now
+        else:
+            opened_at = row['opened_at'] if row else 0
+        conn.execute("INSERT OR REPLACE INTO circuit_breakers (name, state, failures, opened_at, probe_until) VALUES (?, ?, ?, ?, 0)",
+                     (name, state, failures, opened_at))
+    return state
+
+def get_breaker(name: str) -> dict:
+    row = get_db_connection().execute("SELECT * FROM circuit_breakers WHERE name = ?", (name,)).fetchone()
+    return dict(row) if row else None
+
+def get_breakers() -> list[dict]:
+    rows = get_db_connection().execute("SELECT * FROM circuit_breakers ORDER BY name").fetchall()
+    return [dict(r) for r in rows]
+
+# --- ADK SESSIONS ---
+# Storage for session_store.SqliteSessionService. Events are opaque blobs
+# (compressed JSON) numbered per session by seq; states are JSON objects.
+_SESSION_KEY = "app_name = ? AND user_id = ? AND session_id = ?"
+
+def create_adk_session(app_name: str, user_id: str, session_id: str, state: dict, now: float) -> bool:
+    """False if the session already exists."""
+    cursor = get_db_connection().execute(
+        "INSERT OR IGNORE INTO adk_sessions (app_name, user_id, session_id, state, create_time, update_time) VALUES (?, ?, ?, ?, ?, ?)",
+        (app_name, user_id, session_id, json.dumps(state, default=str), now, now))
+    return cursor.rowcount == 1
+
+def get_adk_session(app_name: str, user_id: str, session_id: str) -> dict:
+    row = get_db_connection().execute(f"SELECT * FROM adk_sessions WHERE {_SESSION_KEY}", (app_name, user_id, session_id)).fetchone()
+    return dict(row, state=json.loads(row['state'])) if row else None
+
+def get_adk_events(app_name: str, user_id: str, session_id: str, limit: int = None, after: float = None) -> list[bytes]:
+    """Event blobs oldest first: the most recent `limit`, optionally only those at or after `after`."""
+    query = f"SELECT data FROM adk_events WHERE {_SESSION_KEY}"
+    params = [app_name, user_id, session_id]
+    if after is not None:
+        query += " AND timestamp >= ?"
+        params.append(after)
+    query += " ORDER BY seq DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    rows = get_db_connection().execute(query, params).fetchall()
+    return [r['data'] for r in reversed(rows)]
+
+def _merge_scoped_state(conn: sqlite3.Connection, app_name: str, user_id: str, delta: dict):
+    row = conn.execute("SELECT state FROM adk_scoped_state WHERE app_name = ? AND user_id = ?", (app_name, user_id)).fetchone()
+    state = {**(json.loads(row['state']) if row else {}), **delta}
+    conn.execute("INSERT OR REPLACE INTO adk_scoped_state (app_name, user_id, state) VALUES (?, ?, ?)",
+                 (app_name, user_id, json.dumps(state, default=str)))
+
+def merge_adk_scoped_state(app_name: str, user_id: str, app_delta: dict, user_delta: dict):
+    with transaction() as conn:
+        if app_delta:
+            _merge_scoped_state(conn, app_name, "", app_delta)
+        if user_delta:
+            _merge_scoped_state(conn, app_name, user_id, user_delta)
+
+def append_adk_event(app_name: str, user_id: str, session_id: str, invocation_id: str, timestamp: float, data: bytes,
+                     session_delta: dict, app_delta: dict, user_delta: dict, max_events: int) -> bool:
+    """
+    Stores one event and its state changes. Past `max_events` the oldest whole
+    invocations are dropped, down to 3/4 of the cap (so trimming isn't paid on
+    every event). Events without an invocation id each count as their own
+    invocation. If that can't get under the cap (one invocation longer than the
+    cap), the oldest events are dropped regardless. False if the session
+    doesn't exist (evicted or deleted).
+    """
+    key = (app_name, user_id, session_id)
+    with transaction() as conn:
+        row = conn.execute(f"SELECT state, event_count FROM adk_sessions WHERE {_SESSION_KEY}", key).fetchone()
+        if row is None:
+            return False
+        seq = conn.execute(f"SELECT COALESCE(MAX(seq), 0) + 1 FROM adk_events WHERE {_SESSION_KEY}", key).fetchone()[0]
+        conn.execute("INSERT INTO adk_events (app_name, user_id, session_id, seq, invocation_id, timestamp, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (*key, seq, invocation_id or "", timestamp, data))
+        event_count = row['event_count'] + 1
+        if max_events and event_count > max_events:
+            # Oldest seq to keep; invocations that straddle it are kept whole
+            keep_from = conn.execute(f"SELECT seq FROM adk_events WHERE {_SESSION_KEY} ORDER BY seq DESC LIMIT 1 OFFSET ?",
+                                     (*key, max(1, max_events * 3 // 4) - 1)).fetchone()[0]
+            cursor = conn.execute(
+                f"DELETE FROM adk_events WHERE {_SESSION_KEY} AND seq < ? AND (invocation_id = '' OR invocation_id NOT IN "
+                f"(SELECT invocation_id FROM adk_events WHERE {_SESSION_KEY} AND seq >= ? AND invocation_id != ''))",
+                (*key, keep_from, *key, keep_from))
+            event_count -= cursor.rowcount
+            if event_count > max_events:
+                cursor = conn.execute(f"DELETE FROM adk_events WHERE {_SESSION_KEY} AND seq < ?", (*key, keep_from))
+                event_count -= cursor.rowcount
+        state = json.dumps({**json.loads(row['state']), **session_delta}, default=str) if session_delta else row['state']
+        conn.execute(f"UPDATE adk_sessions SET state = ?, update_time = ?, event_count = ? WHERE {_SESSION_KEY}",
+                     (state, timestamp, event_count, *key))
+        if app_delta:
+            _merge_scoped_state(conn, app_name, "", app_delta)
+        if user_delta:
+            _merge_scoped_state(conn, app_name, user_id, user_delta)
+    return True
+
+def get_adk_scoped_state(app_name: str, user_id: str = "") -> dict:
+    """App-wide state (user_id '') or one user's state, without prefixes."""
+    row = get_db_connection().execute("SELECT state FROM adk_scoped_state WHERE app_name = ? AND user_id = ?", (app_name, user_id)).fetchone()
+    return json.loads(row['state']) if row else {}
+
+def list_adk_sessions(app_name: str, user_id: str = None, updated_after: float = 0) -> list[dict]:
+    """Sessions without events, least recently updated first."""
+    query = "SELECT * FROM adk_sessions WHERE app_name = ? AND update_time >= ?"
+    params = [app_name, updated_after]
+    if user_id is not None:
+        query += " AND user_id = ?"
+        params.append(user_id)
+    rows = get_db_connection().execute(query + " ORDER BY update_time, user_id, session_id", params).fetchall()
+    return [dict(r, state=json.loads(r['state'])) for r in rows]
+
+def delete_adk_session(app_name: str, user_id: str, session_id: str):
+    key = (app_name, user_id, session_id)
+    with transaction() as conn:
+        conn.execute(f"DELETE FROM adk_events WHERE {_SESSION_KEY}", key)
+        conn.execute(f"DELETE FROM adk_sessions WHERE {_SESSION_KEY}", key)
+
+def evict_idle_adk_sessions(idle_before: float) -> int:
+    """Deletes sessions (and their events) last updated before `idle_before`. Returns how many."""
+    with transaction() as conn:
+        conn.execute(
+            "DELETE FROM adk_events WHERE EXISTS (SELECT 1 FROM adk_sessions s WHERE s.app_name = adk_events.app_name "
+            "AND s.user_id = adk_events.user_id AND s.session_id = adk_events.session_id AND s.update_time < ?)", (idle_before,))
+        return conn.execute("DELETE FROM adk_sessions WHERE update_time < ?", (idle_before,)).rowcount
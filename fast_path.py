@@ -0,0 +1,121 @@
+import os
+import re
+import time
+import item_resolver
+import tools_client
+
+# Deterministic handling of well-formed victim requests ("need 20 water bottles
+# and 5 tents at Delhi") without going through the agent chain.
+# Anything the parser isn't sure about returns None and falls through to the agents.
+FAST_PATH_ENABLED = os.environ.get("RELIEF_FAST_PATH", "1") != "0"
+
+SOURCE_TAG = re.compile(r"\[\[SOURCE:[^\]]*\]\]\s*")
+LEAD_IN = re.compile(
+    r"^(?:(?:please|pls|hi|hello|help|urgent|emergency)[\s,:!-]+)*"
+    r"(?:(?:can|could) you\s+)?"
+    r"(?:(?:i|we)\s+(?:urgently\s+|really\s+)?(?:need|want|require)|need|send(?:\s+(?:me|us))?|requesting|request)?\s*"
+)
+LOCATION = re.compile(r"^(?P<items>.+?)\s+(?:at|in|to)\s+(?P<location>[^\d,&]+?)$")
+ITEM_SPLIT = re.compile(r"\s*(?:,|&|\band\b|\bplus\b)\s*")
+ITEM = re.compile(r"^(?P<qty>\d{1,6})\s*(?:x\s+)?(?:units?\s+of\s+|pieces?\s+of\s+)?(?P<item>[a-z][a-z _-]*)$")
+FILLER = re.compile(r"\s+(?:please|pls|asap|urgently|immediately|now)$")
+# "to go", "in my house", "for them": not a place name, let the agents ask
+NON_PLACE_WORDS = {"go", "get", "help", "use", "keep", "stay", "survive", "share", "me", "us", "you", "them",
+                   "it", "here", "there", "my", "our", "your", "the", "this", "that", "a", "an", "everyone", "people"}
+URGENT_WORDS = re.compile(r"\b(?:urgent|urgently|emergency|critical|asap|immediately|dying|injured)\b")
+# Fast-path turns never reach the backend agents. The frontend appends each one
+# to the chat's ADK session with record_text() as the reply's last line; the
+# A2A proxy forwards it with the next agent turn and conversation_context folds
+# it into relief_context, so the agents know what was already requested.
+RECORD_TAG = "[[FAST PATH]]"
+
+def parse_request(text: str):
+    """
+    Parses 'quantity item [, quantity item ...] at/in/to location'.
+    Returns {"items": [(database_key, quantity, raw_item)], "location": str, "is_critical": bool},
+    or None if the message isn't clearly of that form.
+    """
+    message = SOURCE_TAG.sub("", text).strip().lower().rstrip(".!? ")
+    if not message:
+        return None
+    is_critical = bool(URGENT_WORDS.search(message))
+
+    body = LEAD_IN.sub("", message, count=1)
+    match = LOCATION.match(body)
+    if not match:
+        return None
+
+    location = match.group("location").strip()
+    while FILLER.search(location):
+        location = FILLER.sub("", location).strip()
+    if not location or location.split()[0] in NON_PLACE_WORDS:
+        return None
+
+    items = []
+    for part in ITEM_SPLIT.split(match.group("items")):
+        part = part.strip()
+        if not part:
+            continue
+        item_match = ITEM.match(part)
+        if not item_match:
+            return None
+        quantity = int(item_match.group("qty"))
+        raw_item = item_match.group("item").strip()
+        resolved = item_resolver.match_item(raw_item)
+        # Unknown or doubtful items need the agents (escalation, clarification)
+        if quantity <= 0 or not resolved["key"] or resolved["confidence"] < item_resolver.LOCAL_MATCH_THRESHOLD:
+            return None
+        items.append((resolved["key"], quantity, raw_item))
+    if not items:
+        return None
+
+    return {"items": items, "location": location.title(), "is_critical": is_critical}
+
+def record_text(results: list[dict]) -> str:
+    """'[[FAST PATH]] Already requested (do not request again): tents x3 DISPATCHED; blankets x2 OUT_OF_STOCK (request #14)'"""
+    entries = [f"{r['item_name']} x{r['requested']} {r['status']}" + (f" (request #{r['request_id']})" if r.get("request_id") else "")
+               for r in results]
+    return f"{RECORD_TAG} Already requested (do not request again): " + "; ".join(entries)
+
+def handle_victim_message(text: str, session_id: str = None):
+    """Returns the reply for a request the parser understood, or None to use the agents."""
+    result = handle_victim_request(text, session_id)
+    return result["summary"] if result else None
+
+def handle_victim_request(text: str, session_id: str = None):
+    """handle_victim_message, returning request_relief_batch's whole result ({"results", "summary", ...}) or None."""
+    if not FAST_PATH_ENABLED or not text:
+        return None
+    start = time.perf_counter()
+    parsed = parse_request(text)
+    if parsed is None:
+        return None
+
+    result = tools_client.relieve_batch(
+        [{"item_name": raw_item, "quantity": quantity} for _, quantity, raw_item in parsed["items"]],
+        parsed["location"], is_critical=parsed["is_critical"], session_id=session_id
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"⚡ Fast path: {len(result['results'])} item(s) to {parsed['location']} in {elapsed:.1f}ms (no LLM calls)")
+    return result
+
+# --- DEGRADED MODE ---
+# Used when the model is unavailable (circuit breaker open, wait budget spent):
+# a templated acknowledgement instead of a stalled or dropped message.
+VICTIM_FALLBACK = ("We've received your message and logged it as request #{request_id}. Our assistant is "
+                   "overloaded right now, so a coordinator will review it and follow up here. If anyone is in "
+                   "immediate danger, please contact local emergency services.")
+SUPERVISOR_FALLBACK = ("⚠️ The AI assistant is temporarily unavailable (model quota or outage), so this command "
+                       "was not run. Please retry in a minute or use the dashboard controls.")
+
+def degraded_reply(persona: str, text: str, session_id: str = None) -> str:
+    """Victim messages are queued for a supervisor; supervisor commands are not run."""
+    if persona == "supervisor":
+        return SUPERVISOR_FALLBACK
+    message = SOURCE_TAG.sub("", text or "").strip()
+    match = LOCATION.match(LEAD_IN.sub("", message.lower().rstrip(".!? "), count=1))
+    location = match.group("location").strip().title() if match else "Unknown"
+    request_id = tools_client.queue_unprocessed_message(
+        message, location, is_critical=bool(URGENT_WORDS.search(message.lower())), session_id=session_id)
+    print(f"🔌 Degraded mode: queued message as request #{request_id}")
+    return VICTIM_FALLBACK.format(request_id=request_id)
@@ -1,29 +1,31 @@
 import asyncio
 import os
-import sqlite3
 import base64
 import queue
 import threading
 import time
 import random
 import re
+import uuid
+from collections import deque
 from flask import Flask, render_template, request, jsonify
 from dotenv import load_dotenv
+import circuit_breaker
+import database
+import fast_path
+import metrics
+import rate_limiter
+from session_store import SqliteSessionService
 
 # --- ADK IMPORTS ---
-from google.adk.agents import Agent
-from google.adk.models.google_llm import Gemini
 from google.adk.runners import Runner
 from google.adk.agents.remote_a2a_agent import RemoteA2aAgent, AGENT_CARD_WELL_KNOWN_PATH
-from google.adk.sessions import InMemorySessionService
+from google.adk.events.event import Event
 from google.genai import types
-from google.genai.errors import ClientError
-from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
 
 load_dotenv()
 
 app = Flask(__name__)
-DB_PATH = os.path.join(os.path.dirname(__file__), "relief_logistics.db")
 
 # --- GLOBAL STATE ---
 TASK_QUEUE = queue.Queue()
@@ -37,49 +39,25 @@ SUPERVISOR_ACTIVITY_LOG = []
 
 VICTIM_RUNNER = None
 SUPERVISOR_RUNNER = None
+# Model behind the A2A backend; a 429 passed back from it blocks it for both processes
+FRONTEND_MODEL = "gemini-2.5-flash"
 
 def initialize_adk_agents():
+    """
+    The runners talk A2A to relief_manager directly: no frontend LLM in between.
+    The backend router picks the orchestrator from the persona metadata sent
+    with every message (the [[SOURCE: ...]] tag is the fallback).
+    """
     global VICTIM_RUNNER, SUPERVISOR_RUNNER
-    if "GOOGLE_API_KEY" not in os.environ: raise ValueError("GOOGLE_API_KEY not found.")
-
-    retry_config = types.HttpRetryOptions(attempts=3, initial_delay=1, max_delay=10, exp_base=2)
-    session_service = InMemorySessionService()
-
-    proxy_vic = RemoteA2aAgent(name="relief_manager", description="Hub", agent_card=f"http://localhost:8001{AGENT_CARD_WELL_KNOWN_PATH}")
-    proxy_sup = RemoteA2aAgent(name="relief_manager", description="Hub", agent_card=f"http://localhost:8001{AGENT_CARD_WELL_KNOWN_PATH}")
-
-    valid_items = "water_bottles, food_packs, medical_kits, blankets, batteries"
-
-    victim_agent = Agent(
-        model=Gemini(model="gemini-2.5-flash", retry_options=retry_config),
-        name="victim_support",
-        instruction=f"""You coordinate victim relief requests.
+    session_service = SqliteSessionService()  # shared by every frontend worker, survives restarts
 
-CRITICAL: If user provides additional info (like location), look at EARLIER messages for items/quantities!
+    proxy_vic = RemoteA2aAgent(name="relief_manager", description="Hub", agent_card=f"http://localhost:8001{AGENT_CARD_WELL_KNOWN_PATH}",
+                               a2a_request_meta_provider=lambda ctx, message: {"persona": "victim", "session_id": ctx.session.id})
+    proxy_sup = RemoteA2aAgent(name="relief_manager", description="Hub", agent_card=f"http://localhost:8001{AGENT_CARD_WELL_KNOWN_PATH}",
+                               a2a_request_meta_provider=lambda ctx, message: {"persona": "supervisor", "session_id": ctx.session.id})
 
-Example CORRECT:
-- User: "need 20 water bottles"
-- User: "at Delhi"
-→ You remember: 20 water bottles at Delhi
-
-Example WRONG:
-- User: "need 20 water bottles"
-- User: "at Delhi"  
-→ You ask: "What item?" ❌ NO! You already know!
-
-Available items: [{valid_items}]
-Delegate to 'relief_manager'.""",
-        sub_agents=[proxy_vic]
-    )
-    VICTIM_RUNNER = Runner(agent=victim_agent, app_name="victim_frontend", session_service=session_service)
-    
-    supervisor_agent = Agent(
-        model=Gemini(model="gemini-2.5-flash", retry_options=retry_config),
-        name="supervisor",
-        instruction=f"Supervisor. Items: [{valid_items}]. Delegate to 'relief_manager'. Use BATCH tools.",
-        sub_agents=[proxy_sup]
-    )
-    SUPERVISOR_RUNNER = Runner(agent=supervisor_agent, app_name="supervisor_frontend", session_service=session_service)
+    VICTIM_RUNNER = Runner(agent=proxy_vic, app_name="victim_frontend", session_service=session_service)
+    SUPERVISOR_RUNNER = Runner(agent=proxy_sup, app_name="supervisor_frontend", session_service=session_service)
     print("✅ ADK Agents Initialized.")
 
 # --- WORKER ---
@@ -92,124 +70,268 @@ def extract_retry_delay(error_message):
     if match: return float(match.group(1))
     return None
 
-def agent_worker():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    last_api_call_time = 0
-    MIN_GAP = 6.0 
-
-    async def run_task(job):
-        nonlocal last_api_call_time
-        runner = SUPERVISOR_RUNNER if job["persona"] == "supervisor" else VICTIM_RUNNER
-        session_id = job.get("session_id", "default_session")
+# Jobs run concurrently on one asyncio loop, up to AGENT_WORKER_CONCURRENCY at a
+# time. Jobs of the same (persona, session) run one after another in arrival
+# order, so a conversation never sees its replies out of order.
+AGENT_WORKER_CONCURRENCY = int(os.environ.get("AGENT_WORKER_CONCURRENCY", 4))
+WORKER_SAMPLE_SIZE = 1000
+
+WORKER_METRICS = {"submitted": 0, "completed": 0, "failed": 0, "in_flight": 0,
+                  "queue_wait": deque(maxlen=WORKER_SAMPLE_SIZE), "service_time": deque(maxlen=WORKER_SAMPLE_SIZE)}
+
+# Prometheus metrics (/metrics); WORKER_METRICS above backs the JSON /api/worker_metrics
+A2A_CALLS = metrics.counter("relief_a2a_calls_total", "Calls to the relief_manager A2A backend per persona and outcome.")
+A2A_LATENCY = metrics.histogram("relief_a2a_call_seconds", "relief_manager A2A round-trip time per persona.")
+A2A_RETRIES = metrics.counter("relief_a2a_retries_total", "A2A calls retried after a 429 or 503, per persona.")
+A2A_SLEEP = metrics.counter("relief_a2a_sleep_seconds_total", "Seconds the worker slept before retrying an A2A call.")
+JOBS = metrics.counter("relief_agent_jobs_total", "Finished agent jobs per persona, path (fast_path, agents, degraded) and outcome.")
+JOB_SECONDS = metrics.histogram("relief_agent_job_seconds", "Agent job service time per persona and path.")
+QUEUE_WAIT = metrics.histogram("relief_agent_queue_wait_seconds", "Time from submission until a job starts, per persona.")
+QUEUE_DEPTH = metrics.gauge("relief_task_queue_depth", "Jobs in TASK_QUEUE not yet picked up by the pool.")
+JOBS_WAITING = metrics.gauge("relief_agent_jobs_waiting", "Submitted jobs not started yet (queue + waiting for a slot or session).")
+JOBS_IN_FLIGHT = metrics.gauge("relief_agent_jobs_in_flight", "Jobs currently running.")
+OLDEST_JOB_AGE = metrics.gauge("relief_task_queue_oldest_job_age_seconds", "Age of the oldest submitted job that hasn't started.")
+WAITING_JOBS = {}  # id(job) -> enqueued_at, until the job starts
+
+def _collect_queue_metrics():
+    waiting = list(WAITING_JOBS.values())
+    QUEUE_DEPTH.set(TASK_QUEUE.qsize())
+    JOBS_WAITING.set(len(waiting))
+    JOBS_IN_FLIGHT.set(WORKER_METRICS["in_flight"])
+    OLDEST_JOB_AGE.set(round(time.time() - min(waiting), 3) if waiting else 0)
+
+metrics.add_collector(_collect_queue_metrics)
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3)
+
+def worker_metrics() -> dict:
+    """Counters plus p50/p95/max queue wait and service time (seconds) over the last samples."""
+    snapshot = {key: value for key, value in WORKER_METRICS.items() if not isinstance(value, deque)}
+    snapshot["queue_depth"] = TASK_QUEUE.qsize()
+    snapshot["concurrency"] = AGENT_WORKER_CONCURRENCY
+    for key in ("queue_wait", "service_time"):
+        samples = list(WORKER_METRICS[key])
+        snapshot[key] = {"p50": _percentile(samples, 0.5), "p95": _percentile(samples, 0.95),
+                         "max": round(max(samples), 3) if samples else 0.0, "samples": len(samples)}
+    return snapshot
+
+async def run_task(job):
+    runner = SUPERVISOR_RUNNER if job["persona"] == "supervisor" else VICTIM_RUNNER
+    session_id = job.get("session_id", "default_session")
+    
+    # Store session_id in the message metadata for backend to extract
+    # Since frontend and backend are separate processes, we can't use global variables
+    
+    user_message = None
+    if "text" in job and job["text"]:
+        # Session is stored in database, no need to pass in message
+        user_message = types.Content(role="user", parts=[types.Part(text=job["text"])])
+    elif "audio" in job and job["audio"]:
+        try:
+            header, encoded = job["audio"].split(",", 1)
+            audio_bytes = base64.b64decode(encoded)
+            user_message = types.Content(role="user", parts=[types.Part(inline_data=types.Blob(mime_type="audio/webm", data=audio_bytes))])
+        except: return "Audio Error"
+
+    if not user_message: return "No content"
+
+    # Model calls happen in the backend, paced per call by rate_limiter inside SmartGemini.
+    # Retries here share one MAX_MODEL_WAIT budget; past it (or with the breaker open)
+    # ModelUnavailable sends the job to the degraded-mode reply.
+    persona = job["persona"]
+    max_retries = 5
+    deadline = time.monotonic() + circuit_breaker.MAX_MODEL_WAIT
+    for attempt in range(max_retries + 1):
+        started = time.perf_counter()
+        try:
+            try: await runner.session_service.create_session(app_name=runner.app_name, user_id=job["persona"], session_id=session_id)
+            except: pass
+
+            final_response = None
+            async for event in runner.run_async(user_id=job["persona"], session_id=session_id, new_message=user_message):
+                if event.is_final_response() and event.content:
+                    final_response = event.content.parts[0].text
+            
+            if final_response:
+                A2A_LATENCY.observe(time.perf_counter() - started, persona=persona)
+                A2A_CALLS.inc(persona=persona, outcome="ok")
+                return final_response
+            else:
+                raise Exception("Empty response")
+
+        except Exception as e:
+            A2A_LATENCY.observe(time.perf_counter() - started, persona=persona)
+            error_str = str(e)
+            if "429" in error_str or "RESOURCE" in error_str or "Quota" in error_str:
+                A2A_CALLS.inc(persona=persona, outcome="rate_limited")
+                wait = extract_retry_delay(error_str) or calculate_backoff(attempt)
+                if attempt >= max_retries or time.monotonic() + wait > deadline or await circuit_breaker.is_open_async(FRONTEND_MODEL):
+                    print(f"❌ Frontend: Rate limited, giving up after {attempt + 1} attempt(s)")
+                    raise circuit_breaker.ModelUnavailable(error_str)
+                print(f"⏳ Frontend: Rate limit hit, retrying after {wait:.2f}s (attempt {attempt + 1}/{max_retries})")
+                # Holds the backend's calls to the model off too (SQLite write, so in a thread)
+                await asyncio.to_thread(rate_limiter.penalize, FRONTEND_MODEL, wait + 1)
+                A2A_RETRIES.inc(persona=persona)
+                A2A_SLEEP.inc(wait, persona=persona)
+                await asyncio.sleep(wait)
+                continue
+            elif "503" in error_str:
+                A2A_CALLS.inc(persona=persona, outcome="unavailable")
+                if attempt >= max_retries or time.monotonic() + 2 > deadline:
+                    print(f"❌ Frontend: Backend unavailable, giving up after {attempt + 1} attempt(s)")
+                    raise circuit_breaker.ModelUnavailable(error_str)
+                A2A_RETRIES.inc(persona=persona)
+                A2A_SLEEP.inc(2, persona=persona)
+                await asyncio.sleep(2)
+                continue
+            else:
+                A2A_CALLS.inc(persona=persona, outcome="error")
+                print(f"❌ Frontend: Connection error: {error_str}")
+                return None  # Don't send error to frontend
+    return None  # Timeout - don't send to frontend
+
+async def record_fast_path_turn(session_id: str, text: str, result: dict):
+    """
+    Appends a fast-path exchange to the chat's ADK session. The A2A proxy sends
+    everything since the backend's last reply with the next agent turn, so the
+    agents see the message, the reply and what was requested (with request ids).
+    """
+    service, app_name = VICTIM_RUNNER.session_service, VICTIM_RUNNER.app_name
+    session = await service.get_session(app_name=app_name, user_id="victim", session_id=session_id)
+    if session is None:
+        session = await service.create_session(app_name=app_name, user_id="victim", session_id=session_id)
+    invocation_id = f"e-{uuid.uuid4()}"
+    await service.append_event(session, Event(invocation_id=invocation_id, author="user",
+                                              content=types.Content(role="user", parts=[types.Part(text=text)])))
+    reply = [types.Part(text=result["summary"]), types.Part(text=fast_path.record_text(result["results"]))]
+    await service.append_event(session, Event(invocation_id=invocation_id, author="fast_path",
+                                              content=types.Content(role="model", parts=reply)))
+
+async def handle_job(job):
+    # Save User Message to History
+    user_msg_added = False
+    if job["persona"] == "victim":
+        sess_id = job.get("session_id")
+        if sess_id not in CHAT_STORE: CHAT_STORE[sess_id] = []
+        msg_text = job.get("text", "Audio Message")
+        # Strip SOURCE tags before saving to history (for clean display)
+        msg_text_clean = msg_text.replace("[[SOURCE: VICTIM]] ", "").replace("[[SOURCE: VICTIM]]", "")
+        CHAT_STORE[sess_id].append({"sender": "user", "text": msg_text_clean})
+        user_msg_added = True
         
-        # Store session_id in the message metadata for backend to extract
-        # Since frontend and backend are separate processes, we can't use global variables
+        # Store session in database for the debug page (SQLite writes stay off the event loop)
+        await asyncio.to_thread(database.register_active_session, sess_id, "ACTIVE")
+        print(f"[FRONTEND] 🔍 Registered session {sess_id} as ACTIVE")
         
-        user_message = None
-        if "text" in job and job["text"]:
-            # Session is stored in database, no need to pass in message
-            user_message = types.Content(role="user", parts=[types.Part(text=job["text"])])
-        elif "audio" in job and job["audio"]:
-            try:
-                header, encoded = job["audio"].split(",", 1)
-                audio_bytes = base64.b64decode(encoded)
-                user_message = types.Content(role="user", parts=[types.Part(inline_data=types.Blob(mime_type="audio/webm", data=audio_bytes))])
-            except: return "Audio Error"
-
-        if not user_message: return "No content"
-
-        max_retries = 5
-        for attempt in range(max_retries + 1):
-            elapsed = time.time() - last_api_call_time
-            if elapsed < MIN_GAP: time.sleep(MIN_GAP - elapsed)
-
-            try:
-                try: await runner.session_service.create_session(app_name=runner.app_name, user_id=job["persona"], session_id=session_id)
-                except: pass
-
-                final_response = None
-                async for event in runner.run_async(user_id=job["persona"], session_id=session_id, new_message=user_message):
-                    if event.is_final_response() and event.content:
-                        final_response = event.content.parts[0].text
-                
-                if final_response:
-                    last_api_call_time = time.time()
-                    return final_response
-                else:
-                    raise Exception("Empty response")
-
-            except Exception as e:
-                error_str = str(e)
-                if "429" in error_str or "RESOURCE" in error_str or "Quota" in error_str:
-                    if attempt < max_retries:
-                        wait = extract_retry_delay(error_str) or calculate_backoff(attempt)
-                        print(f"⏳ Frontend: Rate limit hit, retrying after {wait:.2f}s (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(wait + 1)
-                        continue
-                    else:
-                        print(f"❌ Frontend: Rate limit exceeded after {max_retries} retries")
-                        return None  # Don't send error to frontend
-                elif "503" in error_str:
-                    time.sleep(2)
-                    continue
-                else:
-                    print(f"❌ Frontend: Connection error: {error_str}")
-                    return None  # Don't send error to frontend
-        return None  # Timeout - don't send to frontend
+        # Session ID is now stored directly in requests when created
+        # No need for location-based session mapping anymore
 
-    while True:
-        job = TASK_QUEUE.get()
-        if job is None: break
-        
-        # Save User Message to History
-        user_msg_added = False
+    client_id = job["client_id"]
+    
+    # Well-formed victim requests skip the agent chain entirely. Its transaction
+    # can wait on the write lock, so it runs off the event loop like degraded_reply.
+    started = time.perf_counter()
+    res, path = None, "agents"
+    if job["persona"] == "victim" and job.get("text"):
+        handled = await asyncio.to_thread(fast_path.handle_victim_request, job["text"], job.get("session_id"))
+        if handled is not None:
+            res, path = handled["summary"], "fast_path"
+            if VICTIM_RUNNER and job.get("session_id"):
+                try:
+                    await record_fast_path_turn(job["session_id"], job["text"], handled)
+                except Exception as e:
+                    print(f"⚠️ Fast path turn not recorded in the ADK session: {e}")
+    if res is None:
+        try:
+            if await circuit_breaker.is_open_async(FRONTEND_MODEL):
+                raise circuit_breaker.ModelUnavailable("circuit breaker is open")
+            res = await run_task(job)
+        except circuit_breaker.ModelUnavailable:
+            # Degraded mode: a templated reply (victim messages queued for a supervisor), off the event loop
+            path = "degraded"
+            res = await asyncio.to_thread(fast_path.degraded_reply, job["persona"],
+                                          job.get("text") or "(voice message)", job.get("session_id"))
+    JOB_SECONDS.observe(time.perf_counter() - started, persona=job["persona"], path=path)
+    JOBS.inc(persona=job["persona"], path=path, outcome="ok" if res is not None else "failed")
+
+    # Only save and send to frontend if we have a valid response
+    if res is not None:
+        # Save AI Response to History
         if job["persona"] == "victim":
             sess_id = job.get("session_id")
-            if sess_id not in CHAT_STORE: CHAT_STORE[sess_id] = []
-            msg_text = job.get("text", "Audio Message")
-            # Strip SOURCE tags before saving to history (for clean display)
-            msg_text_clean = msg_text.replace("[[SOURCE: VICTIM]] ", "").replace("[[SOURCE: VICTIM]]", "")
-            CHAT_STORE[sess_id].append({"sender": "user", "text": msg_text_clean})
-            user_msg_added = True
-            
-            # Store session in database so tools can look it up
-            import database
-            database.register_active_session(sess_id, location="ACTIVE")
-            print(f"[FRONTEND] 🔍 Registered session {sess_id} as ACTIVE")
-            
-            # Session ID is now stored directly in requests when created
-            # No need for location-based session mapping anymore
+            CHAT_STORE[sess_id].append({"sender": "ai", "text": res})
+        elif job["persona"] == "supervisor":
+            # Log supervisor command response to activity log
+            response_msg = f"✅ {job['task_name']}: {res}"
+            log_supervisor_activity(response_msg, "info" if "ERROR" not in res else "error")
+
+        if client_id not in JOB_RESULTS: JOB_RESULTS[client_id] = []
+        JOB_RESULTS[client_id].append({"task_name": job["task_name"], "output": res, "persona": job["persona"]})
+    else:
+        print(f"⚠️ Skipping result for {job['task_name']} - backend error suppressed")
+        # Remove user message from history if we added it but got no response
+        if user_msg_added and job["persona"] == "victim":
+            sess_id = job.get("session_id")
+            if CHAT_STORE.get(sess_id) and CHAT_STORE[sess_id][-1]["sender"] == "user":
+                CHAT_STORE[sess_id].pop()
+                print(f"   Removed orphaned user message from chat history")
+    return res
+
+async def worker_pool(concurrency: int = None):
+    """Pulls jobs off TASK_QUEUE until a None job arrives, then waits for the in-flight ones."""
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency or AGENT_WORKER_CONCURRENCY)
+    session_locks = {}  # (persona, session_id) -> [lock, jobs holding or waiting for it]
+    tasks = set()
+
+    async def run(job, key):
+        entry = session_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            # Same-session jobs queue on the lock (FIFO) without taking a slot
+            async with entry[0], slots:
+                WAITING_JOBS.pop(id(job), None)
+                queue_wait = time.time() - job.get("enqueued_at", time.time())
+                WORKER_METRICS["queue_wait"].append(queue_wait)
+                QUEUE_WAIT.observe(queue_wait, persona=job.get("persona"))
+                WORKER_METRICS["in_flight"] += 1
+                started = time.perf_counter()
+                try:
+                    res = await handle_job(job)
+                    WORKER_METRICS["completed" if res is not None else "failed"] += 1
+                except Exception as e:
+                    WORKER_METRICS["failed"] += 1
+                    print(f"❌ Worker: job {job.get('task_name')} crashed: {e}")
+                finally:
+                    WORKER_METRICS["in_flight"] -= 1
+                    WORKER_METRICS["service_time"].append(time.perf_counter() - started)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del session_locks[key]
 
-        client_id = job["client_id"]
-        
-        # Session is stored in database and in the job itself
-        
-        res = loop.run_until_complete(run_task(job))
-        
-        # Session stored in database, no cleanup needed
-
-        # Only save and send to frontend if we have a valid response
-        if res is not None:
-            # Save AI Response to History
-            if job["persona"] == "victim":
-                sess_id = job.get("session_id")
-                CHAT_STORE[sess_id].append({"sender": "ai", "text": res})
-            elif job["persona"] == "supervisor":
-                # Log supervisor command response to activity log
-                response_msg = f"✅ {job['task_name']}: {res}"
-                log_supervisor_activity(response_msg, "info" if "ERROR" not in res else "error")
-
-            if client_id not in JOB_RESULTS: JOB_RESULTS[client_id] = []
-            JOB_RESULTS[client_id].append({"task_name": job["task_name"], "output": res, "persona": job["persona"]})
-        else:
-            print(f"⚠️ Skipping result for {job['task_name']} - backend error suppressed")
-            # Remove user message from history if we added it but got no response
-            if user_msg_added and job["persona"] == "victim":
-                sess_id = job.get("session_id")
-                if CHAT_STORE.get(sess_id) and CHAT_STORE[sess_id][-1]["sender"] == "user":
-                    CHAT_STORE[sess_id].pop()
-                    print(f"   Removed orphaned user message from chat history")
+    while True:
+        job = await loop.run_in_executor(None, TASK_QUEUE.get)
+        if job is None: break
+        key = (job.get("persona"), job.get("session_id", "default_session"))
+        task = asyncio.create_task(run(job, key))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+def agent_worker(concurrency: int = None):
+    asyncio.run(worker_pool(concurrency))
+
+def submit_job(job: dict):
+    job["enqueued_at"] = time.time()
+    WAITING_JOBS[id(job)] = job["enqueued_at"]
+    WORKER_METRICS["submitted"] += 1
+    TASK_QUEUE.put(job)
 
 # --- ROUTES ---
 @app.route("/")
@@ -222,29 +344,49 @@ def supervisor_dashboard(): return render_template("supervisor_dashboard.html")
 
 @app.route("/debug")
 def debug_page():
-    """Debug page to view all database tables"""
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    
-    # Get inventory
-    inventory = [dict(row) for row in conn.execute("SELECT * FROM inventory ORDER BY item_name").fetchall()]
-    
-    # Get requests
-    requests = [dict(row) for row in conn.execute("SELECT * FROM requests ORDER BY id DESC").fetchall()]
-    
-    # Get active sessions
-    sessions = [dict(row) for row in conn.execute("SELECT * FROM active_sessions ORDER BY timestamp DESC").fetchall()]
-    
-    conn.close()
-    
-    return render_template("debug.html", inventory=inventory, requests=requests, sessions=sessions)
+    """Debug page. Inventory is rendered inline; requests and sessions are fetched page by page by debug.js."""
+    inventory = sorted(database.get_all_items(), key=lambda r: r['item_name'])
+    return render_template("debug.html", inventory=inventory, page_size=database.DEFAULT_PAGE_SIZE)
+
+def _page_args():
+    """Reads ?cursor=&limit= from the query string (limit is capped at database.MAX_PAGE_SIZE)."""
+    cursor = request.args.get("cursor", type=int)
+    return cursor, database.clamp_page_size(request.args.get("limit", database.DEFAULT_PAGE_SIZE))
+
+@app.route("/api/debug/requests", methods=["GET"])
+def debug_requests():
+    """Keyset-paginated requests. Filters: status (comma list), item, location, session; archive=1 includes archived rows."""
+    cursor, limit = _page_args()
+    rows, next_cursor = database.get_requests_page(
+        cursor, limit,
+        status=request.args.get("status"), item_name=request.args.get("item"),
+        location=request.args.get("location"), session_id=request.args.get("session"),
+        include_archive=request.args.get("archive") == "1"
+    )
+    return jsonify({"requests": rows, "next_cursor": next_cursor})
+
+@app.route("/api/debug/sessions", methods=["GET"])
+def debug_sessions():
+    """Keyset-paginated active sessions. Filters: location, session."""
+    cursor, limit = _page_args()
+    rows, next_cursor = database.get_active_sessions_page(
+        cursor, limit, location=request.args.get("location"), session_id=request.args.get("session")
+    )
+    return jsonify({"sessions": rows, "next_cursor": next_cursor})
 
 @app.route("/api/submit_task", methods=["POST"])
 def submit_task():
-    TASK_QUEUE.put(request.json)
+    submit_job(request.json)
     return jsonify({"status": "queued"})
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+@app.route("/api/worker_metrics", methods=["GET"])
+def get_worker_metrics():
+    return jsonify(worker_metrics())
+
 @app.route("/api/get_results/<client_id>", methods=["GET"])
 def get_results(client_id):
     results = JOB_RESULTS.pop(client_id, [])
@@ -275,30 +417,35 @@ def debug_all_sessions():
 @app.route("/api/supervisor_data", methods=["GET"])
 def get_supervisor_data():
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        inventory = [dict(row) for row in conn.execute("SELECT * FROM inventory ORDER BY item_name ASC").fetchall()]
+        inventory = sorted(database.get_all_items(), key=lambda r: r['item_name'])
         # Include PENDING_DISPATCH in the supervisor view so they can see pending auto-dispatch requests
-        requests = [dict(row) for row in conn.execute("SELECT * FROM requests WHERE status IN ('PENDING', 'ACTION_REQUIRED', 'PENDING_DISPATCH') ORDER BY urgency DESC, id ASC").fetchall()]
-        conn.close()
+        requests = database.get_requests_by_status(database.OPEN_STATUSES)
         return jsonify({"inventory": inventory, "requests": requests})
     except Exception as e: return jsonify({"error": str(e)}), 500
 
 @app.route("/api/audit_log", methods=["GET"])
 def get_audit_log():
-    """Returns audit logs from database (excluding AI_APPROVED and PENDING_DISPATCH which are now in activity log)"""
+    """
+    Returns audit logs from database (excluding AI_APPROVED and PENDING_DISPATCH which are now in activity log).
+    Paginated with ?cursor=<id>&limit=N (default 20) and filterable by status, item, location, session.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        cursor = request.args.get("cursor", type=int)
+        limit = database.clamp_page_size(request.args.get("limit", 20))
         # Fetch logs excluding AI_APPROVED and PENDING_DISPATCH (those go to activity log now)
-        rows = conn.execute("SELECT * FROM requests WHERE status NOT IN ('PENDING', 'ACTION_REQUIRED', 'FLAGGED', 'AI_APPROVED', 'PENDING_DISPATCH') ORDER BY id DESC LIMIT 20").fetchall()
-        conn.close()
+        rows, next_cursor = database.get_requests_page(
+            cursor, limit,
+            status=request.args.get("status"), item_name=request.args.get("item"),
+            location=request.args.get("location"), session_id=request.args.get("session"),
+            exclude_status=('PENDING', 'ACTION_REQUIRED', 'UNPROCESSED', 'FLAGGED', 'AI_APPROVED', 'PENDING_DISPATCH'),
+            include_archive=True
+        )
         logs = []
         for r in rows:
             status = r["status"]
             action = f"{status}: {r['notes'] or 'Processed'} ({r['item_name']} x{r['quantity']})"
             logs.append({"id": r["id"], "action": action})
-        return jsonify({"logs": logs})
+        return jsonify({"logs": logs, "next_cursor": next_cursor})
     except Exception as e: return jsonify({"error": str(e)}), 500
 
 @app.route("/api/supervisor_activity_log", methods=["GET"])
@@ -345,6 +492,8 @@ def log_supervisor_activity(action: str, log_type: str = "info"):
     # Keep only last 200 entries to prevent memory bloat
     if len(SUPERVISOR_ACTIVITY_LOG) > 200:
         SUPERVISOR_ACTIVITY_LOG.pop(0)
+    # Persist for history (buffered/group-committed, see database.ACTIVITY_LOG_DURABILITY)
+    database.add_activity_log(action, log_type)
 
 # --- 🔥 NEW DIRECT ADMIN ROUTES ---
 
@@ -356,14 +505,10 @@ def admin_restock():
     qty = int(data.get("quantity", 0))
     
     try:
-        conn = sqlite3.connect(DB_PATH)
         # 1. Update Stock
-        conn.execute("UPDATE inventory SET quantity = quantity + ? WHERE item_name = ?", (qty, item))
-        conn.commit()
-        
-        # Fetch new total
-        new_total = conn.execute("SELECT quantity FROM inventory WHERE item_name = ?", (item,)).fetchone()[0]
-        conn.close()
+        if database.get_item_stock(item) == -1:
+            raise ValueError(f"Item '{item}' not found")
+        new_total = database.increment_stock(item, qty)
         
         # Log to supervisor activity log (in-memory dictionary, not DB)
         log_supervisor_activity(f"ADMIN_ACTION: Restocked {item} by {qty}. Total: {new_total}", "success")
@@ -394,11 +539,8 @@ def admin_add_item():
     qty = int(data.get("quantity", 0))
     
     try:
-        conn = sqlite3.connect(DB_PATH)
         # 1. Add Item
-        conn.execute("INSERT INTO inventory (item_name, quantity) VALUES (?, ?)", (item, qty))
-        conn.commit()
-        conn.close()
+        database.add_new_item(item, qty)
         
         # Log to supervisor activity log (in-memory dictionary, not DB)
         log_supervisor_activity(f"ADMIN_ACTION: Created item '{item}' with {qty} units", "success")
@@ -410,9 +552,11 @@ def admin_add_item():
 
 @app.route("/api/admin/resolve/<int:request_id>", methods=["POST"])
 def admin_resolve(request_id):
-    """Resolve an ACTION_REQUIRED request with buffer and auto-dispatch."""
+    """Resolve an ACTION_REQUIRED request with buffer and auto-dispatch (an UNPROCESSED message is just marked handled)."""
     try:
         import tools_supervisor
+        req = database.get_request_by_id(request_id)
+        unprocessed = bool(req) and req['status'] == 'UNPROCESSED'
         result = tools_supervisor.supervisor_resolve_action_required(request_id, buffer_multiplier=1.5)
         
         # Clean the result string for JSON (remove special characters, newlines)
@@ -423,13 +567,8 @@ def admin_resolve(request_id):
         
         # Check if there were auto-dispatches
         import tools_client
-        # Get the item from the request
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        req = conn.execute("SELECT item_name FROM requests WHERE id = ?", (request_id,)).fetchone()
-        conn.close()
         
-        if req:
+        if req and not unprocessed:
             item_name = req['item_name']
             # Process any pending dispatches (shouldn't be any, but check)
             dispatch_messages = tools_client.process_pending_dispatches(item_name)
@@ -454,6 +593,7 @@ def admin_resolve(request_id):
 
 if __name__ == "__main__":
     import os
+    database.init_db()
     initialize_adk_agents()
     threading.Thread(target=agent_worker, daemon=True).start()
     # Render assigns PORT environment variable for web services
@@ -0,0 +1,287 @@
+import database
+from collections import Counter, OrderedDict, defaultdict
+from difflib import SequenceMatcher
+import json
+import os
+import re
+import threading
+
+# Fuzzy matching threshold (same 60% similarity difflib.get_close_matches used)
+FUZZY_CUTOFF = 0.6
+# How many trigram-ranked candidates get the exact SequenceMatcher score
+MAX_CANDIDATES = 32
+# Trigrams found in more items than this are ignored for candidate selection
+COMMON_TRIGRAM_LIMIT = 1000
+# Minimum similarity for search_catalog results (looser than resolution, it's a shortlist)
+SEARCH_CUTOFF = 0.4
+# Below this confidence the victim flow falls back to the item_finder_agent LLM
+LOCAL_MATCH_THRESHOLD = float(os.environ.get("LOCAL_MATCH_THRESHOLD", 0.8))
+
+# Common names for catalog items. Targets that aren't in the inventory are ignored.
+# Extend/override with a JSON object {"alias": "database_key"} in ITEM_SYNONYMS_FILE.
+ITEM_SYNONYMS = {
+    "water": "water_bottles", "drinking_water": "water_bottles", "bottled_water": "water_bottles",
+    "food": "food_packs", "meals": "food_packs", "rations": "food_packs", "food_kits": "food_packs",
+    "medkit": "medical_kits", "med_kit": "medical_kits", "first_aid": "medical_kits",
+    "first_aid_kit": "medical_kits", "medicine": "medical_kits", "medical_supplies": "medical_kits",
+    "quilts": "blankets",
+    "cells": "batteries", "battery_packs": "batteries",
+    "shelter": "tents", "shelters": "tents",
+    "torch": "flashlights", "torches": "flashlights", "flash_lights": "flashlights",
+}
+if os.environ.get("ITEM_SYNONYMS_FILE"):
+    with open(os.environ["ITEM_SYNONYMS_FILE"]) as f:
+        ITEM_SYNONYMS.update(json.load(f))
+
+def basic_normalize(item_name: str) -> str:
+    """lowercase, spaces/hyphens -> underscores (the database key format)"""
+    return item_name.lower().replace(" ", "_").replace("-", "_")
+
+def clean_normalize(item_name: str) -> str:
+    """Like basic_normalize, but any run of non-alphanumerics becomes one underscore."""
+    return re.sub(r"[^a-z0-9]+", "_", item_name.lower()).strip("_")
+
+def inflections(normalized: str) -> list[str]:
+    """Singular/plural variants of the last word: tent <-> tents, battery <-> batteries, box <-> boxes."""
+    head, _, last = normalized.rpartition("_")
+    prefix = f"{head}_" if head else ""
+    forms = []
+    if last.endswith("ies"):
+        forms.append(last[:-3] + "y")
+    if last.endswith("es"):
+        forms.append(last[:-2])
+    if last.endswith("s"):
+        forms.append(last[:-1])
+    else:
+        if last.endswith("y"):
+            forms.append(last[:-1] + "ies")
+        forms += [last + "s", last + "es"]
+    return [prefix + form for form in forms if form]
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class ItemMatcher:
+    """
+    Inverted trigram index over the inventory keys. A lookup only scores the
+    items that share the most trigrams with the input instead of running
+    difflib against the whole catalog.
+    """
+    def __init__(self, item_names: list[str]):
+        self.keys = {}                  # normalized form -> database key
+        self.index = defaultdict(list)  # trigram -> normalized forms containing it
+        for name in item_names:
+            normalized = name.replace(" ", "_").replace("-", "_")
+            self.keys[normalized] = name
+            for gram in _trigrams(normalized):
+                self.index[gram].append(normalized)
+
+    def match(self, normalized: str, cutoff: float = FUZZY_CUTOFF):
+        """Returns (database_key, score) of the best match >= cutoff, or (None, 0.0)."""
+        if normalized in self.keys:
+            return self.keys[normalized], 1.0
+
+        # Count shared trigrams per item, skipping very common trigrams when
+        # rarer ones are available (they dominate the cost and barely discriminate)
+        postings = sorted((self.index[g] for g in _trigrams(normalized) if g in self.index), key=len)
+        if not postings:
+            return None, 0.0
+        selective = [p for p in postings if len(p) <= COMMON_TRIGRAM_LIMIT] or postings[:1]
+        shared = Counter()
+        for posting in selective:
+            shared.update(posting)
+
+        # Same scoring as difflib.get_close_matches, on the best candidates only
+        best, best_score = None, 0.0
+        matcher = SequenceMatcher()
+        matcher.set_seq2(normalized)
+        for candidate, _ in shared.most_common(MAX_CANDIDATES):
+            matcher.set_seq1(candidate)
+            # The cheap upper bounds must beat both the cutoff and the best score so far
+            bar = max(cutoff, best_score)
+            if matcher.real_quick_ratio() < bar or matcher.quick_ratio() < bar:
+                continue
+            score = matcher.ratio()
+            if score >= cutoff and (score, candidate) > (best_score, best or ""):
+                best, best_score = candidate, score
+        return (self.keys[best], best_score) if best else (None, 0.0)
+
+    def search(self, normalized: str, k: int = 5, cutoff: float = SEARCH_CUTOFF) -> list[tuple[str, float]]:
+        """Top-k (database_key, score) by difflib similarity, best first."""
+        postings = sorted((self.index[g] for g in _trigrams(normalized) if g in self.index), key=len)
+        selective = [p for p in postings if len(p) <= COMMON_TRIGRAM_LIMIT] or postings[:1]
+        shared = Counter()
+        for posting in selective:
+            shared.update(posting)
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(normalized)
+        scored = []
+        for candidate, _ in shared.most_common(max(MAX_CANDIDATES, k * 4)):
+            matcher.set_seq1(candidate)
+            # Substring hits ("water" in "water_bottles") rank at least at the cutoff
+            score = max(matcher.ratio(), SEARCH_CUTOFF if normalized in candidate else 0.0)
+            if score >= cutoff:
+                scored.append((score, candidate))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(self.keys[candidate], round(score, 3)) for score, candidate in scored[:k]]
+
+# --- SHARED INDEX + RESOLUTION CACHE ---
+# Both rebuilt/cleared only when items are added/renamed/deleted
+# (database.catalog_version), not on stock changes.
+RESOLVE_CACHE_SIZE = 4096
+
+_lock = threading.Lock()
+_matcher = None
+_matcher_version = None
+_resolved = OrderedDict()  # (raw input, synonyms) -> match_item result, LRU order, includes misses
+_stats = {"hits": 0, "misses": 0, "rebuilds": 0}
+
+def get_matcher() -> ItemMatcher:
+    global _matcher, _matcher_version
+    version = (database.DB_FILE, database.catalog_version())
+    if _matcher is None or version != _matcher_version:
+        with _lock:
+            if _matcher is None or version != _matcher_version:
+                _matcher = ItemMatcher(database.get_all_item_names())
+                _matcher_version = version
+                _resolved.clear()
+                _stats["rebuilds"] += 1
+    return _matcher
+
+def _match_uncached(item_name: str, matcher: ItemMatcher, synonyms: bool = True) -> dict:
+    normalized = basic_normalize(item_name)
+    cleaned = clean_normalize(item_name)
+    forms = [normalized] if normalized == cleaned else [normalized, cleaned]
+    variants = inflections(cleaned)
+
+    # 1. Exact key (after separator clean-up)
+    for form in forms:
+        if form in matcher.keys:
+            return {"key": matcher.keys[form], "confidence": 1.0, "method": "exact"}
+    # 2. Synonym table, also for the singular/plural of the input
+    for form in ([cleaned] + variants) if synonyms else []:
+        target = ITEM_SYNONYMS.get(form)
+        if target in matcher.keys:
+            return {"key": matcher.keys[target], "confidence": 1.0, "method": "synonym"}
+    # 3. Singular/plural of an existing key
+    for form in variants:
+        if form in matcher.keys:
+            return {"key": matcher.keys[form], "confidence": 0.95, "method": "inflection"}
+    # 4. Typos: best fuzzy score over the input and its inflections
+    best, best_score = None, 0.0
+    for form in [cleaned] + variants:
+        key, score = matcher.match(form)
+        if key and score > best_score:
+            best, best_score = key, score
+    if best:
+        return {"key": best, "confidence": round(best_score, 3), "method": "fuzzy"}
+    return {"key": None, "confidence": 0.0, "method": "none"}
+
+def match_item(item_name: str, synonyms: bool = True) -> dict:
+    """
+    Resolves user input to a database key locally, memoized per raw input.
+    Returns {"key": str | None, "confidence": 0..1, "method": exact|synonym|inflection|fuzzy|none}.
+    synonyms=False skips the alias table (exact, plural and typo matches only).
+    """
+    matcher = get_matcher()
+    cache_key = (item_name, synonyms)
+    with _lock:
+        cached = _resolved.get(cache_key)
+        if cached is not None:
+            _resolved.move_to_end(cache_key)
+            _stats["hits"] += 1
+            return dict(cached)
+
+    result = _match_uncached(item_name, matcher, synonyms)
+
+    with _lock:
+        _stats["misses"] += 1
+        if matcher is _matcher:  # don't cache against an index that was just replaced
+            _resolved[cache_key] = result
+            if len(_resolved) > RESOLVE_CACHE_SIZE:
+                _resolved.popitem(last=False)
+    return dict(result)
+
+def resolve_item(item_name: str, synonyms: bool = True, min_confidence: float = 0.0) -> tuple[str, bool]:
+    """
+    Maps user input to a database key.
+    The admin tools pass synonyms=False and min_confidence=LOCAL_MATCH_THRESHOLD:
+    exact names, plurals and close typos only ("medicine" must not delete medical_kits).
+    
+    Returns: (key, found)
+    - key: the matched database key, or the basic-normalized input if nothing matched
+    - found: True if the item exists in the database
+    """
+    match = match_item(item_name, synonyms)
+    if match["key"] and match["confidence"] >= min_confidence:
+        return (match["key"], True)
+    return (basic_normalize(item_name), False)
+
+def resolver_stats() -> dict:
+    """Cache counters: hits, misses, rebuilds (catalog changes) and current size."""
+    with _lock:
+        return {**_stats, "size": len(_resolved)}
+
+def search_items(query: str, k: int = 5) -> list[tuple[str, float]]:
+    """
+    Top-k catalog items for free-text input, best first, as (database_key, score).
+    A confident match_item result (synonyms, plurals) always comes first.
+    """
+    cleaned = clean_normalize(query)
+    if not cleaned or k <= 0:
+        return []
+    matcher = get_matcher()
+    results = matcher.search(cleaned, k)
+    best = match_item(query)
+    if best["key"] and best["confidence"] >= LOCAL_MATCH_THRESHOLD:
+        results = [(best["key"], best["confidence"])] + [r for r in results if r[0] != best["key"]]
+    return results[:k]
+
+# --- CATALOG SUMMARY ---
+# Prompts carry this short summary instead of the full item list; agents look up
+# exact names with the search_catalog tool. First matching keyword wins.
+ITEM_CATEGORIES = {
+    "water": ("water", "drink", "bottle", "purif"),
+    "food": ("food", "meal", "ration", "rice", "flour", "milk", "formula", "biscuit"),
+    "medical": ("medic", "aid", "bandage", "drug", "pill", "mask", "sanit", "hygien", "soap"),
+    "shelter": ("tent", "tarp", "blanket", "sleep", "mat", "cloth", "jacket"),
+    "power & light": ("batter", "flash", "torch", "lamp", "light", "generator", "solar", "candle"),
+}
+SUMMARY_EXAMPLES = 3
+
+def item_category(item_name: str) -> str:
+    name = item_name.lower()
+    for category, keywords in ITEM_CATEGORIES.items():
+        if any(keyword in name for keyword in keywords):
+            return category
+    return "other"
+
+_summary = (None, "")  # (catalog version, text)
+
+def catalog_summary() -> str:
+    """
+    One line per category with a count and a few example keys, e.g.
+    "water (1): water_bottles". Size stays bounded however big the catalog gets.
+    Cached per catalog version.
+    """
+    global _summary
+    version = (database.DB_FILE, database.catalog_version())
+    if _summary[0] == version:
+        return _summary[1]
+
+    groups = defaultdict(list)
+    names = sorted(database.get_all_item_names())
+    for name in names:
+        groups[item_category(name)].append(name)
+    lines = []
+    for category in list(ITEM_CATEGORIES) + ["other"]:
+        items = groups.get(category)
+        if not items:
+            continue
+        examples = ", ".join(items[:SUMMARY_EXAMPLES]) + (", ..." if len(items) > SUMMARY_EXAMPLES else "")
+        lines.append(f"- {category} ({len(items)}): {examples}")
+    text = f"{len(names)} item types in stock catalog:\n" + "\n".join(lines)
+    _summary = (version, text)
+    return text
@@ -8,12 +8,14 @@ from dotenv import load_dotenv
 # This ensures Python can find your 'backend', 'database.py', etc.
 # regardless of where you run the command from.
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+load_dotenv()  # before the imports below: RELIEF_* settings are read at import time
 
 # --- 2. INITIALIZE DATABASE ---
 # We must do this BEFORE importing agents, because the agents read 
 # valid items from the DB during their initialization.
 import database
 database.init_db()
+database.start_request_archiver()
 
 # --- 3. IMPORT THE BRAIN ---
 # This imports the top-level orchestrator, which recursively imports
@@ -21,14 +23,36 @@ database.init_db()
 from backend.manager_orchestrator import manager_orchestrator
 
 # --- 4. CONFIGURATION ---
-load_dotenv()
+from backend import model_backends
 
-if "GOOGLE_API_KEY" not in os.environ:
+# Offline backends (replay/scripted) never call the Gemini API
+if model_backends.needs_api_key() and "GOOGLE_API_KEY" not in os.environ:
     raise ValueError("GOOGLE_API_KEY not found. Please check your .env file.")
+print(f"🧠 Model backend: {model_backends.MODEL_BACKEND}")
 
 # --- 5. A2A SERVER SETUP ---
 # This wraps the ADK agent in a FastAPI server compatible with the A2A protocol.
-app = to_a2a(manager_orchestrator, port=8001)
+# Conversation sessions live in the database (session_store), not in this process.
+from google.adk.runners import Runner
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.auth.credential_service.in_memory_credential_service import InMemoryCredentialService
+from google.adk.memory import InMemoryMemoryService
+from session_store import SqliteSessionService
+
+runner = Runner(app_name=manager_orchestrator.name, agent=manager_orchestrator,
+                session_service=SqliteSessionService(), artifact_service=InMemoryArtifactService(),
+                memory_service=InMemoryMemoryService(), credential_service=InMemoryCredentialService())
+app = to_a2a(manager_orchestrator, port=8001, runner=runner)
+
+# --- 6. METRICS ---
+# Per-agent model call metrics recorded by SmartGemini, in the Prometheus text format.
+import metrics
+from starlette.responses import Response
+
+async def prometheus_metrics(request):
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+app.add_route("/metrics", prometheus_metrics, methods=["GET"])
 
 if __name__ == "__main__":
     import os
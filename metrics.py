@@ -0,0 +1,116 @@
+import threading
+
+# Minimal in-process metrics registry rendered in the Prometheus text format
+# (served at /metrics by the Flask app and the A2A server). Each process has
+# its own registry; Prometheus scrapes both.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_metrics = {}  # name -> metric, in registration order
+_collectors = []  # callables run at scrape time, e.g. to set queue gauges
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help, self.values = name, help_text, {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        return [(self.name, key, (), value) for key, value in self.values.items()]
+
+    def totals(self, by: str, **match) -> dict:
+        """Values summed per value of label `by`, over samples whose labels include `match`."""
+        wanted = set(_label_key(match))
+        result = {}
+        with _lock:
+            for key, value in self.values.items():
+                labels = dict(key)
+                if by in labels and wanted <= set(key):
+                    result[labels[by]] = result.get(labels[by], 0) + value
+        return result
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self.values[_label_key(labels)] = value
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.buckets, self.values = name, help_text, buckets, {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with _lock:
+            state = self.values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])  # bucket counts, sum, count
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        rows = []
+        for key, (counts, total, count) in self.values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                rows.append((f"{self.name}_bucket", key, (("le", str(bound)),), bucket_count))
+            rows.append((f"{self.name}_bucket", key, (("le", "+Inf"),), count))
+            rows.append((f"{self.name}_sum", key, (), total))
+            rows.append((f"{self.name}_count", key, (), count))
+        return rows
+
+def _register(metric):
+    with _lock:
+        return _metrics.setdefault(metric.name, metric)
+
+def counter(name: str, help_text: str) -> Counter:
+    return _register(Counter(name, help_text))
+
+def gauge(name: str, help_text: str) -> Gauge:
+    return _register(Gauge(name, help_text))
+
+def histogram(name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, buckets))
+
+def add_collector(collect):
+    """Registers a callable run before every scrape (for values read on demand)."""
+    _collectors.append(collect)
+
+def render() -> str:
+    for collect in list(_collectors):
+        try:
+            collect()
+        except Exception as e:
+            print(f"⚠️ Metrics collector failed: {e}")
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key, extra)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
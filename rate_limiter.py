@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import time
+import database
+
+# Shared Gemini quota: every model call (frontend worker and A2A backend) takes
+# from the same per-model token buckets in SQLite before it goes out, instead
+# of pacing with fixed sleeps and finding out about the quota from 429s.
+
+# Per-model limits (requests/min, tokens/min). Defaults match the free tier;
+# override with RELIEF_RATE_LIMITS='{"gemini-2.5-flash": [1000, 1000000]}'.
+MODEL_LIMITS = {
+    "gemini-2.5-flash": (10, 250_000),
+    "gemini-2.5-flash-lite": (15, 250_000),
+    "gemini-2.5-pro": (5, 250_000),
+}
+DEFAULT_LIMITS = (
+    float(os.environ.get("RELIEF_RPM", 10)),
+    float(os.environ.get("RELIEF_TPM", 250_000)),
+)
+if os.environ.get("RELIEF_RATE_LIMITS"):
+    MODEL_LIMITS.update({model: tuple(limits) for model, limits in json.loads(os.environ["RELIEF_RATE_LIMITS"]).items()})
+# Bucket size as a fraction of the per-minute limit. Small, so a sliding
+# one-minute window never sees much more than the limit.
+RATE_LIMIT_BURST = float(os.environ.get("RELIEF_RATE_LIMIT_BURST", 0.25))
+RATE_LIMIT_ENABLED = os.environ.get("RELIEF_RATE_LIMIT", "1") != "0"
+
+def limits_for(model: str) -> tuple[float, float]:
+    return MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+
+# Local prompt size estimate, used wherever the API's count isn't known yet
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token; the rate limiter corrects it with the real usage in settle()."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def estimate_request_tokens(llm_request) -> int:
+    """Prompt estimate for an ADK LlmRequest (instruction + contents + tool declarations)."""
+    config = getattr(llm_request, "config", None)
+    size = len(str(getattr(config, "system_instruction", "") or ""))
+    size += len(str(getattr(config, "tools", "") or ""))
+    for content in getattr(llm_request, "contents", None) or []:
+        for part in content.parts or []:
+            size += len(part.text or "") if part.text is not None else len(str(part))
+    return (size + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _wait_time(model: str, tokens: int) -> float:
+    rpm, tpm = limits_for(model)
+    return database.take_rate_budget(model, rpm, tpm, RATE_LIMIT_BURST, tokens)
+
+def acquire(model: str, tokens: int = 0) -> float:
+    """Blocks until the model's shared budget allows one call. Returns the seconds waited."""
+    if not RATE_LIMIT_ENABLED:
+        return 0.0
+    waited = 0.0
+    while (wait := _wait_time(model, tokens)) > 0:
+        time.sleep(wait)
+        waited += wait
+    if waited:
+        print(f"🚦 Rate limiter: waited {waited:.2f}s for {model}")
+    return waited
+
+async def acquire_async(model: str, tokens: int = 0, max_wait: float = None) -> float:
+    """
+    acquire() for coroutines: the bucket write runs in a thread (it can wait on the
+    SQLite write lock) and waits use asyncio.sleep, so the event loop keeps running.
+    Raises TimeoutError instead of sleeping past `max_wait` seconds in total.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return 0.0
+    waited = 0.0
+    while (wait := await asyncio.to_thread(_wait_time, model, tokens)) > 0:
+        if max_wait is not None and waited + wait > max_wait:
+            raise TimeoutError(f"{model} quota needs {waited + wait:.1f}s, over the {max_wait:.1f}s budget")
+        await asyncio.sleep(wait)
+        waited += wait
+    if waited:
+        print(f"🚦 Rate limiter: waited {waited:.2f}s for {model}")
+    return waited
+
+def settle(model: str, estimated_tokens: int, actual_tokens: int):
+    """Replaces the pre-call token estimate with what the API reported."""
+    if RATE_LIMIT_ENABLED and actual_tokens:
+        database.adjust_rate_tokens(model, estimated_tokens - actual_tokens)
+
+def penalize(model: str, seconds: float):
+    """A 429 got through anyway: hold every process off this model for `seconds`."""
+    if RATE_LIMIT_ENABLED:
+        database.block_rate(model, seconds)
+        print(f"🚦 Rate limiter: {model} blocked for {seconds:.2f}s after a 429")
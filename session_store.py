@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+import uuid
+import zlib
+from typing import Any, Optional
+
+import database
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events.event import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+
+# ADK sessions in the shared SQLite database instead of process RAM: they
+# survive restarts and any frontend worker or backend process can pick up any
+# session. Nothing is cached here - every get_session reads the session row and
+# its events (only the recent ones when the caller asks), so memory doesn't grow
+# with the number of sessions. Sessions idle longer than SESSION_TTL are
+# treated as gone and swept out; each keeps at most SESSION_MAX_EVENTS events
+# (oldest whole invocations are dropped first). The SQLite work runs in worker
+# threads (asyncio.to_thread) so a wait on the write lock never stalls the
+# event loop.
+SESSION_TTL = float(os.environ.get("RELIEF_SESSION_TTL", 24 * 3600))
+SESSION_MAX_EVENTS = int(os.environ.get("RELIEF_SESSION_MAX_EVENTS", 200))
+EVICT_INTERVAL = 60  # seconds between sweeps of idle sessions, per process
+
+def _encode(event: Event) -> bytes:
+    return zlib.compress(event.model_dump_json(exclude_none=True).encode(), 6)
+
+def _decode(data: bytes) -> Event:
+    return Event.model_validate_json(zlib.decompress(data))
+
+def _split_delta(delta: dict) -> tuple[dict, dict, dict]:
+    """(session, app, user) parts of a state delta, prefixes removed; temp: keys are never stored."""
+    session, app, user = {}, {}, {}
+    for key, value in (delta or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            app[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session[key] = value
+    return session, app, user
+
+class SqliteSessionService(BaseSessionService):
+    """BaseSessionService on relief_logistics.db with idle-TTL eviction and a per-session event cap."""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_events: int = SESSION_MAX_EVENTS):
+        self.ttl = ttl
+        self.max_events = max_events
+        self._last_sweep = 0.0
+
+    def _sweep(self, now: float):
+        if self.ttl and now - self._last_sweep >= EVICT_INTERVAL:
+            self._last_sweep = now
+            evicted = database.evict_idle_adk_sessions(now - self.ttl)
+            if evicted:
+                print(f"🧹 Evicted {evicted} idle ADK sessions")
+
+    def _expired(self, row: dict, now: float) -> bool:
+        return bool(self.ttl) and row["update_time"] < now - self.ttl
+
+    def _merged_state(self, app_name: str, user_id: str, state: dict) -> dict:
+        """Session state plus app:/user: state, as ADK agents see it."""
+        merged = dict(state)
+        for key, value in database.get_adk_scoped_state(app_name).items():
+            merged[State.APP_PREFIX + key] = value
+        for key, value in database.get_adk_scoped_state(app_name, user_id).items():
+            merged[State.USER_PREFIX + key] = value
+        return merged
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        return await asyncio.to_thread(self._create, app_name, user_id, state, session_id)
+
+    def _create(self, app_name: str, user_id: str, state: Optional[dict], session_id: Optional[str]) -> Session:
+        now = time.time()
+        self._sweep(now)
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        session_state, app_delta, user_delta = _split_delta(state)
+        existing = database.get_adk_session(app_name, user_id, session_id)
+        if existing and self._expired(existing, now):
+            database.delete_adk_session(app_name, user_id, session_id)
+        with database.transaction():
+            if not database.create_adk_session(app_name, user_id, session_id, session_state, now):
+                raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+            if app_delta or user_delta:
+                database.merge_adk_scoped_state(app_name, user_id, app_delta, user_delta)
+        return Session(app_name=app_name, user_id=user_id, id=session_id, last_update_time=now,
+                       state=self._merged_state(app_name, user_id, session_state))
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        return await asyncio.to_thread(self._load, app_name, user_id, session_id, config)
+
+    def _load(self, app_name: str, user_id: str, session_id: str, config: Optional[GetSessionConfig]) -> Optional[Session]:
+        row = database.get_adk_session(app_name, user_id, session_id)
+        if row is None or self._expired(row, time.time()):
+            return None
+        limit = config.num_recent_events if config else None
+        after = config.after_timestamp if config else None
+        blobs = [] if limit == 0 else database.get_adk_events(app_name, user_id, session_id, limit=limit, after=after)
+        return Session(app_name=app_name, user_id=user_id, id=session_id, last_update_time=row["update_time"],
+                       state=self._merged_state(app_name, user_id, row["state"]), events=[_decode(b) for b in blobs])
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        updated_after = time.time() - self.ttl if self.ttl else 0
+        rows = await asyncio.to_thread(database.list_adk_sessions, app_name, user_id, updated_after)
+        sessions = [Session(app_name=app_name, user_id=row["user_id"], id=row["session_id"],
+                            last_update_time=row["update_time"], state=row["state"])
+                    for row in rows]
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await asyncio.to_thread(database.delete_adk_session, app_name, user_id, session_id)
+
+    async def get_user_state(self, *, app_name: str, user_id: str) -> dict[str, Any]:
+        return await asyncio.to_thread(database.get_adk_scoped_state, app_name, user_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        event = await super().append_event(session, event)
+        session.last_update_time = event.timestamp
+        session_delta, app_delta, user_delta = _split_delta(event.actions.state_delta if event.actions else None)
+        stored = await asyncio.to_thread(
+            database.append_adk_event, session.app_name, session.user_id, session.id, event.invocation_id,
+            event.timestamp, _encode(event), session_delta, app_delta, user_delta, self.max_events)
+        if not stored:
+            print(f"⚠️ ADK session {session.id} was evicted or deleted mid-conversation; event not stored")
+        return event
@@ -0,0 +1,69 @@
+document.addEventListener("DOMContentLoaded", () => {
+    // Each table pages through its endpoint with ?cursor=<last id>; filters reset the cursor.
+    function pagedTable({ url, form, body, more, empty, key, renderRow }) {
+        let cursor = null;
+        let params = new URLSearchParams();
+
+        async function loadPage() {
+            const query = new URLSearchParams(params);
+            query.set("limit", PAGE_SIZE);
+            if (cursor !== null) query.set("cursor", cursor);
+            try {
+                const res = await fetch(`${url}?${query}`);
+                const data = await res.json();
+                (data[key] || []).forEach(row => body.insertAdjacentHTML("beforeend", renderRow(row)));
+                cursor = data.next_cursor;
+                more.classList.toggle("hidden", cursor === null);
+                empty.classList.toggle("hidden", body.children.length > 0);
+            } catch (e) { console.error(e); }
+        }
+
+        form.onsubmit = (e) => {
+            e.preventDefault();
+            params = new URLSearchParams();
+            new FormData(form).forEach((value, name) => { if (value) params.set(name, value); });
+            cursor = null;
+            body.innerHTML = "";
+            loadPage();
+        };
+        more.onclick = loadPage;
+        loadPage();
+    }
+
+    const esc = (v) => String(v ?? "").replace(/[&<>"]/g, c => ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;" }[c]));
+    const title = (name) => esc(name).replace(/_/g, " ").replace(/\b\w/g, c => c.toUpperCase());
+    const time = (ts) => ts ? new Date(ts * 1000).toLocaleString() : "-";
+
+    pagedTable({
+        url: "/api/debug/requests",
+        form: document.getElementById("requestFilters"),
+        body: document.getElementById("requestRows"),
+        more: document.getElementById("requestMore"),
+        empty: document.getElementById("requestEmpty"),
+        key: "requests",
+        renderRow: (req) => `<tr>
+            <td><strong>${req.id}</strong></td>
+            <td>${title(req.item_name)}</td>
+            <td>${esc(req.quantity)}</td>
+            <td>${esc(req.location)}</td>
+            <td><span class="status-badge status-${esc(req.status)}">${esc(req.status)}</span></td>
+            <td class="timestamp">${esc(req.session_id || "N/A")}</td>
+            <td>${esc(req.notes || "-")}</td>
+            <td class="timestamp">${time(req.updated_at)}</td>
+        </tr>`,
+    });
+
+    pagedTable({
+        url: "/api/debug/sessions",
+        form: document.getElementById("sessionFilters"),
+        body: document.getElementById("sessionRows"),
+        more: document.getElementById("sessionMore"),
+        empty: document.getElementById("sessionEmpty"),
+        key: "sessions",
+        renderRow: (session) => `<tr>
+            <td><code>${esc(session.session_id)}</code></td>
+            <td>${esc(session.location)}</td>
+            <td class="timestamp">${time(session.timestamp)}</td>
+        </tr>`,
+    });
+});
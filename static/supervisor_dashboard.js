@@ -8,6 +8,7 @@ document.addEventListener("DOMContentLoaded", () => {
     const restockModal = document.getElementById("restockModal");
     const addItemModal = document.getElementById("addItemModal");
     const addItemBtn = document.getElementById("addItemBtn");
+    const loadOlderAuditBtn = document.getElementById("loadOlderAuditBtn");
     
     let currentRestockItem = "";
     const CLIENT_ID = 'sup_' + Math.random().toString(36).substring(2, 9);
@@ -87,10 +88,17 @@ document.addEventListener("DOMContentLoaded", () => {
         } catch (e) {}
     }
 
+    // Polling only ever fetches the newest page; older entries are loaded on demand
+    // by walking next_cursor backwards from the oldest page seen so far.
+    let auditCursor;
     async function fetchAuditLog() {
         try {
             const res = await fetch("/api/audit_log");
             const data = await res.json();
+            if (auditCursor === undefined) {
+                auditCursor = data.next_cursor;
+                loadOlderAuditBtn.classList.toggle("hidden", auditCursor == null);
+            }
             if (data.logs?.length > 0) {
                 data.logs.forEach(l => {
                     if (!seenLogIds.has(l.id)) {
@@ -102,6 +110,22 @@ document.addEventListener("DOMContentLoaded", () => {
         } catch (e) {}
     }
 
+    async function loadOlderAuditLog() {
+        if (auditCursor == null) return;
+        try {
+            const res = await fetch(`/api/audit_log?cursor=${auditCursor}`);
+            const data = await res.json();
+            (data.logs || []).forEach(l => {
+                if (!seenLogIds.has(l.id)) {
+                    seenLogIds.add(l.id);
+                    log(`SYSTEM: ${l.action}`, "server", true);
+                }
+            });
+            auditCursor = data.next_cursor;
+            loadOlderAuditBtn.classList.toggle("hidden", auditCursor == null);
+        } catch (e) {}
+    }
+
     async function fetchActivityLog() {
         try {
             const res = await fetch("/api/supervisor_activity_log");
@@ -145,7 +169,7 @@ document.addEventListener("DOMContentLoaded", () => {
         } catch (e) {}
     }
 
-    function log(message, type="local") {
+    function log(message, type="local", older=false) {
         const p = document.createElement("div");
         p.className = "log-entry";
         const time = new Date().toLocaleTimeString();
@@ -155,7 +179,7 @@ document.addEventListener("DOMContentLoaded", () => {
         if (type === "queued") colorClass = "log-queued"; // Yellow for queued
         if (type === "response") colorClass = "log-response"; // Blue for responses
         p.innerHTML = `<span class="log-time">[${time}]</span><span class="${colorClass}">${message}</span>`;
-        logContainer.prepend(p);
+        if (older) logContainer.append(p); else logContainer.prepend(p);
     }
 
     // --- RENDER (Unchanged) ---
@@ -181,6 +205,10 @@ document.addEventListener("DOMContentLoaded", () => {
                 // Critical action needed - yellow border
                 div.style.borderColor = "#FBBF24";
                 div.innerHTML = `<div class="request-details"><strong>❗ ACTION REQUIRED (ID ${req.id}):</strong> ${req.notes}<br><small>${req.location}</small></div><div class="request-actions"><button class="resolve-btn" data-id="${req.id}" data-notes="${req.notes}" style="background-color:#10B981;">Resolve</button></div>`;
+            } else if (req.status === 'UNPROCESSED') {
+                // Victim message queued while the AI was down - answer it by hand, then mark it handled
+                div.style.borderColor = "#F97316";
+                div.innerHTML = `<div class="request-details"><strong>📨 UNPROCESSED MESSAGE (ID ${req.id}):</strong> ${req.notes}<br><small>${req.location}</small></div><div class="request-actions"><button class="resolve-btn" data-id="${req.id}" data-notes="${req.notes}" style="background-color:#F97316;">Mark handled</button></div>`;
             } else if (req.status === 'PENDING_DISPATCH' || req.status === 'PARTIAL') {
                 // Waiting for restock - blue/cyan border, needs resolve action
                 div.style.borderColor = "#3B82F6";
@@ -207,6 +235,7 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     };
     addItemBtn.onclick = () => addItemModal.classList.remove("hidden");
+    loadOlderAuditBtn.onclick = loadOlderAuditLog;
     document.getElementById("cancelRestock").onclick = () => restockModal.classList.add("hidden");
     document.getElementById("cancelAddItem").onclick = () => addItemModal.classList.add("hidden");
 
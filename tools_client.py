@@ -1,8 +1,9 @@
 import database
-from difflib import get_close_matches
+import item_resolver
 import requests
 import threading
 from typing import Optional
+from google.adk.tools import ToolContext
 
 # Frontend server URL for logging supervisor activities
 # On Render with Honcho, both processes run in the same container so localhost works
@@ -36,6 +37,16 @@ def clear_session_context():
     if hasattr(_session_context, 'session_id'):
         del _session_context.session_id
 
+# Where ADK's A2A server puts the request metadata; the frontend sends the
+# victim's chat session_id in it (frontend_app.initialize_adk_agents).
+A2A_METADATA_KEY = "a2a_metadata"
+
+def victim_session_id(tool_context: Optional[ToolContext]) -> Optional[str]:
+    """The chat session this invocation serves. Nested AgentTool runs inherit the run config."""
+    run_config = tool_context.run_config if tool_context else None
+    custom_metadata = (run_config.custom_metadata or {}) if run_config else {}
+    return (custom_metadata.get(A2A_METADATA_KEY) or {}).get("session_id")
+
 def log_to_supervisor_activity(action: str, log_type: str = "info"):
     """Log action to supervisor activity log via frontend API"""
     try:
@@ -61,33 +72,33 @@ def normalize_item_name(item_name: str) -> str:
     - "water bootle" → "water_bottles" (fuzzy match, typo correction)
     - "first aid kits" → "first-aid kits" (fuzzy match, handles format differences)
     """
-    # Step 1: Basic normalization
-    normalized = item_name.lower().replace(" ", "_").replace("-", "_")
-    
-    # Step 2: Get all valid items from database
-    valid_items = database.get_all_item_names()
-    
-    # Step 3: Check for exact match
-    if normalized in valid_items:
-        return normalized
-    
-    # Step 4: Try fuzzy matching against all valid items
-    # Also normalize valid items for comparison
-    normalized_valid = [item.replace(" ", "_").replace("-", "_") for item in valid_items]
-    
-    # Find closest match (cutoff=0.6 means 60% similarity required)
-    matches = get_close_matches(normalized, normalized_valid, n=1, cutoff=0.6)
-    
-    if matches:
-        # Find the original database key that corresponds to the matched normalized form
-        matched_normalized = matches[0]
-        for i, norm_item in enumerate(normalized_valid):
-            if norm_item == matched_normalized:
-                return valid_items[i]
-    
-    # Step 5: No match found, return original normalized name
-    # (This will fail in database lookup, but preserves user input for error message)
-    return normalized
+    # The steps above live in item_resolver (shared with the supervisor tools, memoized per input)
+    return item_resolver.resolve_item(item_name)[0]
+
+def find_item(item_name: str) -> str:
+    """
+    Maps a user's item name to the exact inventory key without an LLM call.
+    Handles case, spaces/hyphens, singular/plural, typos and common synonyms.
+    Returns 'MATCH: <key>' when confident, otherwise 'UNSURE: <best guess or None>'
+    (then ask item_finder_agent).
+    """
+    match = item_resolver.match_item(item_name)
+    if match["key"] and match["confidence"] >= item_resolver.LOCAL_MATCH_THRESHOLD:
+        return f"MATCH: {match['key']}"
+    return f"UNSURE: {match['key']} (confidence {match['confidence']:.2f})"
+
+def search_catalog(query: str, k: int = 5) -> str:
+    """
+    Searches the inventory catalog for items similar to `query` (names, synonyms, typos).
+    Returns up to k exact database keys with current stock, best match first.
+    Use it to list what IS available instead of guessing item names.
+    """
+    k = max(1, min(int(k), 20))
+    matches = item_resolver.search_items(query, k)
+    if not matches:
+        return f"No catalog items match '{query}'."
+    found = ", ".join(f"{key} ({database.get_item_stock(key)} in stock)" for key, _ in matches)
+    return f"Catalog matches for '{query}': {found}"
 
 def check_inventory(item_name: str) -> str:
     """Checks the current stock of a specific inventory item."""
@@ -99,12 +110,17 @@ def check_inventory(item_name: str) -> str:
         all_items = database.get_all_item_names()
         return f"ERROR: Item '{item_name}' not found. Valid items are: {', '.join(all_items)}."
 
-def log_inventory_gap(item_name: str, quantity: int, location: str, session_id: Optional[str] = None, is_partial: bool = False) -> str:
+def log_inventory_gap(item_name: str, quantity: int, location: str, is_partial: bool = False, tool_context: ToolContext = None) -> str:
     """
     Logs that a user requested an item not in inventory (or insufficient stock).
     - If is_partial=True (partial fulfillment): Creates ACTION_REQUIRED for supervisor to manually resolve
     - If is_partial=False (zero stock): Creates PENDING_DISPATCH for auto-fulfillment when restocked
     """
+    request_id = _log_gap(item_name, quantity, location, victim_session_id(tool_context), is_partial)
+    return f"Logged {'action required' if is_partial else 'pending request'} #{request_id} for {quantity}x {item_name}."
+
+def _log_gap(item_name: str, quantity: int, location: str, session_id: Optional[str], is_partial: bool) -> int:
+    """log_inventory_gap without the agent-facing text. Returns the request id."""
     normalized_name = normalize_item_name(item_name)
     
     if is_partial:
@@ -116,7 +132,7 @@ def log_inventory_gap(item_name: str, quantity: int, location: str, session_id:
         suggestion = f"User at {location} needs {quantity}x '{item_name}'. Awaiting restock for auto-dispatch."
         status = "PENDING_DISPATCH"
     
-    database.create_request(
+    return database.create_request(
         item_name=normalized_name,
         quantity=quantity,
         location=location,
@@ -125,21 +141,20 @@ def log_inventory_gap(item_name: str, quantity: int, location: str, session_id:
         notes=suggestion,
         session_id=session_id
     )
-    return f"Logged {'action required' if is_partial else 'pending request'} for {quantity}x {item_name}."
 
-def log_new_item_request(item_name: str, quantity: int, location: str) -> str:
+def log_new_item_request(item_name: str, quantity: int, location: str, tool_context: ToolContext = None) -> str:
     """
     Logs when a victim requests an item that doesn't exist in inventory at all.
     Flags supervisor to consider adding this item.
     """
-    database.create_request(
+    request_id = database.create_request(
         item_name=item_name,
         quantity=quantity,
         location=location,
         status="ACTION_REQUIRED",
         urgency="NORMAL",
         notes=f"NEW ITEM REQUEST: User at {location} requested {quantity}x '{item_name}' which is not in our inventory. Consider adding this item if demand is high.",
-        session_id=None
+        session_id=victim_session_id(tool_context)
     )
     
     # Also log to activity log
@@ -148,7 +163,26 @@ def log_new_item_request(item_name: str, quantity: int, location: str) -> str:
         "info"
     )
     
-    return f"Logged new item request for supervisor review: {item_name}"
+    return f"Logged new item request #{request_id} for supervisor review: {item_name}"
+
+def queue_unprocessed_message(message: str, location: str, is_critical: bool = False, session_id: Optional[str] = None) -> int:
+    """
+    Degraded mode (model unavailable): keeps a victim message the agents couldn't
+    process as an UNPROCESSED request, so a supervisor handles it by hand. It names
+    no inventory item, so the restock, approve and dispatch paths skip it.
+    Returns the request id.
+    """
+    request_id = database.create_request(
+        item_name="UNPROCESSED_MESSAGE",
+        quantity=0,
+        location=location,
+        status="UNPROCESSED",
+        urgency="CRITICAL" if is_critical else "NORMAL",
+        notes=f"DEGRADED MODE: AI assistant unavailable, handle manually. Message: '{message}'",
+        session_id=session_id
+    )
+    log_to_supervisor_activity(f"QUEUED (AI unavailable): message from {location} logged as request #{request_id}", "error")
+    return request_id
 
 def send_victim_chat_message(session_id: str, message: str):
     """Send a chat message to victim's conversation (appears as AI message)"""
@@ -163,165 +197,166 @@ def send_victim_chat_message(session_id: str, message: str):
     except:
         pass
 
+def _send_notifications(notifications: list[tuple]):
+    """Posts (kind, target, message) notifications in order; runs off the request thread."""
+    for kind, target, message in notifications:
+        if kind == "activity":
+            log_to_supervisor_activity(message, target)
+        else:
+            send_victim_chat_message(target, message)
+
 def process_pending_dispatches(item_name: str) -> list[str]:
     """
     After a restock, check for pending dispatch requests and fulfill them.
     Handles both PENDING_DISPATCH (auto-dispatch) and ACTION_REQUIRED (from manual resolve).
     Returns list of messages about dispatched items.
+    
+    The FIFO allocation and all DB writes happen in one transaction
+    (database.dispatch_pending_requests); activity-log and victim notifications
+    are sent after the commit on a background thread.
     """
     normalized_name = normalize_item_name(item_name)
-    conn = database.get_db_connection()
-    
-    # Get all pending dispatch requests for this item (both PENDING_DISPATCH and ACTION_REQUIRED), ordered by ID (FIFO)
-    pending = conn.execute(
-        "SELECT * FROM requests WHERE item_name = ? AND status IN ('PENDING_DISPATCH', 'ACTION_REQUIRED') ORDER BY id ASC",
-        (normalized_name,)
-    ).fetchall()
-    
-    if not pending:
-        conn.close()
-        return []
+    dispatched = database.dispatch_pending_requests(normalized_name)
     
     messages = []
-    current_stock = database.get_item_stock(normalized_name)
-    
-    for req in pending:
-        req_id = req['id']
-        quantity_needed = req['quantity']
-        location = req['location']
-        # Handle session_id - it might be None/NULL in database
-        try:
-            victim_session = req['session_id']
-        except (KeyError, IndexError):
-            victim_session = None
-        
-        if current_stock <= 0:
-            # No more stock available
-            break
-        
-        if current_stock >= quantity_needed:
-            # Can fulfill completely
-            database.update_stock(normalized_name, current_stock - quantity_needed)
-            database.update_request_status(req_id, "ACTION_TAKEN", f"Auto-dispatched after restock")
-            
-            log_to_supervisor_activity(
-                f"AUTO-DISPATCH: Fulfilled {quantity_needed}x {normalized_name} to {location} (from request #{req_id})",
-                "system"
-            )
-            
-            # Send chat message to victim
-            send_victim_chat_message(
-                victim_session,
-                f"Hey! Great news - we just restocked and your request for {quantity_needed} {item_name} is now on its way to {location}! Thanks for your patience. 🙏"
-            )
-            
+    notifications = []
+    for d in dispatched:
+        req_id, location, victim_session = d['id'], d['location'], d['session_id']
+        if d['remaining'] == 0:
+            quantity_needed = d['quantity']
+            notifications.append(("activity", "system",
+                f"AUTO-DISPATCH: Fulfilled {quantity_needed}x {normalized_name} to {location} (from request #{req_id})"))
+            notifications.append(("victim", victim_session,
+                f"Hey! Great news - we just restocked and your request for {quantity_needed} {item_name} is now on its way to {location}! Thanks for your patience. 🙏"))
             messages.append(f"✅ Auto-dispatched {quantity_needed}x {item_name} to {location} (Request #{req_id})")
-            current_stock -= quantity_needed
         else:
-            # Can only fulfill partially
-            amount_sent = current_stock
-            remaining = quantity_needed - current_stock
-            
-            database.update_stock(normalized_name, 0)
-            database.update_request_status(req_id, "PARTIAL", f"Dispatched {amount_sent}, still need {remaining}")
-            
-            log_to_supervisor_activity(
-                f"AI_APPROVED: Auto-dispatched {amount_sent}x {normalized_name} to {location} (Partial from request #{req_id}, {remaining} remaining)",
-                "system"
-            )
-            
-            # Send chat message to victim about partial fulfillment
-            send_victim_chat_message(
-                victim_session,
-                f"Quick update - we were able to send {amount_sent} {item_name} to {location} from what we had available. Still working on getting the remaining {remaining} units to you. We're doing our best to help!"
-            )
-            
-            # Create new pending request for the remainder (keep same session_id)
-            database.create_request(
-                normalized_name,
-                remaining,
-                location,
-                "PENDING_DISPATCH",
-                "NORMAL",
-                f"Remaining from request #{req_id}",
-                session_id=victim_session
-            )
-            
+            amount_sent, remaining = d['sent'], d['remaining']
+            notifications.append(("activity", "system",
+                f"AI_APPROVED: Auto-dispatched {amount_sent}x {normalized_name} to {location} (Partial from request #{req_id}, {remaining} remaining)"))
+            notifications.append(("victim", victim_session,
+                f"Quick update - we were able to send {amount_sent} {item_name} to {location} from what we had available. Still working on getting the remaining {remaining} units to you. We're doing our best to help!"))
             messages.append(f"⚠️ Partially dispatched {amount_sent}x {item_name} to {location} (Request #{req_id}), {remaining} still pending")
-            current_stock = 0
-            break
     
-    conn.close()
+    if notifications:
+        threading.Thread(target=_send_notifications, args=(notifications,), daemon=True).start()
     return messages
 
-def request_relief(item_name: str, quantity: int, location: str, is_critical: bool = False) -> str:
+def _relieve_item(item_name: str, quantity: int, location: str, session_id: Optional[str], notifications: list) -> dict:
     """
-    Processes a relief request. Handles Partial Fulfillment automatically.
+    Reserves stock for one item and logs any gap. Activity-log posts are appended
+    to `notifications` so the caller decides when (and on which thread) to send them.
+    Returns {"item_name", "requested", "dispatched", "status", "message"}, plus
+    "request_id" when a gap was logged for the supervisor.
     """
     normalized_name = normalize_item_name(item_name)
-    current_stock = database.get_item_stock(normalized_name)
-    
-    # Get the most recent ACTIVE session and update it with the location
-    import sqlite3
-    conn = sqlite3.connect('relief_logistics.db')
-    cursor = conn.cursor()
-    
-    # Get the most recent session marked as ACTIVE
-    cursor.execute('SELECT session_id FROM active_sessions WHERE location = "ACTIVE" ORDER BY timestamp DESC LIMIT 1')
-    row = cursor.fetchone()
-    session_id = row[0] if row else None
+    result = {"item_name": normalized_name, "requested": quantity, "dispatched": 0}
     
-    # Update this session with the actual location for future lookups
-    if session_id:
-        database.register_active_session(session_id, location)
-        print(f"[BACKEND] 🔍 DEBUG: Updated session {session_id} with location: {location}")
-    
-    conn.close()
-    print(f"[BACKEND] 🔍 DEBUG: request_relief - location: {location}, session_id: {session_id}")
+    if quantity <= 0:
+        result.update(status="INVALID", message=f"ERROR: Quantity must be a positive number, got {quantity}.")
+        return result
+
+    # Reserve stock atomically so concurrent requests can't both dispatch the same units
+    amount_sent, new_stock = database.reserve_stock(normalized_name, quantity)
     
     # 1. Item doesn't exist
-    if current_stock == -1: 
-        log_inventory_gap(item_name, quantity, location, session_id)
-        return f"ERROR: Item '{item_name}' does not exist. I have logged this gap for the supervisor."
+    if amount_sent == -1: 
+        result["request_id"] = _log_gap(item_name, quantity, location, session_id, False)
+        result.update(status="NOT_IN_INVENTORY",
+                      message=f"ERROR: Item '{item_name}' does not exist. I have logged this gap for the supervisor.")
+        return result
 
-    urgency = "CRITICAL" if is_critical else "NORMAL"
-
-    # 2. Insufficient Stock (Zero or Negative) - Don't allow negative inventory!
-    if current_stock <= 0:
+    # 2. Insufficient Stock (Zero or Negative) - nothing was reserved
+    if amount_sent == 0:
         # Don't dispatch anything - stock is already at or below zero
-        log_inventory_gap(item_name, quantity, location, session_id)
-        return f"I'm really sorry, but we're completely out of {item_name} right now. I've put in a request for {quantity} units to {location}, and our team will work on getting them to you as soon as we can restock. I'll let you know once they're on the way!"
+        result["request_id"] = _log_gap(item_name, quantity, location, session_id, False)
+        result.update(status="OUT_OF_STOCK",
+                      message=f"I'm really sorry, but we're completely out of {item_name} right now. I've put in a request for {quantity} units to {location}, and our team will work on getting them to you as soon as we can restock. I'll let you know once they're on the way!")
+        return result
+
+    result["dispatched"] = amount_sent
 
     # 3. Partial Fulfillment
-    if current_stock < quantity:
-        amount_sent = current_stock
-        shortfall = quantity - current_stock
-        
-        # Send what we have
-        database.update_stock(normalized_name, 0) # Empty the stock (set to 0, not negative)
+    if amount_sent < quantity:
+        shortfall = quantity - amount_sent
         
         # Log to supervisor activity log
-        log_to_supervisor_activity(
-            f"AI_APPROVED: Dispatched {amount_sent}x {normalized_name} to {location} (Partial - Stock exhausted)", 
-            "system"
-        )
+        notifications.append(("activity", "system",
+            f"AI_APPROVED: Dispatched {amount_sent}x {normalized_name} to {location} (Partial - Stock exhausted)"))
         
         # Log the shortfall as ACTION_REQUIRED (partial fulfillment needs manual supervisor action)
-        log_inventory_gap(item_name, shortfall, location, session_id, is_partial=True)
+        result["request_id"] = _log_gap(item_name, shortfall, location, session_id, True)
         
-        return f"Good news - I found {amount_sent} {item_name} and they're on their way to {location} right now! Unfortunately that's all we have at the moment. I've flagged your request for the remaining {shortfall} units with our supervisor, and they'll get those to you as soon as possible. Hang in there!"
+        result.update(status="PARTIAL",
+                      message=f"Good news - I found {amount_sent} {item_name} and they're on their way to {location} right now! Unfortunately that's all we have at the moment. I've flagged your request for the remaining {shortfall} units with our supervisor, and they'll get those to you as soon as possible. Hang in there!")
+        return result
 
     # 4. Full Fulfillment
-    else:
-        new_stock = current_stock - quantity
-        database.update_stock(normalized_name, new_stock)
-        
-        # Log to supervisor activity log
-        log_to_supervisor_activity(
-            f"AI_APPROVED: Dispatched {quantity}x {normalized_name} to {location}. Remaining: {new_stock}", 
-            "system"
-        )
-        return f"Great news! I've got your {quantity} {item_name} approved and they're being dispatched to {location} right now. They should arrive soon. Stay safe!"
+    # Log to supervisor activity log
+    notifications.append(("activity", "system",
+        f"AI_APPROVED: Dispatched {quantity}x {normalized_name} to {location}. Remaining: {new_stock}"))
+    result.update(status="DISPATCHED",
+                  message=f"Great news! I've got your {quantity} {item_name} approved and they're being dispatched to {location} right now. They should arrive soon. Stay safe!")
+    return result
+
+def _tie_session(session_id: Optional[str], location: str):
+    """Records the request location on the victim's session (location lookups, debug page)."""
+    if session_id:
+        database.register_active_session(session_id, location)
+        print(f"[BACKEND] 🔍 DEBUG: Updated session {session_id} with location: {location}")
+
+def request_relief(item_name: str, quantity: int, location: str, is_critical: bool = False, tool_context: ToolContext = None) -> str:
+    """
+    Processes a relief request. Handles Partial Fulfillment automatically.
+    """
+    session_id = victim_session_id(tool_context)
+    _tie_session(session_id, location)
+    print(f"[BACKEND] 🔍 DEBUG: request_relief - location: {location}, session_id: {session_id}")
+    
+    notifications = []
+    result = _relieve_item(item_name, quantity, location, session_id, notifications)
+    _send_notifications(notifications)
+    return result["message"]
+
+def request_relief_batch(items: list[dict], location: str, is_critical: bool = False, tool_context: ToolContext = None) -> dict:
+    """
+    Processes a multi-item relief request for ONE location in a single call.
+    items: list of {"item_name": str, "quantity": int}, e.g.
+    [{"item_name": "water bottles", "quantity": 20}, {"item_name": "tents", "quantity": 5}]
+    
+    Returns {"location", "results": [{"item_name", "requested", "dispatched", "status", "message", "request_id"?}], "summary"}
+    where status is DISPATCHED, PARTIAL, OUT_OF_STOCK, NOT_IN_INVENTORY or INVALID.
+    """
+    return relieve_batch(items, location, is_critical, victim_session_id(tool_context))
+
+def relieve_batch(items: list[dict], location: str, is_critical: bool = False, session_id: Optional[str] = None) -> dict:
+    """request_relief_batch for callers that know the victim's session (fast path)."""
+    _tie_session(session_id, location)
+    print(f"[BACKEND] 🔍 DEBUG: request_relief_batch - {len(items)} item(s), location: {location}, session_id: {session_id}")
+    
+    # All reservations and gap logs commit (or roll back) together;
+    # activity-log posts go out afterwards on a background thread
+    results = []
+    notifications = []
+    with database.transaction():
+        for entry in items:
+            item_name = str(entry.get("item_name") or entry.get("item") or "").strip()
+            try:
+                quantity = int(entry.get("quantity", 0))
+            except (TypeError, ValueError):
+                quantity = 0
+            if not item_name or quantity <= 0:
+                results.append({"item_name": item_name, "requested": quantity, "dispatched": 0, "status": "INVALID",
+                                "message": f"ERROR: Invalid entry {entry}. Each item needs an item_name and a positive quantity."})
+                continue
+            results.append(_relieve_item(item_name, quantity, location, session_id, notifications))
+    
+    if notifications:
+        threading.Thread(target=_send_notifications, args=(notifications,), daemon=True).start()
+    return {
+        "location": location,
+        "results": results,
+        "summary": "\n\n".join(r["message"] for r in results),
+    }
 
 def check_request_status(request_id: int) -> str:
     """Allows a user to check the status of a previous request ID."""
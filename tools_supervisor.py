@@ -1,6 +1,6 @@
 import database
+import item_resolver
 import json
-from difflib import get_close_matches
 
 def normalize_item_name_fuzzy(item_name: str) -> tuple[str, bool]:
     """
@@ -15,30 +15,11 @@ def normalize_item_name_fuzzy(item_name: str) -> tuple[str, bool]:
     - "water bootle" → ("water_bottles", True) - typo correction
     - "Medical Kits" → ("medical_kits", True)
     - "unknown_item" → ("unknown_item", False)
+    - "medicine" → ("medicine", False) - no victim synonyms for admin changes
     """
-    # Step 1: Basic normalization
-    normalized = item_name.lower().replace(" ", "_").replace("-", "_")
-    
-    # Step 2: Get all valid items from database
-    valid_items = database.get_all_item_names()
-    
-    # Step 3: Check for exact match
-    if normalized in valid_items:
-        return (normalized, True)
-    
-    # Step 4: Try fuzzy matching
-    normalized_valid = [item.replace(" ", "_").replace("-", "_") for item in valid_items]
-    matches = get_close_matches(normalized, normalized_valid, n=1, cutoff=0.6)
-    
-    if matches:
-        # Find the original database key
-        matched_normalized = matches[0]
-        for i, norm_item in enumerate(normalized_valid):
-            if norm_item == matched_normalized:
-                return (valid_items[i], True)
-    
-    # Step 5: No match found
-    return (normalized, False)
+    # Exact match, then fuzzy match - shared with the victim tools, memoized per input.
+    # No synonyms and only close typos: add/delete/restock must not hit a different item.
+    return item_resolver.resolve_item(item_name, synonyms=False, min_confidence=item_resolver.LOCAL_MATCH_THRESHOLD)
 
 # ... (Previous tools remain the same: view_pending, decide_request, batch_decide, add, delete, restock) ...
 def supervisor_view_pending_requests() -> str:
@@ -48,6 +29,7 @@ def supervisor_view_pending_requests() -> str:
     result = "Attention Queue:\n"
     for r in rows:
         if r['status'] == 'ACTION_REQUIRED': result += f"- ❗ ACTION (ID {r['id']}): {r['notes']} at {r['location']}\n"
+        elif r['status'] == 'UNPROCESSED': result += f"- 📨 MESSAGE (ID {r['id']}): {r['notes']} at {r['location']}\n"
         else:
             urgency = "🔴" if r['urgency'] == 'CRITICAL' else "⚪"
             result += f"- ⏳ PENDING (ID {r['id']}) [{urgency}]: {r['quantity']}x {r['item_name']}\n"
@@ -68,6 +50,11 @@ def supervisor_resolve_action_required(task_id: int, buffer_multiplier: float =
     if not task: 
         return f"Error: Task {task_id} not found."
     
+    # Degraded-mode messages name no item: resolving one means the supervisor answered it by hand
+    if task['status'] == 'UNPROCESSED':
+        database.update_request_status(task_id, "ACTION_TAKEN", f"Handled manually. {task['notes']}")
+        return f"SUCCESS: Message #{task_id} marked as handled (no inventory change)."
+    
     # Accept both ACTION_REQUIRED and PENDING_DISPATCH statuses
     if task['status'] not in ['ACTION_REQUIRED', 'PENDING_DISPATCH', 'PARTIAL']:
         return f"Error: Task {task_id} cannot be resolved (current status: {task['status']}). Only ACTION_REQUIRED, PENDING_DISPATCH, or PARTIAL requests can be resolved."
@@ -75,6 +62,8 @@ def supervisor_resolve_action_required(task_id: int, buffer_multiplier: float =
     item_name = task['item_name']
     quantity_needed = task['quantity']
     location = task['location']
+    if quantity_needed is None or quantity_needed <= 0:
+        return f"Error: Task {task_id} has an invalid quantity ({quantity_needed}); nothing to restock or dispatch."
     
     # Calculate restock amount with buffer
     restock_amount = int(quantity_needed * buffer_multiplier)
@@ -90,11 +79,9 @@ def supervisor_resolve_action_required(task_id: int, buffer_multiplier: float =
         new_total = database.increment_stock(item_name, restock_amount)
         result_msg = f"Restocked '{item_name}' with {restock_amount} units. New total: {new_total}."
     
-    # Dispatch the needed quantity
-    current_stock = database.get_item_stock(item_name)
-    if current_stock >= quantity_needed:
-        # Dispatch the requested amount
-        database.update_stock(item_name, current_stock - quantity_needed)
+    # Dispatch the needed quantity (all-or-nothing, atomic against concurrent dispatches)
+    dispatched, final_stock = database.reserve_stock(item_name, quantity_needed, allow_partial=False)
+    if dispatched == quantity_needed:
         
         # Send notification to victim using session_id from the request
         import tools_client
@@ -112,10 +99,9 @@ def supervisor_resolve_action_required(task_id: int, buffer_multiplier: float =
             "system"
         )
         
-        final_stock = database.get_item_stock(item_name)
         result_msg += f"\n\nAuto-dispatched {quantity_needed} units to {location}. Buffer remaining: {final_stock}."
     else:
-        result_msg += f"\n\nWarning: After restock, stock is {current_stock} but needed {quantity_needed}."
+        result_msg += f"\n\nWarning: After restock, stock is {final_stock} but needed {quantity_needed}."
     
     # Mark this task as ACTION_TAKEN
     database.update_request_status(task_id, "ACTION_TAKEN", f"Resolved with restock: {restock_amount} units, dispatched {quantity_needed}")
@@ -131,10 +117,12 @@ def supervisor_decide_request(request_id: int, decision: str) -> str:
         database.update_request_status(request_id, "REJECTED", "Rejected")
         return f"Request {request_id} REJECTED."
     if decision == "APPROVE":
-        current = database.get_item_stock(req['item_name'])
-        if current < req['quantity']: return "Cannot Approve: Insufficient stock."
-        new_stock = current - req['quantity']
-        database.update_stock(req['item_name'], new_stock)
+        if req['status'] == 'UNPROCESSED':
+            return f"Error: Request {request_id} is an unprocessed message, not an item request. Resolve it instead."
+        if req['quantity'] is None or req['quantity'] <= 0:
+            return f"Error: Request {request_id} has an invalid quantity ({req['quantity']})."
+        reserved, _ = database.reserve_stock(req['item_name'], req['quantity'], allow_partial=False)
+        if reserved < req['quantity']: return "Cannot Approve: Insufficient stock."
         database.update_request_status(request_id, "APPROVED_MANUAL", "Approved")
         return f"Request {request_id} APPROVED."
 
@@ -151,7 +139,7 @@ def admin_add_new_item(item_name: str, initial_quantity: int) -> str:
         return f"ERROR: Item '{normalized_name}' already exists in inventory. Use restock instead. (Did you mean to restock '{normalized_name}'?)"
     
     # For new items, just use basic normalization (no fuzzy match needed)
-    new_item_name = item_name.lower().replace(" ", "_").replace("-", "_")
+    new_item_name = item_resolver.basic_normalize(item_name)
     database.add_new_item(new_item_name, initial_quantity)
     return f"SUCCESS: Added '{new_item_name}' with {initial_quantity} units."
 